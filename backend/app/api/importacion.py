@@ -2,23 +2,63 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import shutil
+import tempfile
+from functools import partial
+from typing import Callable, Optional, TypeVar
 
+import anyio
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
 
-from backend.app.core.database import get_db
+from backend.app.core.config import get_settings
+from backend.app.core.database import get_db, get_session_factory
 from backend.app.schemas.importacion import (
     ColumnMapping,
     CsvAnalysisResult,
     CsvImportResult,
     CsvPreviewResult,
     ImportOptions,
+    TrabajoImportacionRead,
 )
-from backend.app.services.importador_csv import analyze_csv, apply_import, preview_import
+from backend.app.services.cache_importacion import cache_importaciones
+from backend.app.services.importador_csv import (
+    CsvParseado,
+    OrigenCsv,
+    analyze_csv,
+    apply_import,
+    preview_import,
+)
+from backend.app.services.trabajos_importacion import ESTADOS_FINALES, gestor_trabajos
 
 router = APIRouter(prefix="/import", tags=["importacion"])
 
+# Cadencia con la que el stream de progreso consulta el estado del trabajo.
+INTERVALO_PROGRESO_SEGUNDOS = 0.5
+
+T = TypeVar("T")
+
+# Se crea al primer uso: el limitador debe pertenecer al bucle de eventos activo.
+_limitador: Optional[anyio.CapacityLimiter] = None
+
+
+async def _en_hilo(funcion: Callable[..., T], *args) -> T:
+    """Ejecuta trabajo bloqueante (pandas, Sniffer, SQLAlchemy) fuera del bucle de eventos.
+
+    El número de hilos está acotado por `IMPORT_MAX_WORKERS` para que varias
+    subidas simultáneas no saturen la CPU ni el pool de conexiones. La sesión de
+    la petición viaja al hilo, pero solo se usa allí mientras la corrutina espera,
+    nunca desde dos hilos a la vez.
+    """
+
+    global _limitador
+    if _limitador is None:
+        _limitador = anyio.CapacityLimiter(get_settings().import_max_workers)
+    return await anyio.to_thread.run_sync(partial(funcion, *args), limiter=_limitador)
+
 
 @router.post("/analyze", response_model=CsvAnalysisResult)
 async def analizar_csv(
@@ -28,18 +68,28 @@ async def analizar_csv(
 
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo debe ser CSV")
-    contenido = await file.read()
-    return analyze_csv(contenido)
+    return await _en_hilo(_analizar, file)
 
 
-def _parse_payload(payload: str) -> tuple[ColumnMapping, ImportOptions]:
-    """Parses mapping y options enviados como JSON en multipart."""
+def _analizar(file: UploadFile) -> CsvAnalysisResult:
+    # El fichero se guarda en bruto: se parsea al previsualizar, no al analizar.
+    token = cache_importaciones.registrar(file.file)
+    try:
+        resultado = analyze_csv(file.file)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    resultado.token = token
+    return resultado
+
+
+def _parse_payload(payload: str) -> tuple[ColumnMapping, ImportOptions, Optional[str]]:
+    """Parses mapping, options y token opcional enviados como JSON en multipart."""
 
     try:
         data = json.loads(payload)
         mapping = ColumnMapping.model_validate(data.get("mapping"))
         options = ImportOptions.model_validate(data.get("options", {}))
-        return mapping, options
+        return mapping, options, data.get("token")
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -47,28 +97,127 @@ def _parse_payload(payload: str) -> tuple[ColumnMapping, ImportOptions]:
         ) from exc
 
 
+def _resolver_origen(token: Optional[str], file: Optional[UploadFile]) -> OrigenCsv:
+    """Usa el CSV en caché si el token sigue vigente y, si no, el fichero subido."""
+
+    if token:
+        parseado = cache_importaciones.obtener(token)
+        if parseado is not None:
+            return parseado
+    if file is not None:
+        return file.file
+    if token:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="El fichero ya no está en caché, vuelve a subirlo",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="Falta el fichero CSV o el token"
+    )
+
+
 @router.post("/preview", response_model=CsvPreviewResult)
 async def previsualizar_importacion(
-    payload: str = Form(..., description="JSON con mapping y options"),
-    file: UploadFile = File(..., description="CSV a previsualizar"),
+    payload: str = Form(..., description="JSON con mapping, options y token opcional"),
+    file: Optional[UploadFile] = File(None, description="CSV a previsualizar si no se envía token"),
     db: Session = Depends(get_db),
 ):
     """Genera una previsualización sin escribir en la base de datos."""
 
-    mapping, options = _parse_payload(payload)
-    contenido = await file.read()
-    return preview_import(contenido, mapping, options, db)
+    mapping, options, token = _parse_payload(payload)
+    origen = await _en_hilo(_resolver_origen, token, file)
+    return await _en_hilo(preview_import, origen, mapping, options, db)
 
 
 @router.post("/apply", response_model=CsvImportResult)
 async def ejecutar_importacion(
-    payload: str = Form(..., description="JSON con mapping y options"),
-    file: UploadFile = File(..., description="CSV a importar"),
+    payload: str = Form(..., description="JSON con mapping, options y token opcional"),
+    file: Optional[UploadFile] = File(None, description="CSV a importar si no se envía token"),
     db: Session = Depends(get_db),
 ):
     """Aplica la importación de los registros válidos."""
 
-    mapping, options = _parse_payload(payload)
-    contenido = await file.read()
-    return apply_import(contenido, mapping, options, db)
+    mapping, options, token = _parse_payload(payload)
+    origen = await _en_hilo(_resolver_origen, token, file)
+    return await _en_hilo(apply_import, origen, mapping, options, db)
 
+
+def _obtener_trabajo(db: Session, trabajo_id: str) -> TrabajoImportacionRead:
+    trabajo = gestor_trabajos.estado(db, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@router.post("/jobs", response_model=TrabajoImportacionRead, status_code=status.HTTP_202_ACCEPTED)
+async def crear_trabajo_importacion(
+    payload: str = Form(..., description="JSON con mapping, options y token opcional"),
+    file: Optional[UploadFile] = File(None, description="CSV a importar si no se envía token"),
+    db: Session = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+):
+    """Lanza la importación en segundo plano y devuelve el trabajo creado."""
+
+    mapping, options, token = _parse_payload(payload)
+    origen = await _en_hilo(_resolver_origen, token, file)
+    return await _en_hilo(_lanzar_trabajo, db, session_factory, origen, mapping, options)
+
+
+def _lanzar_trabajo(
+    db: Session,
+    session_factory: sessionmaker,
+    origen: OrigenCsv,
+    mapping: ColumnMapping,
+    options: ImportOptions,
+) -> TrabajoImportacionRead:
+    ruta_temporal = None
+    if not isinstance(origen, CsvParseado):
+        # La subida se cierra al terminar la petición: se copia a disco para el trabajo.
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as copia:
+            shutil.copyfileobj(origen, copia)
+        origen, ruta_temporal = None, copia.name
+    trabajo = gestor_trabajos.crear(db, session_factory, origen, mapping, options, ruta_temporal)
+    return TrabajoImportacionRead.model_validate(trabajo)
+
+
+@router.get("/jobs/{trabajo_id}", response_model=TrabajoImportacionRead)
+def consultar_trabajo_importacion(trabajo_id: str, db: Session = Depends(get_db)):
+    """Devuelve el estado y los contadores de progreso del trabajo."""
+
+    return _obtener_trabajo(db, trabajo_id)
+
+
+@router.get("/jobs/{trabajo_id}/stream", summary="Progreso del trabajo como Server-Sent Events")
+def seguir_trabajo_importacion(
+    trabajo_id: str, session_factory: sessionmaker = Depends(get_session_factory)
+):
+    """Emite el estado del trabajo periódicamente hasta que finaliza."""
+
+    with session_factory() as db:
+        _obtener_trabajo(db, trabajo_id)
+
+    def consultar() -> TrabajoImportacionRead:
+        with session_factory() as db:
+            return _obtener_trabajo(db, trabajo_id)
+
+    async def eventos():
+        while True:
+            trabajo = await anyio.to_thread.run_sync(consultar)
+            yield f"data: {trabajo.model_dump_json()}\n\n"
+            if trabajo.estado in ESTADOS_FINALES:
+                break
+            await asyncio.sleep(INTERVALO_PROGRESO_SEGUNDOS)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream")
+
+
+@router.post("/jobs/{trabajo_id}/cancel", response_model=TrabajoImportacionRead)
+def cancelar_trabajo_importacion(trabajo_id: str, db: Session = Depends(get_db)):
+    """Solicita la cancelación; lo ya insertado se deshace al completo."""
+
+    trabajo = _obtener_trabajo(db, trabajo_id)
+    if trabajo.estado in ESTADOS_FINALES or not gestor_trabajos.cancelar(trabajo_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="El trabajo ya ha finalizado"
+        )
+    return trabajo
@@ -43,6 +43,10 @@ def obtener_movimientos(
     page_size: int = Query(default=50, ge=1, le=200),
     sort_by: Optional[str] = Query(default=None),
     sort_dir: Optional[str] = Query(default=None, pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(
+        default=None,
+        description="`next_cursor` o `prev_cursor` de una respuesta anterior; sustituye a `page`",
+    ),
     fecha_desde: Optional[date] = Query(default=None),
     fecha_hasta: Optional[date] = Query(default=None),
     categoria_ids: Optional[str] = Query(default=None),
@@ -55,7 +59,11 @@ def obtener_movimientos(
     solo_gastos_variables: Optional[bool] = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    """Retorna movimientos filtrados, ordenados y paginados con agregados."""
+    """Retorna movimientos filtrados, ordenados y paginados con agregados.
+
+    Admite paginación por número de página o por cursor (`cursor`), cuyo coste
+    no crece con la profundidad.
+    """
 
     filtros = MovimientoFiltro(
         fecha_desde=fecha_desde,
@@ -69,48 +77,22 @@ def obtener_movimientos(
         solo_gastos_fijos=solo_gastos_fijos,
         solo_gastos_variables=solo_gastos_variables,
     )
-    return listar_movimientos(db, filtros, page=page, page_size=page_size, sort_by=sort_by, sort_dir=sort_dir)
-
-
-@router.get("/{movimiento_id}", response_model=MovimientoRead)
-def obtener_movimiento(movimiento_id: int, db: Session = Depends(get_db)):
-    """Devuelve un movimiento individual."""
-
-    return _obtener_movimiento(db, movimiento_id)
-
-
-@router.post("", response_model=MovimientoRead, status_code=status.HTTP_201_CREATED)
-def crear(datos: MovimientoCreate, db: Session = Depends(get_db)):
-    """Crea un movimiento."""
-
-    return crear_movimiento(db, datos)
-
-
-@router.put("/{movimiento_id}", response_model=MovimientoRead)
-def actualizar(movimiento_id: int, datos: MovimientoUpdate, db: Session = Depends(get_db)):
-    """Actualiza un movimiento."""
-
-    _obtener_movimiento(db, movimiento_id)
-    return actualizar_movimiento(db, movimiento_id, datos)
-
-
-@router.patch("/{movimiento_id}", response_model=MovimientoListItem)
-def actualizar_inline(movimiento_id: int, datos: MovimientoInlineUpdate, db: Session = Depends(get_db)):
-    """Actualiza parcialmente un movimiento desde edición inline."""
-
-    _obtener_movimiento(db, movimiento_id)
     try:
-        return actualizar_movimiento_inline(db, movimiento_id, datos)
-    except ValueError as exc:  # mantiene mensajes claros para el cliente
+        respuesta = listar_movimientos(
+            db,
+            filtros,
+            page=page,
+            page_size=page_size,
+            sort_by=sort_by,
+            sort_dir=sort_dir,
+            cursor=cursor,
+        )
+    except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-
-@router.delete("/{movimiento_id}", status_code=status.HTTP_204_NO_CONTENT)
-def eliminar(movimiento_id: int, db: Session = Depends(get_db)):
-    """Elimina un movimiento."""
-
-    _obtener_movimiento(db, movimiento_id)
-    borrar_movimiento(db, movimiento_id)
+    # Los items salen de la base sin validar (`model_construct`); se serializan
+    # directamente a JSON con el serializador de pydantic en lugar de dejar que
+    # FastAPI vuelva a validar y codificar la respuesta campo a campo.
+    return Response(content=respuesta.model_dump_json(), media_type="application/json")
 
 
 @router.get("/export", response_class=Response)
@@ -127,7 +109,10 @@ def exportar(
     solo_gastos_variables: Optional[bool] = Query(default=None),
     db: Session = Depends(get_db),
 ):
-    """Exporta a CSV los movimientos filtrados. Usa el mismo pipeline de filtros que el listado."""
+    """Exporta a CSV los movimientos filtrados. Usa el mismo pipeline de filtros que el listado.
+
+    Se declara antes de `/{movimiento_id}` para que esa ruta no la capture.
+    """
 
     filtros = MovimientoFiltro(
         fecha_desde=fecha_desde,
@@ -178,3 +163,44 @@ def exportar(
 
     headers = {"Content-Type": "text/csv", "Content-Disposition": "attachment; filename=movimientos.csv"}
     return StreamingResponse(generar_csv(), headers=headers)
+
+
+@router.get("/{movimiento_id}", response_model=MovimientoRead)
+def obtener_movimiento(movimiento_id: int, db: Session = Depends(get_db)):
+    """Devuelve un movimiento individual."""
+
+    return _obtener_movimiento(db, movimiento_id)
+
+
+@router.post("", response_model=MovimientoRead, status_code=status.HTTP_201_CREATED)
+def crear(datos: MovimientoCreate, db: Session = Depends(get_db)):
+    """Crea un movimiento."""
+
+    return crear_movimiento(db, datos)
+
+
+@router.put("/{movimiento_id}", response_model=MovimientoRead)
+def actualizar(movimiento_id: int, datos: MovimientoUpdate, db: Session = Depends(get_db)):
+    """Actualiza un movimiento."""
+
+    _obtener_movimiento(db, movimiento_id)
+    return actualizar_movimiento(db, movimiento_id, datos)
+
+
+@router.patch("/{movimiento_id}", response_model=MovimientoListItem)
+def actualizar_inline(movimiento_id: int, datos: MovimientoInlineUpdate, db: Session = Depends(get_db)):
+    """Actualiza parcialmente un movimiento desde edición inline."""
+
+    _obtener_movimiento(db, movimiento_id)
+    try:
+        return actualizar_movimiento_inline(db, movimiento_id, datos)
+    except ValueError as exc:  # mantiene mensajes claros para el cliente
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+@router.delete("/{movimiento_id}", status_code=status.HTTP_204_NO_CONTENT)
+def eliminar(movimiento_id: int, db: Session = Depends(get_db)):
+    """Elimina un movimiento."""
+
+    _obtener_movimiento(db, movimiento_id)
+    borrar_movimiento(db, movimiento_id)
@@ -1,15 +1,35 @@
 """Rutas para gestionar reglas de autocategorización."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from backend.app.core.database import get_db
 from backend.app.models import ReglaAutoCategoria
-from backend.app.schemas.reglas import ReglaCreate, ReglaRead, ReglaUpdate
-from backend.app.services.reglas import reaplicar_reglas
+from backend.app.schemas.reglas import (
+    EstadisticaReglaRead,
+    ModoReaplicacion,
+    ReglaCreate,
+    ReglaRead,
+    ReglaUpdate,
+    SimulacionRegla,
+)
+from backend.app.services.reglas import (
+    listar_estadisticas,
+    reaplicar_reglas,
+    reaplicar_reglas_afectadas,
+    simular_regla,
+)
 
 router = APIRouter(prefix="/reglas", tags=["reglas"])
 
+# Cabecera con el número de movimientos recategorizados al aplicar un cambio de regla.
+CABECERA_ACTUALIZADOS = "X-Movimientos-Actualizados"
+
+_APLICAR = Query(
+    False,
+    description="Recategoriza en el acto los movimientos que coinciden con la regla cambiada",
+)
+
 
 def _obtener_regla(db: Session, regla_id: int) -> ReglaAutoCategoria:
     regla = db.get(ReglaAutoCategoria, regla_id)
@@ -26,40 +46,101 @@ def listar_reglas(db: Session = Depends(get_db)):
 
 
 @router.post("", response_model=ReglaRead, status_code=status.HTTP_201_CREATED)
-def crear_regla(datos: ReglaCreate, db: Session = Depends(get_db)):
+def crear_regla(
+    datos: ReglaCreate, response: Response, aplicar: bool = _APLICAR, db: Session = Depends(get_db)
+):
     """Crea una regla nueva."""
 
     regla = ReglaAutoCategoria(**datos.model_dump())
     db.add(regla)
     db.commit()
     db.refresh(regla)
+    if aplicar:
+        actualizados = reaplicar_reglas_afectadas(
+            db, [(regla.campo_objetivo, regla.tipo_match, regla.pattern)]
+        )
+        response.headers[CABECERA_ACTUALIZADOS] = str(actualizados)
+        db.refresh(regla)
     return regla
 
 
 @router.put("/{regla_id}", response_model=ReglaRead)
-def actualizar_regla(regla_id: int, datos: ReglaUpdate, db: Session = Depends(get_db)):
+def actualizar_regla(
+    regla_id: int,
+    datos: ReglaUpdate,
+    response: Response,
+    aplicar: bool = _APLICAR,
+    db: Session = Depends(get_db),
+):
     """Actualiza una regla existente."""
 
     regla = _obtener_regla(db, regla_id)
+    anterior = (regla.campo_objetivo, regla.tipo_match, regla.pattern)
     for campo, valor in datos.model_dump().items():
         setattr(regla, campo, valor)
     db.commit()
     db.refresh(regla)
+    if aplicar:
+        actualizados = reaplicar_reglas_afectadas(
+            db, [anterior, (regla.campo_objetivo, regla.tipo_match, regla.pattern)]
+        )
+        response.headers[CABECERA_ACTUALIZADOS] = str(actualizados)
+        db.refresh(regla)
     return regla
 
 
 @router.delete("/{regla_id}", status_code=status.HTTP_204_NO_CONTENT)
-def eliminar_regla(regla_id: int, db: Session = Depends(get_db)):
+def eliminar_regla(
+    regla_id: int, response: Response, aplicar: bool = _APLICAR, db: Session = Depends(get_db)
+):
     """Elimina una regla."""
 
     regla = _obtener_regla(db, regla_id)
+    anterior = (regla.campo_objetivo, regla.tipo_match, regla.pattern)
     db.delete(regla)
     db.commit()
+    if aplicar:
+        actualizados = reaplicar_reglas_afectadas(db, [anterior])
+        response.headers[CABECERA_ACTUALIZADOS] = str(actualizados)
+
+
+@router.get(
+    "/estadisticas",
+    response_model=list[EstadisticaReglaRead],
+    summary="Aciertos y tiempo de evaluación por regla",
+)
+def estadisticas(db: Session = Depends(get_db)):
+    """Permite localizar reglas que nunca coinciden y reglas calientes que conviene priorizar.
+
+    Solo se acumulan datos con `RULE_STATS_ENABLED=true`.
+    """
+
+    return listar_estadisticas(db)
+
+
+@router.post("/simular", response_model=SimulacionRegla, summary="Simular el efecto de una regla")
+def simular(
+    datos: ReglaCreate,
+    muestra: int = Query(20, ge=0, le=200, description="Movimientos afectados a devolver"),
+    db: Session = Depends(get_db),
+):
+    """Cuenta los movimientos que la regla recategorizaría, sin guardarla ni modificar nada."""
+
+    return simular_regla(db, datos, limite_muestra=muestra)
 
 
 @router.post("/reaplicar", summary="Reaplicar reglas a todos los movimientos")
-def reaplicar(db: Session = Depends(get_db)):
+def reaplicar(
+    modo: ModoReaplicacion = Query(
+        ModoReaplicacion.sql,
+        description=(
+            "`sql` evalúa las reglas en la base de datos; `memoria` en Python; `bloques` en"
+            " Python por rangos de ids con punto de control, reanudable si se interrumpe"
+        ),
+    ),
+    db: Session = Depends(get_db),
+):
     """Fuerza la reaplicación de reglas a cada movimiento existente."""
 
-    actualizados = reaplicar_reglas(db)
+    actualizados = reaplicar_reglas(db, modo)
     return {"movimientos_actualizados": actualizados}
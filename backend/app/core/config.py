@@ -19,6 +19,41 @@ class Settings(BaseSettings):
         alias="DATABASE_URL",
         description="Cadena de conexión SQLAlchemy",
     )
+    import_cache_max_mb: int = Field(
+        default=256,
+        alias="IMPORT_CACHE_MAX_MB",
+        description="Memoria máxima de la caché de CSV subidos durante la importación",
+    )
+    import_cache_ttl_seconds: int = Field(
+        default=1800,
+        alias="IMPORT_CACHE_TTL_SECONDS",
+        description="Segundos que un CSV subido permanece en caché sin usarse",
+    )
+    import_max_jobs: int = Field(
+        default=2,
+        alias="IMPORT_MAX_JOBS",
+        description="Importaciones en segundo plano que pueden ejecutarse a la vez",
+    )
+    import_max_workers: int = Field(
+        default=2,
+        alias="IMPORT_MAX_WORKERS",
+        description=(
+            "Hilos que pueden analizar o previsualizar CSV a la vez fuera del bucle de eventos"
+        ),
+    )
+
+    rule_stats_enabled: bool = Field(
+        default=False,
+        alias="RULE_STATS_ENABLED",
+        description="Registra aciertos y tiempo de evaluación por regla de autocategorización",
+    )
+    rule_stats_flush_every: int = Field(
+        default=10_000,
+        alias="RULE_STATS_FLUSH_EVERY",
+        description=(
+            "Evaluaciones de reglas acumuladas en memoria antes de volcarlas a la base de datos"
+        ),
+    )
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,9 @@
 """Configuración de la base de datos y utilidades de sesión."""
 
+import sqlite3
 from collections.abc import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from backend.app.core.config import get_settings
@@ -18,6 +19,28 @@ engine = create_engine(settings.database_url, connect_args=connect_args, future=
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 
+def _minusculas(valor):
+    return valor.lower() if isinstance(valor, str) else valor
+
+
+@event.listens_for(Engine, "connect")
+def _configurar_sqlite(dbapi_connection, connection_record) -> None:
+    """Sustituye `lower()` de SQLite, que solo convierte ASCII, por la de Python.
+
+    Así `NÓMINA` y `nómina` coinciden en filtros y en las reglas aplicadas en SQL
+    igual que con `str.lower` en Python.
+    """
+
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("lower", 1, _minusculas, deterministic=True)
+
+
+def get_session_factory() -> sessionmaker:
+    """Factoría de sesiones para trabajos que viven más allá de la petición."""
+
+    return SessionLocal
+
+
 def get_db() -> Generator:
     """Proporciona una sesión de base de datos para dependencias FastAPI."""
 
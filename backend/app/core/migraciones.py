@@ -0,0 +1,104 @@
+"""Migraciones ligeras e idempotentes para bases de datos existentes.
+
+`Base.metadata.create_all` solo crea tablas que no existen, así que los
+cambios de esquema sobre tablas ya creadas se aplican aquí. Cada paso
+comprueba el estado actual antes de actuar para poder ejecutarse en cada
+arranque sin efectos secundarios.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import Connection, Engine, bindparam, inspect, select, text, update
+
+from backend.app.models import Movimiento, ReglaAutoCategoria
+from backend.app.models.busqueda import crear_indice_texto
+from backend.app.models.entities import PRIORIDAD_REGLA_POR_DEFECTO, TipoMatch, calcular_huella
+
+TAMANO_LOTE_BACKFILL = 1000
+
+
+def _columnas(conn: Connection, tabla: str) -> set[str]:
+    return {columna["name"] for columna in inspect(conn).get_columns(tabla)}
+
+
+def _migrar_huella_movimientos(conn: Connection) -> None:
+    """Añade la columna `huella` con su índice y la rellena en lotes."""
+
+    tabla = Movimiento.__table__
+    if "huella" not in _columnas(conn, tabla.name):
+        conn.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN huella VARCHAR(64)"))
+    for indice in tabla.indexes:
+        if "huella" in indice.columns:
+            indice.create(conn, checkfirst=True)
+
+    actualizar = (
+        update(tabla).where(tabla.c.id == bindparam("b_id")).values(huella=bindparam("b_huella"))
+    )
+    ultimo_id = 0
+    while True:
+        lote = conn.execute(
+            select(tabla.c.id, tabla.c.fecha, tabla.c.importe, tabla.c.concepto)
+            .where(tabla.c.huella.is_(None), tabla.c.id > ultimo_id)
+            .order_by(tabla.c.id)
+            .limit(TAMANO_LOTE_BACKFILL)
+        ).all()
+        if not lote:
+            break
+        conn.execute(
+            actualizar,
+            [
+                {
+                    "b_id": fila.id,
+                    "b_huella": calcular_huella(fila.fecha, fila.importe, fila.concepto),
+                }
+                for fila in lote
+            ],
+        )
+        ultimo_id = lote[-1].id
+
+
+def _migrar_prioridad_reglas(conn: Connection) -> None:
+    """Añade `prioridad` a las reglas con el mismo valor para todas.
+
+    A igual prioridad gana la regla más reciente, que es el resultado que daba
+    la evaluación anterior (todas las reglas en orden de id, gana la última).
+    """
+
+    tabla = ReglaAutoCategoria.__table__
+    if "prioridad" not in _columnas(conn, tabla.name):
+        conn.execute(
+            text(
+                f"ALTER TABLE {tabla.name} ADD COLUMN prioridad INTEGER NOT NULL "
+                f"DEFAULT {PRIORIDAD_REGLA_POR_DEFECTO}"
+            )
+        )
+
+
+def _migrar_tipos_match(conn: Connection) -> None:
+    """Añade al tipo enumerado nativo de PostgreSQL los tipos de coincidencia nuevos.
+
+    En SQLite el Enum es un VARCHAR sin restricciones y no hace falta nada.
+    """
+
+    if conn.dialect.name != "postgresql":
+        return
+    for tipo in TipoMatch:
+        conn.execute(text(f"ALTER TYPE tipomatch ADD VALUE IF NOT EXISTS '{tipo.name}'"))
+
+
+def _migrar_indices_movimientos(conn: Connection) -> None:
+    """Crea los índices de filtrado y ordenación que falten en `movimientos`."""
+
+    for indice in Movimiento.__table__.indexes:
+        indice.create(conn, checkfirst=True)
+
+
+def aplicar_migraciones(engine: Engine) -> None:
+    """Aplica en orden todas las migraciones pendientes."""
+
+    with engine.begin() as conn:
+        _migrar_huella_movimientos(conn)
+        _migrar_prioridad_reglas(conn)
+        _migrar_tipos_match(conn)
+        _migrar_indices_movimientos(conn)
+        crear_indice_texto(conn)
@@ -4,7 +4,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.app.api import categorias, dashboard, health, importacion, metodos_pago, movimientos, reglas, tipos
-from backend.app.core.database import Base, engine
+from backend.app.core.database import Base, SessionLocal, engine
+from backend.app.core.migraciones import aplicar_migraciones
+from backend.app.services.trabajos_importacion import gestor_trabajos
 
 
 def create_app() -> FastAPI:
@@ -28,6 +30,9 @@ def create_app() -> FastAPI:
     )
 
     Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+    with SessionLocal() as db:
+        gestor_trabajos.marcar_interrumpidos(db)
 
     app.include_router(health.router)
     app.include_router(importacion.router)
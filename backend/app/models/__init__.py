@@ -1,11 +1,25 @@
 """Modelos ORM del dominio de gastos."""
 
-from backend.app.models.entities import Categoria, MetodoPago, Movimiento, ReglaAutoCategoria, TipoMovimiento
+# Registra la creación del índice de texto junto a la tabla de movimientos.
+from backend.app.models import busqueda  # noqa: F401
+from backend.app.models.entities import (
+    Categoria,
+    EstadisticaRegla,
+    MetodoPago,
+    Movimiento,
+    PuntoControl,
+    ReglaAutoCategoria,
+    TipoMovimiento,
+    TrabajoImportacion,
+)
 
 __all__ = [
     "Categoria",
+    "EstadisticaRegla",
     "MetodoPago",
     "Movimiento",
+    "PuntoControl",
     "ReglaAutoCategoria",
     "TipoMovimiento",
+    "TrabajoImportacion",
 ]
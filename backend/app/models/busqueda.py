@@ -0,0 +1,203 @@
+"""Índice de texto para buscar en `concepto` y `notas` de los movimientos.
+
+En SQLite se mantiene una tabla FTS5 con el tokenizador `trigram` sincronizada
+por triggers, de modo que cualquier escritura (ORM, inserción masiva por Core
+o borrados) la actualiza sin código adicional en los servicios. En PostgreSQL
+se usan índices GIN `pg_trgm` sobre `lower(...)`, que el planificador aplica
+directamente a los `LIKE '%texto%'`.
+
+`coincide_texto` construye el predicado de búsqueda y elige la variante en el
+momento de compilar según el dialecto, así que `aplicar_filtros` no necesita
+conocer el motor.
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    Connection,
+    column,
+    event,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from backend.app.models.entities import Movimiento
+
+# El tokenizador trigram llegó en SQLite 3.34; con versiones anteriores se
+# mantiene la búsqueda por LIKE.
+FTS_DISPONIBLE = sqlite3.sqlite_version_info >= (3, 34, 0)
+# Con menos caracteres no hay trigramas que buscar en el índice.
+LONGITUD_MINIMA_INDICE = 3
+
+TABLA_FTS = "movimientos_fts"
+# Columnas de `movimientos` indexadas, en el orden de la tabla FTS.
+CAMPOS_TEXTO = ("concepto", "notas")
+# Mientras tenga una fila, las inserciones no se indexan una a una (ver
+# `indexar_en_bloque`).
+TABLA_CARGA = "movimientos_fts_carga"
+_fts = table(TABLA_FTS, column("rowid"))
+
+_DDL_SQLITE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+    "concepto, notas, content='movimientos', content_rowid='id', tokenize='trigram')",
+    f"CREATE TABLE IF NOT EXISTS {TABLA_CARGA} (desde_id INTEGER NOT NULL)",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON movimientos"
+    f" WHEN NOT EXISTS (SELECT 1 FROM {TABLA_CARGA}) BEGIN"
+    f" INSERT INTO {TABLA_FTS}(rowid, concepto, notas) VALUES (new.id, new.concepto, new.notas);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON movimientos BEGIN"
+    f" INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, concepto, notas)"
+    " VALUES ('delete', old.id, old.concepto, old.notas);"
+    " END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF concepto, notas ON movimientos"
+    f" BEGIN"
+    f" INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, concepto, notas)"
+    " VALUES ('delete', old.id, old.concepto, old.notas);"
+    f" INSERT INTO {TABLA_FTS}(rowid, concepto, notas) VALUES (new.id, new.concepto, new.notas);"
+    " END",
+)
+
+_DDL_POSTGRESQL = tuple(
+    f"CREATE INDEX IF NOT EXISTS ix_movimientos_{campo}_trgm"
+    f" ON movimientos USING gin (lower({campo}) gin_trgm_ops)"
+    for campo in ("concepto", "notas")
+)
+
+
+def crear_indice_texto(conn: Connection) -> None:
+    """Crea el índice de texto si falta y lo rellena con los movimientos existentes.
+
+    Es idempotente: se llama al crear la tabla y en cada arranque desde las
+    migraciones.
+    """
+
+    if conn.dialect.name == "sqlite" and FTS_DISPONIBLE:
+        existia = conn.scalar(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+            {"nombre": TABLA_FTS},
+        )
+        for sentencia in _DDL_SQLITE:
+            conn.execute(text(sentencia))
+        if not existia:
+            conn.execute(text(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        # Crear la extensión puede requerir permisos que el usuario no tenga; en
+        # ese caso la búsqueda sigue funcionando por LIKE sin índice.
+        try:
+            with conn.begin_nested():
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for sentencia in _DDL_POSTGRESQL:
+                    conn.execute(text(sentencia))
+        except DBAPIError:
+            pass
+
+
+@event.listens_for(Movimiento.__table__, "after_create")
+def _crear_tras_tabla(target, connection, **kw) -> None:
+    crear_indice_texto(connection)
+
+
+@event.listens_for(Movimiento.__table__, "before_drop")
+def _borrar_antes_de_tabla(target, connection, **kw) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLA_FTS}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {TABLA_CARGA}"))
+
+
+@contextmanager
+def indexar_en_bloque(conn: Connection) -> Iterator[None]:
+    """Indexa de una vez los movimientos insertados dentro del bloque.
+
+    El trigger de inserción indexa fila a fila y cada sentencia vacía el búfer
+    de FTS5, lo que multiplica el coste de una importación masiva. Dentro del
+    bloque el trigger queda en pausa y al salir las filas nuevas se añaden con
+    un único `INSERT ... SELECT`. Todo son escrituras en la misma transacción:
+    si la importación falla, el rollback deja el índice como estaba.
+    """
+
+    if conn.dialect.name != "sqlite" or not FTS_DISPONIBLE:
+        yield
+        return
+    conn.execute(
+        text(f"INSERT INTO {TABLA_CARGA} (desde_id) SELECT coalesce(max(id), 0) FROM movimientos")
+    )
+    yield
+    conn.execute(
+        text(
+            f"INSERT INTO {TABLA_FTS}(rowid, concepto, notas)"
+            " SELECT id, concepto, notas FROM movimientos"
+            f" WHERE id > (SELECT max(desde_id) FROM {TABLA_CARGA})"
+        )
+    )
+    conn.execute(text(f"DELETE FROM {TABLA_CARGA}"))
+
+
+class _SegunDialecto(ColumnElement):
+    """Predicado con una variante para SQLite y otra para el resto de motores."""
+
+    inherit_cache = True
+    _traverse_internals = [
+        ("sqlite", InternalTraversal.dp_clauseelement),
+        ("generico", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, sqlite: ColumnElement, generico: ColumnElement):
+        self.sqlite = sqlite
+        self.generico = generico
+
+    def self_group(self, against=None):
+        # Cada variante se agrupa según su propio operador (el OR genérico
+        # necesita paréntesis dentro de un AND).
+        return _SegunDialecto(self.sqlite.self_group(against), self.generico.self_group(against))
+
+
+@compiles(_SegunDialecto)
+def _compilar_generico(elemento, compiler, **kw):
+    return compiler.process(elemento.generico, **kw)
+
+
+@compiles(_SegunDialecto, "sqlite")
+def _compilar_sqlite(elemento, compiler, **kw):
+    return compiler.process(elemento.sqlite, **kw)
+
+
+def coincide_texto(termino: str, campos: Sequence[str] = CAMPOS_TEXTO) -> ColumnElement:
+    """Movimientos en los que alguno de `campos` contiene `termino` sin distinguir mayúsculas.
+
+    En SQLite, con términos de al menos tres caracteres, se resuelve con una
+    frase en la tabla FTS: una frase de trigramas consecutivos equivale a
+    buscar la subcadena, y el coste depende de las coincidencias y no del
+    tamaño de la tabla. En el resto de motores es `lower(campo) LIKE`, la
+    misma expresión que los índices `pg_trgm`.
+    """
+
+    # `%` y `_` se escapan para buscar el literal, igual que la frase de FTS5.
+    literal_like = re.sub(r"([/%_])", r"/\1", termino.lower())
+    generico = or_(
+        *(
+            func.lower(getattr(Movimiento, campo)).like(f"%{literal_like}%", escape="/")
+            for campo in campos
+        )
+    )
+    if not FTS_DISPONIBLE or len(termino) < LONGITUD_MINIMA_INDICE:
+        return generico
+    frase = '"' + termino.replace('"', '""') + '"'
+    if set(campos) != set(CAMPOS_TEXTO):
+        # Filtro de columnas de FTS5: `{concepto} : "frase"`.
+        frase = "{" + " ".join(campos) + "} : " + frase
+    coincide = literal_column(TABLA_FTS).op("MATCH")(literal(frase))
+    return _SegunDialecto(Movimiento.id.in_(select(_fts.c.rowid).where(coincide)), generico)
@@ -2,14 +2,48 @@
 
 from __future__ import annotations
 
-from datetime import date
+import re
+from datetime import date, datetime
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import Boolean, CheckConstraint, Date, Enum as SqlEnum, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
+    Date,
+    DateTime,
+    Enum as SqlEnum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from backend.app.core.database import Base
+from backend.app.core.security import hash_text
+
+
+# Prioridad de las reglas creadas sin indicarla (y de las existentes al migrar).
+PRIORIDAD_REGLA_POR_DEFECTO = 100
+
+
+def normalizar_concepto(valor: Optional[str]) -> str:
+    """Normaliza un concepto igual que la detección de duplicados del importador."""
+
+    return " ".join((valor or "").split()).lower()
+
+
+def calcular_huella(fecha: date, importe: float, concepto: Optional[str]) -> str:
+    """Huella de deduplicación a partir de fecha, importe y concepto normalizado.
+
+    El importe se redondea a céntimos para que la comparación no dependa de la
+    representación en coma flotante.
+    """
+
+    return hash_text(f"{fecha.isoformat()}|{importe:.2f}|{normalizar_concepto(concepto)}")
 
 
 class CampoObjetivo(str, Enum):
@@ -20,9 +54,62 @@ class CampoObjetivo(str, Enum):
 
 
 class TipoMatch(str, Enum):
-    """Tipo de coincidencia. De momento solo se contempla "contains"."""
+    """Tipo de coincidencia; todas ignoran mayúsculas."""
 
     contains = "contains"
+    starts_with = "starts_with"
+    word = "word"
+    regex = "regex"
+
+
+# Referencias a grupos por número o nombre: dejarían de apuntar al grupo
+# correcto al combinar varias expresiones en una sola alternancia.
+_REFERENCIA_GRUPO = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(")
+
+
+def expresion_regular(tipo: TipoMatch, patron: str) -> str:
+    """Expresión regular equivalente a una regla que no es "contains".
+
+    Se evalúa sobre el texto en minúsculas: los patrones literales se pasan a
+    minúsculas y las expresiones del usuario se envuelven en `(?i:...)`.
+    """
+
+    if tipo == TipoMatch.starts_with:
+        return "^" + re.escape(patron.lower())
+    if tipo == TipoMatch.word:
+        return r"(?<!\w)" + re.escape(patron.lower()) + r"(?!\w)"
+    return f"(?i:{patron})"
+
+
+def validar_patron(tipo: TipoMatch, patron: str) -> None:
+    """Comprueba que una regla "regex" se puede compilar y combinar con otras.
+
+    Raises:
+        ValueError: con el motivo, si la expresión no es válida.
+    """
+
+    if tipo != TipoMatch.regex:
+        return
+    try:
+        compilada = re.compile(patron)
+    except re.error as exc:
+        raise ValueError(f"Expresión regular no válida: {exc}") from exc
+    if compilada.groupindex or _REFERENCIA_GRUPO.search(patron):
+        raise ValueError("La expresión no puede usar grupos con nombre ni referencias a grupos")
+    try:
+        re.compile(f"(?=(?P<r0>{expresion_regular(tipo, patron)}))")
+    except re.error as exc:
+        raise ValueError(f"La expresión no se puede combinar con otras reglas: {exc}") from exc
+
+
+class EstadoTrabajo(str, Enum):
+    """Ciclo de vida de un trabajo de importación en segundo plano."""
+
+    pendiente = "pendiente"
+    en_curso = "en_curso"
+    completado = "completado"
+    cancelado = "cancelado"
+    error = "error"
 
 
 class TipoMovimiento(Base):
@@ -63,7 +150,11 @@ class MetodoPago(Base):
 
 
 class ReglaAutoCategoria(Base):
-    """Reglas que permiten asignar categorías automáticamente."""
+    """Reglas que permiten asignar categorías automáticamente.
+
+    Se evalúan por `prioridad` ascendente y, a igual prioridad, de la más
+    reciente a la más antigua; gana la primera que coincide.
+    """
 
     __tablename__ = "reglas_auto_categoria"
 
@@ -72,8 +163,30 @@ class ReglaAutoCategoria(Base):
     campo_objetivo: Mapped[CampoObjetivo] = mapped_column(SqlEnum(CampoObjetivo), nullable=False)
     tipo_match: Mapped[TipoMatch] = mapped_column(SqlEnum(TipoMatch), nullable=False, default=TipoMatch.contains)
     categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id", ondelete="CASCADE"), nullable=False)
+    prioridad: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=PRIORIDAD_REGLA_POR_DEFECTO,
+        server_default=str(PRIORIDAD_REGLA_POR_DEFECTO),
+    )
 
     categoria: Mapped[Categoria] = relationship("Categoria", back_populates="reglas")
+    estadistica: Mapped[Optional[EstadisticaRegla]] = relationship(
+        "EstadisticaRegla", cascade="all, delete-orphan", uselist=False
+    )
+
+
+class EstadisticaRegla(Base):
+    """Aciertos y tiempo de evaluación acumulados de una regla."""
+
+    __tablename__ = "estadisticas_reglas"
+
+    regla_id: Mapped[int] = mapped_column(
+        ForeignKey("reglas_auto_categoria.id", ondelete="CASCADE"), primary_key=True
+    )
+    aciertos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tiempo_ms: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    ultimo_acierto: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
 
 class Movimiento(Base):
@@ -82,12 +195,17 @@ class Movimiento(Base):
     __tablename__ = "movimientos"
     __table_args__ = (
         CheckConstraint("importe != 0", name="ck_importe_no_cero"),
+        # Filtro por categoría con el orden por fecha por defecto. El importe lo
+        # completa para que las sumas por categoría del dashboard salgan solo del
+        # índice. Tipo y método de pago tienen tan pocos valores que recorrer la
+        # tabla sale más barato que buscar por índice.
+        Index("ix_movimientos_categoria_id_fecha", "categoria_id", "fecha", "importe"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False, index=True)
     concepto: Mapped[str] = mapped_column(String(255), nullable=False)
-    importe: Mapped[float] = mapped_column(Float, nullable=False)
+    importe: Mapped[float] = mapped_column(Float, nullable=False, index=True)
     saldo: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     notas: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
 
@@ -98,14 +216,51 @@ class Movimiento(Base):
     anio: Mapped[int] = mapped_column(Integer, nullable=False)
     mes: Mapped[int] = mapped_column(Integer, nullable=False)
     mes_anio: Mapped[str] = mapped_column(String(7), nullable=False, index=True)
+    huella: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
 
     tipo: Mapped[TipoMovimiento] = relationship("TipoMovimiento", back_populates="movimientos")
     categoria: Mapped[Categoria] = relationship("Categoria", back_populates="movimientos")
     metodo_pago: Mapped[MetodoPago] = relationship("MetodoPago", back_populates="movimientos")
 
     def rellenar_campos_derivados(self) -> None:
-        """Calcula valores derivados a partir de la fecha."""
+        """Calcula valores derivados a partir de la fecha y la huella de duplicados."""
 
         self.anio = self.fecha.year
         self.mes = self.fecha.month
         self.mes_anio = f"{self.fecha.year:04d}-{self.fecha.month:02d}"
+        self.huella = calcular_huella(self.fecha, self.importe, self.concepto)
+
+
+class TrabajoImportacion(Base):
+    """Importación CSV ejecutada en segundo plano con su progreso persistido."""
+
+    __tablename__ = "trabajos_importacion"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    estado: Mapped[EstadoTrabajo] = mapped_column(
+        SqlEnum(EstadoTrabajo), nullable=False, default=EstadoTrabajo.pendiente
+    )
+    filas_leidas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    filas_duplicadas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    filas_insertadas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    filas_error: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    mensaje: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    creado: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    actualizado: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class PuntoControl(Base):
+    """Progreso persistido de procesos largos para poder reanudarlos."""
+
+    __tablename__ = "puntos_control"
+
+    clave: Mapped[str] = mapped_column(String(64), primary_key=True)
+    ultimo_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    firma: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    procesados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    actualizados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    actualizado: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+from backend.app.models.entities import EstadoTrabajo
 
 
 class BankFormat(str, Enum):
@@ -61,6 +63,21 @@ class ImportOptions(BaseModel):
     )
 
 
+class NumberFormat(BaseModel):
+    """Convenciones numéricas detectadas en una columna de importes."""
+
+    decimal_separator: str = Field(default=".", description="Separador decimal: ',' o '.'.")
+    thousands_separator: Optional[str] = Field(
+        default=None, description="Separador de miles ('.', ',', espacio o apóstrofo), si lo hay."
+    )
+    currency: Optional[str] = Field(
+        default=None, description="Símbolo o código de moneda presente en los valores."
+    )
+    trailing_sign: bool = Field(
+        default=False, description="El signo aparece tras el número, como en '12,50-'."
+    )
+
+
 class CsvAnalysisResult(BaseModel):
     """Respuesta del análisis inicial del CSV subido."""
 
@@ -70,6 +87,21 @@ class CsvAnalysisResult(BaseModel):
     suggested_mapping: Optional[ColumnMapping] = None
     warnings: list[str] = Field(default_factory=list)
     separator: Optional[str] = None
+    file_size: Optional[int] = Field(default=None, description="Tamaño del fichero en bytes.")
+    estimated_rows: Optional[int] = Field(
+        default=None, description="Filas de datos, estimadas si el fichero es grande."
+    )
+    rows_exact: bool = Field(
+        default=True, description="Indica si `estimated_rows` es un recuento exacto."
+    )
+    number_formats: dict[str, NumberFormat] = Field(
+        default_factory=dict,
+        description="Formato numérico detectado por columna de importe del mapeo sugerido.",
+    )
+    token: Optional[str] = Field(
+        default=None,
+        description="Referencia al fichero en caché para previsualizar e importar sin resubirlo.",
+    )
 
 
 class CsvPreviewRow(BaseModel):
@@ -108,3 +140,18 @@ class CsvImportResult(BaseModel):
     total_rows: int
     examples_errors: list[CsvPreviewRow] = Field(default_factory=list)
 
+
+class TrabajoImportacionRead(BaseModel):
+    """Estado y progreso de una importación en segundo plano."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    estado: EstadoTrabajo
+    filas_leidas: int
+    filas_duplicadas: int
+    filas_insertadas: int
+    filas_error: int
+    mensaje: Optional[str] = None
+    creado: datetime
+    actualizado: datetime
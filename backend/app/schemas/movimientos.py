@@ -92,11 +92,17 @@ class MovimientoAggregates(BaseModel):
 
 
 class MovimientoListResponse(BaseModel):
-    """Respuesta paginada de movimientos con agregados."""
+    """Respuesta paginada de movimientos con agregados.
+
+    `next_cursor`/`prev_cursor` permiten seguir paginando por cursor desde
+    cualquier página; en ese modo `page` es None.
+    """
 
     items: list[MovimientoListItem]
-    page: int
+    page: Optional[int]
     page_size: int
     total_items: int
     total_pages: int
     aggregates: MovimientoAggregates
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
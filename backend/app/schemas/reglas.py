@@ -1,8 +1,25 @@
 """Esquemas para reglas de autocategorización."""
 
-from pydantic import BaseModel, ConfigDict
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
 
-from backend.app.models.entities import CampoObjetivo, TipoMatch
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from backend.app.models.entities import (
+    PRIORIDAD_REGLA_POR_DEFECTO,
+    CampoObjetivo,
+    TipoMatch,
+    validar_patron,
+)
+
+
+class ModoReaplicacion(str, Enum):
+    """Estrategia con la que `/reglas/reaplicar` recorre los movimientos."""
+
+    sql = "sql"
+    bloques = "bloques"
+    memoria = "memoria"
 
 
 class ReglaBase(BaseModel):
@@ -10,6 +27,16 @@ class ReglaBase(BaseModel):
     campo_objetivo: CampoObjetivo
     tipo_match: TipoMatch = TipoMatch.contains
     categoria_id: int
+    prioridad: int = Field(
+        default=PRIORIDAD_REGLA_POR_DEFECTO,
+        ge=0,
+        description="Orden de evaluación: menor primero; a igual prioridad, la regla más reciente",
+    )
+
+    @model_validator(mode="after")
+    def _validar_patron(self):
+        validar_patron(self.tipo_match, self.pattern)
+        return self
 
 
 class ReglaCreate(ReglaBase):
@@ -25,3 +52,45 @@ class ReglaRead(ReglaBase):
 
     model_config = ConfigDict(from_attributes=True)
     id: int
+
+
+class ImpactoCategoria(BaseModel):
+    """Movimientos que una regla sacaría de una categoría."""
+
+    categoria_id: Optional[int]
+    categoria_nombre: Optional[str]
+    movimientos: int
+
+
+class MovimientoAfectado(BaseModel):
+    """Movimiento de muestra que cambiaría de categoría."""
+
+    id: int
+    fecha: date
+    concepto: str
+    notas: Optional[str]
+    importe: float
+    categoria_id: Optional[int]
+
+
+class SimulacionRegla(BaseModel):
+    """Resultado de simular una regla sin guardarla."""
+
+    coincidencias: int
+    a_recategorizar: int
+    por_categoria: list[ImpactoCategoria]
+    muestra: list[MovimientoAfectado]
+
+
+class EstadisticaReglaRead(BaseModel):
+    """Aciertos acumulados de una regla; las reglas sin aciertos aparecen con 0."""
+
+    regla_id: int
+    pattern: str
+    campo_objetivo: CampoObjetivo
+    tipo_match: TipoMatch
+    prioridad: int
+    categoria_id: int
+    aciertos: int
+    tiempo_ms: float
+    ultimo_acierto: Optional[datetime]
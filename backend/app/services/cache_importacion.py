@@ -0,0 +1,158 @@
+"""Caché de ficheros subidos compartida por analizar → previsualizar → importar.
+
+El asistente de importación trabaja tres veces sobre el mismo CSV. En lugar de
+volver a subirlo, leerlo y parsearlo en cada paso, `analyze` lo registra bajo un
+token aleatorio y los pasos siguientes reutilizan el DataFrame ya parseado. La
+caché está acotada por tamaño total (LRU) y por antigüedad (TTL). Un DataFrame
+ocupa varias veces lo que el fichero; si el de una subida no cabe en la caché,
+se conserva el fichero en bruto y cada paso lo vuelve a leer en streaming.
+"""
+
+from __future__ import annotations
+
+import io
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import BinaryIO, Optional
+
+import pandas as pd
+
+from backend.app.core.config import get_settings
+from backend.app.services.importador_csv import CsvParseado, OrigenCsv, _leer_csv_por_bloques
+
+
+@dataclass
+class _Entrada:
+    """Fichero registrado; se guarda en bruto hasta que alguien lo parsea.
+
+    `solo_en_bruto` marca los ficheros cuyo DataFrame no cabe en la caché.
+    """
+
+    contenido: Optional[bytes]
+    expira: float
+    tamano: int
+    parseado: Optional[CsvParseado] = None
+    solo_en_bruto: bool = False
+    cerrojo: threading.Lock = field(default_factory=threading.Lock)
+
+
+class CacheImportaciones:
+    """LRU con TTL de CSV subidos, indexada por un token aleatorio por subida."""
+
+    def __init__(self, max_bytes: int, ttl_segundos: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self._entradas: OrderedDict[str, _Entrada] = OrderedDict()
+        self._total = 0
+        self._cerrojo = threading.Lock()
+
+    def registrar(self, stream: BinaryIO) -> Optional[str]:
+        """Guarda el fichero y devuelve su token, o None si no cabe en la caché.
+
+        El token no se deriva del contenido: calcular un hash obligaría a
+        recorrer el fichero entero y una huella parcial (tamaño, primer y último
+        bloque) podría confundir dos ficheros distintos. El único coste
+        proporcional al tamaño es copiar el fichero a la caché; subir el mismo
+        CSV dos veces ocupa dos entradas, que el LRU acaba expulsando.
+        """
+
+        stream.seek(0, 2)
+        tamano = stream.tell()
+        stream.seek(0)
+        if tamano > self.max_bytes:
+            return None
+        contenido = stream.read()
+        stream.seek(0)
+        token = secrets.token_hex(16)
+        with self._cerrojo:
+            self._entradas[token] = _Entrada(
+                contenido=contenido, expira=time.monotonic() + self.ttl_segundos, tamano=tamano
+            )
+            self._total += tamano
+            self._purgar()
+        return token
+
+    def obtener(self, token: str) -> Optional[OrigenCsv]:
+        """Devuelve el CSV del token, parseándolo la primera vez.
+
+        Si el DataFrame no cabe en la caché se devuelve el fichero en bruto
+        como stream, para que la previsualización y la importación lo lean por
+        bloques sin materializarlo entero.
+        """
+
+        with self._cerrojo:
+            self._purgar()
+            entrada = self._entradas.get(token)
+            if entrada is None:
+                return None
+            entrada.expira = time.monotonic() + self.ttl_segundos
+            self._entradas.move_to_end(token)
+
+        with entrada.cerrojo:
+            if entrada.parseado is None and not entrada.solo_en_bruto:
+                parseado = _parsear_acotado(entrada.contenido, self.max_bytes)
+                if parseado is None:
+                    entrada.solo_en_bruto = True
+                else:
+                    entrada.parseado, nuevo_tamano = parseado
+                    with self._cerrojo:
+                        # El fichero en bruto ya no es necesario una vez parseado.
+                        entrada.contenido = None
+                        if self._entradas.get(token) is entrada:
+                            self._total += nuevo_tamano - entrada.tamano
+                        entrada.tamano = nuevo_tamano
+                        self._purgar(proteger=token)
+            if entrada.solo_en_bruto:
+                return io.BytesIO(entrada.contenido)
+            return entrada.parseado
+
+    def limpiar(self) -> None:
+        """Vacía la caché por completo."""
+
+        with self._cerrojo:
+            self._entradas.clear()
+            self._total = 0
+
+    def _purgar(self, proteger: Optional[str] = None) -> None:
+        """Expulsa entradas caducadas y, después, las menos usadas hasta caber.
+
+        Debe llamarse con el cerrojo global tomado.
+        """
+
+        ahora = time.monotonic()
+        for token in [t for t, e in self._entradas.items() if e.expira <= ahora]:
+            self._total -= self._entradas.pop(token).tamano
+        for token in list(self._entradas):
+            if self._total <= self.max_bytes:
+                break
+            if token != proteger:
+                self._total -= self._entradas.pop(token).tamano
+
+
+def _parsear_acotado(contenido: bytes, limite: int) -> Optional[tuple[CsvParseado, int]]:
+    """Parsea el CSV por bloques y abandona en cuanto el DataFrame supera `limite`.
+
+    Devuelve el CSV parseado y los bytes que ocupa en memoria, o None si no
+    cabe. Así nunca se materializa mucho más de `limite`.
+    """
+
+    bloques, separador = _leer_csv_por_bloques(contenido)
+    partes: list[pd.DataFrame] = []
+    tamano = 0
+    for bloque in bloques:
+        tamano += int(bloque.memory_usage(deep=True).sum())
+        if tamano > limite:
+            return None
+        partes.append(bloque)
+    return CsvParseado(pd.concat(partes), separador), tamano
+
+
+_settings = get_settings()
+cache_importaciones = CacheImportaciones(
+    max_bytes=_settings.import_cache_max_mb * 1024 * 1024,
+    ttl_segundos=_settings.import_cache_ttl_seconds,
+)
+"""Instancia compartida por los endpoints de importación."""
@@ -63,7 +63,9 @@ def _serie_mensual(
             func.sum(case((consulta.c.importe > 0, consulta.c.importe), else_=0)).label("total_ingresos"),
             func.sum(consulta.c.importe).label("balance"),
         )
-        .group_by(consulta.c.mes_anio, consulta.c.anio, consulta.c.mes)
+        # Sin índice que empiece por `anio`, SQLite no recorre `ix_movimientos_mes_anio`
+        # entero para agrupar y aprovecha el índice del filtro de fechas.
+        .group_by(consulta.c.anio, consulta.c.mes, consulta.c.mes_anio)
         .order_by(consulta.c.anio, consulta.c.mes)
     )
     return db.execute(query).all()
@@ -7,15 +7,24 @@ movimientos, manteniendo la API limpia y extensible.
 
 from __future__ import annotations
 
+import codecs
 import csv
 import io
-from datetime import date, datetime
-from typing import Iterable, Optional, Tuple
+import re
+from collections import Counter
+from datetime import date
+from operator import itemgetter
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+from sqlalchemy import String, bindparam, insert, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
 
 from backend.app.models import Movimiento
+from backend.app.models.busqueda import indexar_en_bloque
+from backend.app.models.entities import calcular_huella
 from backend.app.schemas.importacion import (
     BankFormat,
     ColumnMapping,
@@ -24,8 +33,34 @@ from backend.app.schemas.importacion import (
     CsvPreviewResult,
     CsvPreviewRow,
     ImportOptions,
+    NumberFormat,
 )
-from backend.app.services.reglas import aplicar_reglas_movimiento
+from backend.app.services.reglas import ReglasCompiladas, compilar_reglas, estadisticas_reglas
+
+
+class ImportacionCancelada(Exception):
+    """Señala que la importación se ha cancelado y debe deshacerse."""
+
+
+class CsvParseado(NamedTuple):
+    """CSV ya leído en memoria junto con el separador detectado."""
+
+    df: pd.DataFrame
+    separador: str
+
+
+class FormatoCsv(NamedTuple):
+    """Convenciones del fichero decididas una vez con el primer bloque."""
+
+    banco: BankFormat
+    fecha: Optional[str]
+    numeros: dict[str, NumberFormat]
+
+
+# Los servicios aceptan el contenido en memoria, un fichero binario (p. ej. el
+# `SpooledTemporaryFile` de una subida) para leerlo en streaming, o un CSV ya
+# parseado procedente de la caché de importación.
+OrigenCsv = Union[bytes, BinaryIO, CsvParseado]
 
 # Columnas típicas por formato para ayudar a la detección automática.
 BANK_PROFILE_COLUMNS: dict[BankFormat, tuple[str, ...]] = {
@@ -46,18 +81,72 @@ BANK_DATE_FORMATS: dict[BankFormat, tuple[str, ...]] = {
 }
 
 
+# Filas por bloque al leer el CSV en streaming con el parser C.
+TAMANO_BLOQUE_CSV = 50_000
+
+# Todas las columnas se leen como texto: si pandas infiriese el tipo, lo haría
+# por separado en cada bloque y un importe como "1.500" se leería como 1.5 o
+# como texto según dónde cayese el corte. Solo la celda vacía cuenta como nula;
+# valores como "NA" o "null" se conservan tal cual.
+OPCIONES_LECTURA_CSV = {"dtype": str, "keep_default_na": False, "na_values": [""]}
+
+# Bytes leídos por iteración al validar la codificación del fichero.
+TAMANO_LECTURA_BYTES = 1 << 20
+
+# Bytes iniciales que lee `analyze_csv`; el resto del fichero no se toca.
+TAMANO_MUESTRA_ANALISIS = 64 * 1024
+
+# Filas de ejemplo devueltas por el análisis.
+FILAS_MUESTRA_ANALISIS = 5
+
+# Valores de fecha examinados para inferir el formato de la columna.
+MUESTRA_INFERENCIA_FECHAS = 500
+
+# Valores examinados para detectar el formato numérico de cada columna de importe.
+MUESTRA_INFERENCIA_IMPORTES = 500
+
+# Símbolos y códigos de moneda que pueden acompañar a los importes.
+PATRON_MONEDA = r"[€$£]|\b(?:EUR|USD|GBP)\b"
+
+# Tabla temporal de la conexión con las huellas del bloque que se está
+# comprobando; en PostgreSQL se usa un array con `unnest` en su lugar.
+TABLA_HUELLAS_BLOQUE = "huellas_bloque_importacion"
+
+# Clave del advisory lock que serializa importaciones en PostgreSQL.
+CLAVE_BLOQUEO_IMPORTACION = 0x6761_7374
+
+# Filas por sentencia executemany (o por bloque COPY en PostgreSQL).
+TAMANO_LOTE_INSERCION = 5000
+
+# Columnas escritas por la inserción masiva de movimientos.
+COLUMNAS_INSERCION = (
+    "fecha",
+    "concepto",
+    "importe",
+    "saldo",
+    "notas",
+    "tipo_id",
+    "categoria_id",
+    "metodo_pago_id",
+    "anio",
+    "mes",
+    "mes_anio",
+    "huella",
+)
+
+
 def detectar_formato_banco(df: pd.DataFrame) -> BankFormat:
     """Devuelve el formato de banco más probable basándose en las cabeceras."""
 
-    columnas = [col.strip().lower() for col in df.columns]
-    puntuaciones: dict[BankFormat, int] = {}
+    columnas = [str(col).strip().lower() for col in df.columns]
+    # Se puntúa por proporción de columnas esperadas encontradas: un perfil con
+    # menos columnas que casa entero gana a otro más largo que casa a medias.
+    puntuaciones: dict[BankFormat, tuple[float, int]] = {}
     for formato, esperadas in BANK_PROFILE_COLUMNS.items():
-        coincidencias = sum(1 for col in columnas for esp in esperadas if esp in col)
-        puntuaciones[formato] = coincidencias
-    if not puntuaciones:
-        return BankFormat.GENERIC
-    mejor_formato = max(puntuaciones.items(), key=lambda x: x[1])[0]
-    return mejor_formato or BankFormat.GENERIC
+        coincidencias = sum(1 for esp in esperadas if any(esp in col for col in columnas))
+        puntuaciones[formato] = (coincidencias / len(esperadas), coincidencias)
+    mejor_formato, mejor = max(puntuaciones.items(), key=lambda x: x[1])
+    return mejor_formato if mejor[1] else BankFormat.GENERIC
 
 
 def _detect_separator(sample: str) -> str:
@@ -70,21 +159,78 @@ def _detect_separator(sample: str) -> str:
         return ","
 
 
-def _read_csv_bytes(file_bytes: bytes) -> Tuple[pd.DataFrame, str]:
-    """Lee el CSV intentando codificaciones comunes y detectando separador."""
+def _abrir_origen(origen: Union[bytes, BinaryIO]) -> BinaryIO:
+    """Normaliza el origen a un flujo binario posicionado al inicio."""
+
+    if isinstance(origen, (bytes, bytearray)):
+        return io.BytesIO(origen)
+    origen.seek(0)
+    return origen
+
+
+def _detectar_codificacion(stream: BinaryIO) -> str:
+    """Valida UTF-8 de forma incremental y recurre a latin-1 si no lo es.
+
+    Se decodifica por bloques y se descarta el texto, de modo que nunca hay una
+    copia completa del fichero en memoria.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            bloque = stream.read(TAMANO_LECTURA_BYTES)
+            if not bloque:
+                decoder.decode(b"", final=True)
+                return "utf-8"
+            decoder.decode(bloque)
+    except UnicodeDecodeError:
+        return "latin-1"
+    finally:
+        stream.seek(0)
 
-    last_error: Optional[Exception] = None
-    for encoding in ("utf-8", "latin-1"):
-        try:
-            sample = file_bytes[:1024].decode(encoding, errors="ignore")
-            sep = _detect_separator(sample)
-            buffer = io.StringIO(file_bytes.decode(encoding))
-            df = pd.read_csv(buffer, sep=sep, engine="python")
-            return df, sep
-        except Exception as exc:  # noqa: BLE001
-            last_error = exc
-            continue
-    raise ValueError(f"No se pudo leer el CSV: {last_error}")
+
+def _iterar_bloques(lector) -> Iterator[pd.DataFrame]:
+    """Recorre el lector de pandas traduciendo errores de parseo a ValueError."""
+
+    try:
+        with lector:
+            yield from lector
+    except (pd.errors.ParserError, UnicodeDecodeError) as exc:
+        raise ValueError(f"No se pudo leer el CSV: {exc}") from exc
+
+
+def _leer_csv_por_bloques(
+    origen: OrigenCsv, chunksize: Optional[int] = None
+) -> Tuple[Iterator[pd.DataFrame], str]:
+    """Lee el CSV en streaming con el parser C, detectando codificación y separador.
+
+    La memoria máxima queda acotada por `chunksize` y no por el tamaño del
+    fichero. El índice de los bloques es continuo, por lo que `raw_index` sigue
+    apuntando a la fila original.
+    """
+
+    tamano = chunksize or TAMANO_BLOQUE_CSV
+    if isinstance(origen, CsvParseado):
+        df = origen.df
+        bloques = (df.iloc[i : i + tamano] for i in range(0, max(len(df), 1), tamano))
+        return bloques, origen.separador
+
+    stream = _abrir_origen(origen)
+    encoding = _detectar_codificacion(stream)
+    sep = _detect_separator(stream.read(1024).decode(encoding, errors="ignore"))
+    stream.seek(0)
+    try:
+        lector = pd.read_csv(
+            stream,
+            sep=sep,
+            engine="c",
+            encoding=encoding,
+            chunksize=tamano,
+            **OPCIONES_LECTURA_CSV,
+        )
+    except Exception as exc:  # noqa: BLE001
+        raise ValueError(f"No se pudo leer el CSV: {exc}") from exc
+    return _iterar_bloques(lector), sep
 
 
 def _suggest_mapping(columns: Iterable[str]) -> Optional[ColumnMapping]:
@@ -119,20 +265,85 @@ def _suggest_mapping(columns: Iterable[str]) -> Optional[ColumnMapping]:
     return mapping
 
 
-def analyze_csv(file_bytes: bytes) -> CsvAnalysisResult:
-    """Analiza el CSV detectando cabeceras, formato bancario y mapeo sugerido."""
+def _leer_muestra(stream: BinaryIO) -> Tuple[str, int, bool]:
+    """Lee el inicio del fichero cortando en la última línea completa.
+
+    Devuelve el texto decodificado, los bytes que ocupa y si la muestra abarca
+    el fichero entero.
+    """
+
+    bruto = stream.read(TAMANO_MUESTRA_ANALISIS + 1)
+    stream.seek(0)
+    completo = len(bruto) <= TAMANO_MUESTRA_ANALISIS
+    if not completo:
+        bruto = bruto[: bruto.rfind(b"\n") + 1] or bruto[:TAMANO_MUESTRA_ANALISIS]
+    try:
+        # Sin `final=True`: un carácter multibyte cortado al final no es un error.
+        texto = codecs.getincrementaldecoder("utf-8")().decode(bruto, final=completo)
+    except UnicodeDecodeError:
+        texto = bruto.decode("latin-1")
+    return texto, len(bruto), completo
+
+
+def _estimar_filas(texto: str, bytes_muestra: int, tamano_fichero: int, completo: bool) -> int:
+    """Cuenta las filas de datos de la muestra y las extrapola al tamaño del fichero.
+
+    La cabecera se descuenta antes de calcular los bytes por fila para que no
+    sesgue la estimación en ficheros con filas cortas.
+    """
+
+    lineas = texto.count("\n") + (1 if texto and not texto.endswith("\n") else 0)
+    filas_muestra = max(lineas - 1, 0)
+    if completo or not filas_muestra:
+        return filas_muestra
+    bytes_cabecera = len(texto[: texto.find("\n") + 1].encode("utf-8", errors="replace"))
+    bytes_por_fila = (bytes_muestra - bytes_cabecera) / filas_muestra
+    return round((tamano_fichero - bytes_cabecera) / bytes_por_fila)
+
+
+def analyze_csv(origen: OrigenCsv) -> CsvAnalysisResult:
+    """Analiza el CSV detectando cabeceras, formato bancario y mapeo sugerido.
+
+    Solo se leen los primeros `TAMANO_MUESTRA_ANALISIS` bytes, de modo que el
+    coste no depende del tamaño del fichero. El número de filas se estima a
+    partir de la densidad de saltos de línea de la muestra.
+    """
+
+    if isinstance(origen, CsvParseado):
+        df, separator = origen
+        filas, tamano, exacto = len(df), None, True
+        cabecera = df.head(MUESTRA_INFERENCIA_IMPORTES)
+    else:
+        stream = _abrir_origen(origen)
+        stream.seek(0, io.SEEK_END)
+        tamano = stream.tell()
+        stream.seek(0)
+        texto, bytes_muestra, exacto = _leer_muestra(stream)
+        separator = _detect_separator(texto[:1024])
+        try:
+            cabecera = pd.read_csv(io.StringIO(texto), sep=separator, **OPCIONES_LECTURA_CSV)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError) as exc:
+            raise ValueError(f"No se pudo leer el CSV: {exc}") from exc
+        filas = _estimar_filas(texto, bytes_muestra, tamano, exacto)
 
-    df, separator = _read_csv_bytes(file_bytes)
-    formato = detectar_formato_banco(df)
-    sample = df.head(5).fillna("").to_dict(orient="records")
-    suggested_mapping = _suggest_mapping(df.columns)
+    warnings = (
+        [] if exacto else ["El número de filas es una estimación a partir del inicio del fichero."]
+    )
+    suggested_mapping = _suggest_mapping(cabecera.columns)
+    number_formats = (
+        _detectar_formatos_numero(cabecera, suggested_mapping) if suggested_mapping else {}
+    )
     return CsvAnalysisResult(
-        format=formato,
-        columns=list(df.columns),
-        sample=sample,
+        format=detectar_formato_banco(cabecera),
+        columns=list(cabecera.columns),
+        sample=cabecera.head(FILAS_MUESTRA_ANALISIS).fillna("").to_dict(orient="records"),
         suggested_mapping=suggested_mapping,
-        warnings=[],
+        warnings=warnings,
         separator=separator,
+        file_size=tamano,
+        estimated_rows=filas,
+        rows_exact=exacto,
+        number_formats=number_formats,
     )
 
 
@@ -147,135 +358,415 @@ def _parse_float(value) -> Optional[float]:
     if not texto:
         return None
     # Reemplazamos separadores europeos.
-    texto = texto.replace(".", "").replace(",", ".") if "," in texto and texto.count(",") == 1 else texto
+    if "," in texto and texto.count(",") == 1:
+        texto = texto.replace(".", "").replace(",", ".")
     try:
         return float(texto)
     except ValueError:
         return None
 
 
-def _parse_date(value, override_format: Optional[str], candidatos: tuple[str, ...]) -> Optional[date]:
-    """Parsea la fecha usando formatos sugeridos o el override indicado."""
+def _columna(df: pd.DataFrame, col: Optional[str], default=None) -> pd.Series:
+    """Devuelve la columna mapeada o una serie constante si no existe en el CSV."""
+
+    if col and col in df.columns:
+        return df[col]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def _texto_columna(serie: pd.Series) -> pd.Series:
+    """Convierte la columna a texto recortado conservando los nulos como NA."""
+
+    return serie.astype("string").str.strip()
+
+
+def _voto_decimal(valor: str) -> Tuple[Optional[str], Optional[str]]:
+    """Deduce el separador decimal de un importe sin moneda ni espacios.
+
+    Devuelve `(decimal, None)` si el valor lo delata o `(None, separador)` si
+    es ambiguo, como `1.234`, que puede ser un entero con miles o un decimal.
+    """
+
+    puntos, comas = valor.count("."), valor.count(",")
+    if puntos and comas:
+        return ("," if valor.rfind(",") > valor.rfind(".") else "."), None
+    separador = "." if puntos else "," if comas else None
+    if separador is None:
+        return None, None
+    if max(puntos, comas) > 1:
+        return ("," if separador == "." else "."), None
+    decimales = len(valor) - valor.rfind(separador) - 1
+    return (separador, None) if decimales != 3 else (None, separador)
+
+
+def _detectar_formato_numero(serie: pd.Series) -> NumberFormat:
+    """Detecta separadores, moneda y signo final de una columna de importes.
+
+    Se examina una muestra y cada valor vota por el separador decimal. Si
+    ninguno es concluyente y todos tienen exactamente tres cifras tras el
+    separador (`1.234`, `2.500`), este se toma como separador de miles: un
+    importe con tres decimales es mucho menos probable.
+    """
+
+    texto = _texto_columna(serie.dropna().head(MUESTRA_INFERENCIA_IMPORTES))
+    muestra = texto[texto.ne("")]
+    if muestra.empty:
+        return NumberFormat()
+
+    monedas = muestra.str.extract(f"({PATRON_MONEDA})", expand=False).dropna()
+    sin_moneda = muestra.str.replace(PATRON_MONEDA, "", regex=True).str.strip()
+    agrupacion = sin_moneda.str.extract(r"\d([ \u00a0'])\d{3}(?!\d)", expand=False).dropna()
+    limpios = sin_moneda.str.replace(r"[\s\u00a0'+\-()]", "", regex=True)
+
+    votos: Counter[str] = Counter()
+    ambiguos: Counter[str] = Counter()
+    for valor in limpios:
+        decimal, ambiguo = _voto_decimal(valor)
+        if decimal:
+            votos[decimal] += 1
+        elif ambiguo:
+            ambiguos[ambiguo] += 1
+    if votos:
+        decimal = votos.most_common(1)[0][0]
+    elif ambiguos:
+        decimal = "," if ambiguos.most_common(1)[0][0] == "." else "."
+    else:
+        decimal = "."
+    otro = "," if decimal == "." else "."
+    if limpios.str.contains(otro, regex=False).any():
+        miles: Optional[str] = otro
+    elif not agrupacion.empty:
+        miles = " " if agrupacion.mode().iat[0] != "'" else "'"
+    else:
+        miles = None
+    return NumberFormat(
+        decimal_separator=decimal,
+        thousands_separator=miles,
+        currency=monedas.mode().iat[0] if not monedas.empty else None,
+        trailing_sign=bool(sin_moneda.str.contains(r"\d\s*[-+]$").any()),
+    )
+
+
+def _detectar_formatos_numero(df: pd.DataFrame, mapping: ColumnMapping) -> dict[str, NumberFormat]:
+    """Formato numérico de cada columna de importe mapeada presente en el CSV."""
+
+    columnas = (mapping.importe_col, mapping.debe_col, mapping.haber_col, mapping.saldo_col)
+    return {col: _detectar_formato_numero(df[col]) for col in columnas if col and col in df.columns}
+
+
+def _parse_float_column(serie: pd.Series, formato: Optional[NumberFormat] = None) -> pd.Series:
+    """Convierte una columna de importes a float64 con NaN en los inválidos.
+
+    Con el formato de la columna (detectado si no se indica) se quitan moneda,
+    espacios y separador de miles y se normaliza el decimal con operaciones de
+    texto vectorizadas. Los valores que contradicen el formato, como `12.50`
+    en una columna con coma decimal, pasan por el parser escalar `_parse_float`.
+    """
+
+    formato = formato or _detectar_formato_numero(serie)
+    texto = _texto_columna(serie)
+    limpio = texto
+    # Cada transformación solo se aplica si el formato la necesita.
+    if formato.currency:
+        limpio = limpio.str.replace(PATRON_MONEDA, "", regex=True).str.strip()
+    if formato.trailing_sign:
+        limpio = limpio.str.replace(r"^(.*\d)\s*([-+])$", r"\2\1", regex=True)
+    # El formato puede venir del primer bloque, que quizá no tenía miles; el
+    # signo que no es el decimal solo puede ser separador de miles.
+    miles = formato.thousands_separator or ("." if formato.decimal_separator == "," else ",")
+    if miles and miles.strip():
+        # Un separador de miles mal agrupado (`12.50` con coma decimal)
+        # contradice el formato: se deja al parser escalar.
+        decimal = re.escape(formato.decimal_separator)
+        grupos = rf"\d{{1,3}}(?:{re.escape(miles)}\d{{3}})+|\d+"
+        bien_agrupado = limpio.str.fullmatch(rf"[+-]?(?:{grupos})(?:{decimal}\d*)?").fillna(False)
+        limpio = limpio.where(bien_agrupado)
+        limpio = limpio.str.replace(miles, "", regex=False)
+    elif miles:
+        limpio = limpio.str.replace(" ", "", regex=False).str.replace("\u00a0", "", regex=False)
+    if formato.decimal_separator != ".":
+        limpio = limpio.str.replace(formato.decimal_separator, ".", regex=False)
+    numeros = pd.to_numeric(limpio, errors="coerce")
+    resultado = pd.Series(
+        numeros.astype("Float64").to_numpy(dtype="float64", na_value=np.nan), index=serie.index
+    )
+    pendientes = resultado.isna() & texto.fillna("").ne("")
+    if pendientes.any():
+        resultado[pendientes] = texto[pendientes].map(_parse_float).astype("float64")
+    return resultado
+
+
+def _formatos_fecha(override_format: Optional[str], candidatos: tuple[str, ...]) -> list[str]:
+    """Formatos a probar en orden de preferencia: el indicado por el usuario primero."""
 
-    if pd.isna(value):
-        return None
-    if isinstance(value, date):
-        return value
-    texto = str(value).strip()
-    if not texto:
-        return None
     formatos = [override_format] if override_format else []
     formatos.extend([f for f in candidatos if f not in formatos])
-    for fmt in formatos:
-        try:
-            return datetime.strptime(texto, fmt).date()
-        except Exception:  # noqa: BLE001
-            continue
-    try:
-        return pd.to_datetime(texto, dayfirst=True, errors="coerce").date()
-    except Exception:  # noqa: BLE001
+    return formatos
+
+
+def _inferir_formato_fecha(
+    serie: pd.Series, override_format: Optional[str], candidatos: tuple[str, ...]
+) -> Optional[str]:
+    """Elige el formato de fecha de la columna a partir de una muestra.
+
+    Gana el formato que más valores de la muestra reconoce (a igualdad, el de
+    mayor preferencia). Si otro formato explica valores que el ganador no
+    reconoce, la columna es mixta y se devuelve None.
+    """
+
+    texto = _texto_columna(serie).dropna()
+    muestra = texto[texto.ne("")].head(MUESTRA_INFERENCIA_FECHAS).unique()
+    if not len(muestra):
+        return override_format
+    muestra = pd.Series(muestra)
+    aciertos = {
+        fmt: pd.to_datetime(muestra, format=fmt, errors="coerce").notna()
+        for fmt in _formatos_fecha(override_format, candidatos)
+    }
+    ganador = max(aciertos, key=lambda fmt: int(aciertos[fmt].sum()))
+    if not aciertos[ganador].any():
         return None
+    reconocidos = pd.concat(aciertos.values(), axis=1).any(axis=1)
+    return ganador if reconocidos.equals(aciertos[ganador]) else None
 
 
-def _normalize_concept(value: str, limpiar: bool) -> str:
-    """Normaliza un concepto para detección de duplicados y consistencia."""
+def _inferir_formato_csv(
+    df: pd.DataFrame, mapping: ColumnMapping, options: ImportOptions
+) -> FormatoCsv:
+    """Detecta banco, formato de fecha y formatos numéricos a partir de un bloque."""
+
+    banco = detectar_formato_banco(df)
+    fecha = _inferir_formato_fecha(
+        _columna(df, mapping.fecha_col),
+        options.formato_fecha,
+        BANK_DATE_FORMATS.get(banco, ("%Y-%m-%d",)),
+    )
+    return FormatoCsv(banco, fecha, _detectar_formatos_numero(df, mapping))
+
+
+def _parse_date_column(
+    serie: pd.Series,
+    formato_fecha: Optional[str],
+    override_format: Optional[str],
+    candidatos: tuple[str, ...],
+) -> pd.Series:
+    """Parsea la columna de fechas; devuelve datetime64 con NaT en inválidos.
+
+    Con un formato inferido la columna se parsea en una sola llamada con ese
+    formato exacto; las filas que no encajan solo prueban los demás formatos
+    exactos, por lo que una fecha imposible como `2024-13-01` queda inválida.
+    En columnas mixtas (`formato_fecha` None) lo que ningún formato reconoce
+    pasa por el parser flexible una vez por valor distinto.
+    """
+
+    texto = _texto_columna(serie)
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    formatos = _formatos_fecha(override_format, candidatos)
+    if formato_fecha:
+        formatos = [formato_fecha] + [f for f in formatos if f != formato_fecha]
+    pendientes = texto.fillna("").ne("")
+    for fmt in formatos:
+        if not pendientes.any():
+            break
+        parseadas = pd.to_datetime(texto[pendientes], format=fmt, errors="coerce")
+        resultado[pendientes] = parseadas
+        pendientes &= resultado.isna()
+    if formato_fecha is None and pendientes.any():
+        memo = {
+            valor: pd.to_datetime(valor, dayfirst=True, errors="coerce")
+            for valor in texto[pendientes].unique()
+        }
+        resultado[pendientes] = texto[pendientes].map(memo).astype("datetime64[ns]")
+    return resultado
+
+
+def _normalize_concept_column(serie: pd.Series, limpiar: bool) -> pd.Series:
+    """Normaliza los conceptos (espacios repetidos y extremos) sobre textos ya convertidos."""
 
-    texto = value or ""
     if limpiar:
-        texto = " ".join(texto.split())
-    return texto.strip()
+        serie = serie.str.replace(r"\s+", " ", regex=True)
+    return serie.str.strip()
+
+
+def _a_lista(serie: pd.Series) -> list:
+    """Convierte la serie a objetos Python sustituyendo NaN/NaT por None."""
 
+    return serie.astype(object).where(serie.notna(), None).tolist()
 
-def _buscar_duplicado(
-    db: Session, fecha: Optional[date], concepto_norm: str, importe: Optional[float]
-) -> bool:
-    """Comprueba si ya existe un movimiento con misma fecha, concepto e importe."""
 
-    if fecha is None or importe is None:
-        return False
-    candidatos = (
-        db.query(Movimiento)
-        .filter(Movimiento.fecha == fecha, Movimiento.importe == importe)
-        .all()
+def _normalizar_columnas(
+    df: pd.DataFrame,
+    mapping: ColumnMapping,
+    options: ImportOptions,
+    formato: FormatoCsv,
+) -> pd.DataFrame:
+    """Parsea de una vez todas las columnas mapeadas del CSV.
+
+    Devuelve un DataFrame con los campos ya tipados (fecha, concepto, importe,
+    saldo, notas y tipo) para que la construcción de filas solo tenga que
+    recorrer valores Python. `formato` procede de `_inferir_formato_csv`,
+    calculado una vez por fichero.
+    """
+
+    fechas = _parse_date_column(
+        _columna(df, mapping.fecha_col),
+        formato.fecha,
+        options.formato_fecha,
+        BANK_DATE_FORMATS.get(formato.banco, ("%Y-%m-%d",)),
+    )
+    conceptos = _normalize_concept_column(
+        _columna(df, mapping.concepto_col, "").astype(str), options.limpiar_concepto
+    )
+
+    def importe(col: Optional[str]) -> pd.Series:
+        if not col:
+            return pd.Series(np.nan, index=df.index)
+        return _parse_float_column(_columna(df, col), formato.numeros.get(col))
+
+    if mapping.importe_col:
+        importes = importe(mapping.importe_col)
+    else:
+        debe, haber = importe(mapping.debe_col), importe(mapping.haber_col)
+        importes = (haber.fillna(0) - debe.fillna(0)).where(debe.notna() | haber.notna())
+    saldos = importe(mapping.saldo_col)
+    if mapping.notas_col:
+        notas = _columna(df, mapping.notas_col, "").astype(str).str.strip()
+    else:
+        notas = pd.Series(None, index=df.index, dtype=object)
+
+    tipos = np.full(len(df.index), options.default_tipo_id, dtype=object)
+    if options.detectar_tipo_por_signo:
+        con_importe = importes.notna().to_numpy()
+        tipos[con_importe] = np.where(importes.to_numpy()[con_importe] < 0, 1, 2)
+
+    return pd.DataFrame(
+        {
+            "fecha": fechas.dt.date.where(fechas.notna(), None),
+            "concepto": conceptos,
+            "importe": importes,
+            "saldo": saldos,
+            "notas": notas,
+            "tipo_id": tipos,
+        },
+        index=df.index,
+    )
+
+
+def _huellas_existentes(db: Session, huellas: Iterable[str]) -> set[str]:
+    """Devuelve las huellas ya almacenadas cruzándolas de una vez con su índice.
+
+    En PostgreSQL las huellas viajan como un array que `unnest` expande; en el
+    resto de motores se cargan en una tabla temporal de la conexión. En ambos
+    casos hay una sola consulta por bloque del CSV, sea cual sea su tamaño.
+    """
+
+    pendientes = [{"huella": huella} for huella in set(huellas)]
+    if not pendientes:
+        return set()
+    tabla = Movimiento.__tablename__
+    if db.get_bind().dialect.name == "postgresql":
+        consulta = text(
+            f"SELECT m.huella FROM {tabla} AS m"
+            " JOIN unnest(:huellas) AS b(huella) ON b.huella = m.huella"
+        ).bindparams(bindparam("huellas", type_=postgresql.ARRAY(String)))
+        return set(db.scalars(consulta, {"huellas": [p["huella"] for p in pendientes]}))
+
+    db.execute(
+        text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {TABLA_HUELLAS_BLOQUE}"
+            " (huella VARCHAR(64) PRIMARY KEY)"
+        )
+    )
+    db.execute(text(f"INSERT INTO {TABLA_HUELLAS_BLOQUE} (huella) VALUES (:huella)"), pendientes)
+    # Con `IN (subconsulta)` SQLite recorre las huellas del bloque y busca cada
+    # una en el índice; un JOIN le deja recorrer el índice entero.
+    existentes = set(
+        db.scalars(
+            text(
+                f"SELECT huella FROM {tabla}"
+                f" WHERE huella IN (SELECT huella FROM {TABLA_HUELLAS_BLOQUE})"
+            )
+        )
     )
-    return any(_normalize_concept(m.concepto, True).lower() == concepto_norm for m in candidatos)
+    db.execute(text(f"DELETE FROM {TABLA_HUELLAS_BLOQUE}"))
+    return existentes
+
+
+def _bloquear_importaciones(db: Session) -> None:
+    """Serializa las importaciones concurrentes hasta el fin de la transacción.
+
+    En PostgreSQL se usa un advisory lock transaccional; SQLite ya serializa
+    las escrituras con su bloqueo de base de datos.
+    """
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": CLAVE_BLOQUEO_IMPORTACION}
+        )
 
 
 def _build_preview_rows(
     df: pd.DataFrame,
     mapping: ColumnMapping,
     options: ImportOptions,
-    formato: BankFormat,
+    formato: FormatoCsv,
     db: Session,
-) -> CsvPreviewResult:
-    """Genera filas de previsualización aplicando normalizaciones y validaciones."""
+    vistos: set[str],
+    reglas: Optional[ReglasCompiladas] = None,
+) -> list[CsvPreviewRow]:
+    """Genera filas de previsualización aplicando normalizaciones y validaciones.
+
+    `vistos` acumula las huellas de bloques anteriores del mismo fichero para
+    detectar duplicados internos entre bloques. `reglas`, compiladas una vez
+    por fichero, categorizan el bloque entero de una pasada.
+    """
 
     rows: list[CsvPreviewRow] = []
-    error_rows = 0
-    duplicate_rows = 0
-    formatos_candidatos = BANK_DATE_FORMATS.get(formato, ("%Y-%m-%d",))
-    vistos: set[tuple[Optional[date], str, Optional[float]]] = set()
 
-    for idx, raw in df.iterrows():
-        errores: list[str] = []
-        fecha = _parse_date(raw.get(mapping.fecha_col), options.formato_fecha, formatos_candidatos)
-        concepto_raw = str(raw.get(mapping.concepto_col, ""))
-        concepto = _normalize_concept(concepto_raw, options.limpiar_concepto)
-
-        importe = None
-        if mapping.importe_col:
-            importe = _parse_float(raw.get(mapping.importe_col))
-        else:
-            debe = _parse_float(raw.get(mapping.debe_col)) if mapping.debe_col else None
-            haber = _parse_float(raw.get(mapping.haber_col)) if mapping.haber_col else None
-            if debe is not None or haber is not None:
-                importe = (haber or 0) - (debe or 0)
-
-        saldo = _parse_float(raw.get(mapping.saldo_col)) if mapping.saldo_col else None
-        notas = str(raw.get(mapping.notas_col, "")).strip() if mapping.notas_col else None
+    columnas = _normalizar_columnas(df, mapping, options, formato)
+    fechas = _a_lista(columnas["fecha"])
+    conceptos = columnas["concepto"].tolist()
+    importes = _a_lista(columnas["importe"])
+    huellas = [
+        calcular_huella(fecha, importe, concepto)
+        if fecha is not None and importe is not None
+        else None
+        for fecha, importe, concepto in zip(fechas, importes, conceptos)
+    ]
+    existentes = _huellas_existentes(db, (h for h in huellas if h is not None))
+    notas_lista = _a_lista(columnas["notas"])
+    categorias = (
+        reglas.categorizar_lote(conceptos, notas_lista) if reglas else [None] * len(conceptos)
+    )
+    filas = zip(
+        columnas.index.tolist(),
+        fechas,
+        conceptos,
+        importes,
+        _a_lista(columnas["saldo"]),
+        notas_lista,
+        columnas["tipo_id"].tolist(),
+        huellas,
+        categorias,
+    )
 
+    for idx, fecha, concepto, importe, saldo, notas, tipo_id, huella, categoria_regla in filas:
+        errores: list[str] = []
         if fecha is None:
             errores.append("Fecha inválida")
         if importe is None:
             errores.append("Importe inválido")
-        tipo_id = None
-        if options.detectar_tipo_por_signo and importe is not None:
-            tipo_id = 1 if importe < 0 else 2
-        elif options.default_tipo_id is not None:
-            tipo_id = options.default_tipo_id
 
         categoria_id = options.default_categoria_id
         metodo_pago_id = options.default_metodo_pago_id
 
         # Aplicamos reglas de categorización si se solicita y no hay errores críticos.
-        if options.aplicar_reglas and not errores and fecha and importe is not None:
-            mock = Movimiento(
-                fecha=fecha,
-                concepto=concepto,
-                importe=importe,
-                saldo=saldo,
-                notas=notas,
-                tipo_id=tipo_id or options.default_tipo_id or 1,
-                categoria_id=categoria_id or (options.default_categoria_id or 1),
-                metodo_pago_id=metodo_pago_id or (options.default_metodo_pago_id or 1),
-                anio=fecha.year,
-                mes=fecha.month,
-                mes_anio=f"{fecha.year:04d}-{fecha.month:02d}",
-            )
-            aplicar_reglas_movimiento(db, mock)
-            categoria_id = mock.categoria_id
-
-        concepto_norm = concepto.lower()
-        ya_visto = (fecha, concepto_norm, importe) in vistos
-        duplicado_bd = _buscar_duplicado(db, fecha, concepto_norm, importe)
-        is_duplicate = ya_visto or duplicado_bd
-        if is_duplicate:
-            duplicate_rows += 1
-        if ya_visto is False:
-            vistos.add((fecha, concepto_norm, importe))
+        if reglas is not None and not errores:
+            categoria_id = categoria_regla or (categoria_id or 1)
 
-        if errores:
-            error_rows += 1
+        is_duplicate = huella is not None and (huella in vistos or huella in existentes)
+        if huella is not None:
+            vistos.add(huella)
 
         rows.append(
             CsvPreviewRow(
@@ -293,70 +784,207 @@ def _build_preview_rows(
             )
         )
 
-    valid_rows = len([r for r in rows if not r.errors])
+    return rows
+
+
+def _previsualizar_por_bloques(
+    origen: OrigenCsv, mapping: ColumnMapping, options: ImportOptions, db: Session
+) -> Iterator[list[CsvPreviewRow]]:
+    """Genera la previsualización bloque a bloque a partir del CSV en streaming."""
+
+    bloques, _ = _leer_csv_por_bloques(origen)
+    vistos: set[str] = set()
+    formato: Optional[FormatoCsv] = None
+    reglas = compilar_reglas(db) if options.aplicar_reglas else None
+    for df in bloques:
+        if formato is None:
+            # Las convenciones se deciden con el primer bloque y se reutilizan.
+            formato = _inferir_formato_csv(df, mapping, options)
+        yield _build_preview_rows(df, mapping, options, formato, db, vistos, reglas)
+
+
+def preview_import(
+    origen: OrigenCsv, mapping: ColumnMapping, options: ImportOptions, db: Session
+) -> CsvPreviewResult:
+    """Relee el CSV aplicando el mapeo y devuelve una previsualización segura."""
+
+    bloques = _previsualizar_por_bloques(origen, mapping, options, db)
+    # Los aciertos de reglas quedan en memoria: la previsualización no escribe
+    # y se vuelcan con la siguiente importación, reaplicación o consulta.
+    rows = [row for bloque in bloques for row in bloque]
+    error_rows = sum(1 for r in rows if r.errors)
     return CsvPreviewResult(
         rows=rows,
         total_rows=len(rows),
-        valid_rows=valid_rows,
-        duplicate_rows=duplicate_rows,
+        valid_rows=len(rows) - error_rows,
+        duplicate_rows=sum(1 for r in rows if r.is_duplicate),
         error_rows=error_rows,
         summary_warnings=[],
     )
 
 
-def preview_import(
-    file_bytes: bytes, mapping: ColumnMapping, options: ImportOptions, db: Session
-) -> CsvPreviewResult:
-    """Relee el CSV aplicando el mapeo y devuelve una previsualización segura."""
+def _filas_insercion(
+    filas: Iterable[CsvPreviewRow], options: ImportOptions
+) -> list[dict[str, object]]:
+    """Prepara de una vez los valores a insertar, incluidos los campos derivados.
+
+    La categoría ya llega resuelta por las reglas desde la previsualización, así
+    que no es necesario volver a evaluarlas fila a fila.
+    """
+
+    preparadas: list[dict[str, object]] = []
+    for row in filas:
+        fecha: date = row.fecha  # type: ignore[assignment]
+        importe: float = row.importe  # type: ignore[assignment]
+        preparadas.append(
+            {
+                "fecha": fecha,
+                "concepto": row.concepto,
+                "importe": importe,
+                "saldo": row.saldo,
+                "notas": row.notas,
+                "tipo_id": row.tipo_id or (options.default_tipo_id or (1 if importe < 0 else 2)),
+                "categoria_id": row.categoria_id or (options.default_categoria_id or 1),
+                "metodo_pago_id": row.metodo_pago_id or (options.default_metodo_pago_id or 1),
+                "anio": fecha.year,
+                "mes": fecha.month,
+                "mes_anio": f"{fecha.year:04d}-{fecha.month:02d}",
+                "huella": calcular_huella(fecha, importe, row.concepto),
+            }
+        )
+    return preparadas
+
+
+def _campo_copy(valor: object) -> str:
+    """Campo de `COPY ... (FORMAT csv)`.
+
+    En ese formato NULL es un campo vacío sin comillas. El texto va siempre
+    entre comillas para que ni la cadena vacía ni un valor como `\\N` se lean
+    como NULL.
+    """
 
-    df, _ = _read_csv_bytes(file_bytes)
-    return _build_preview_rows(df, mapping, options, detectar_formato_banco(df), db)
+    if valor is None:
+        return ""
+    if isinstance(valor, str):
+        return '"' + valor.replace('"', '""') + '"'
+    return str(valor)
+
+
+def _copiar_postgresql(db: Session, filas: list[dict[str, object]]) -> None:
+    """Inserta las filas con `COPY FROM STDIN`, en bloques para acotar memoria."""
+
+    columnas = COLUMNAS_INSERCION
+    sentencia = (
+        f"COPY {Movimiento.__tablename__} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = db.connection().connection.cursor()
+    try:
+        for inicio in range(0, len(filas), TAMANO_LOTE_INSERCION):
+            buffer = io.StringIO()
+            for fila in filas[inicio : inicio + TAMANO_LOTE_INSERCION]:
+                buffer.write(",".join([_campo_copy(fila[c]) for c in columnas]) + "\n")
+            buffer.seek(0)
+            cursor.copy_expert(sentencia, buffer)
+    finally:
+        cursor.close()
+
+
+def _insertar_sqlite(db: Session, filas: list[dict[str, object]]) -> None:
+    """Executemany directo sobre el driver, sin procesado de parámetros por fila.
+
+    Las fechas se serializan en ISO, que es como las almacena el tipo `Date`
+    de SQLAlchemy en SQLite.
+    """
+
+    columnas = COLUMNAS_INSERCION
+    sentencia = (
+        f"INSERT INTO {Movimiento.__tablename__} ({', '.join(columnas)}) "
+        f"VALUES ({', '.join('?' for _ in columnas)})"
+    )
+    resto = itemgetter(*columnas[1:])
+    conexion = db.connection()
+    for inicio in range(0, len(filas), TAMANO_LOTE_INSERCION):
+        lote = filas[inicio : inicio + TAMANO_LOTE_INSERCION]
+        conexion.exec_driver_sql(
+            sentencia, [(f["fecha"].isoformat(),) + resto(f) for f in lote]  # type: ignore[attr-defined]
+        )
+
+
+def _insertar_movimientos(db: Session, filas: list[dict[str, object]]) -> None:
+    """Escritura masiva sin unit of work: COPY en PostgreSQL y executemany en el resto."""
+
+    if not filas:
+        return
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        _copiar_postgresql(db, filas)
+        return
+    if dialecto == "sqlite":
+        with indexar_en_bloque(db.connection()):
+            _insertar_sqlite(db, filas)
+        return
+    sentencia = insert(Movimiento.__table__)
+    for inicio in range(0, len(filas), TAMANO_LOTE_INSERCION):
+        db.execute(sentencia, filas[inicio : inicio + TAMANO_LOTE_INSERCION])
 
 
 def apply_import(
-    file_bytes: bytes,
+    origen: OrigenCsv,
     mapping: ColumnMapping,
     options: ImportOptions,
     db: Session,
     user_id: Optional[int] = None,
+    progreso: Optional[Callable[[CsvImportResult], None]] = None,
 ) -> CsvImportResult:
-    """Importa definitivamente los movimientos válidos y no duplicados."""
+    """Importa definitivamente los movimientos válidos y no duplicados.
+
+    El fichero se procesa bloque a bloque dentro de una única transacción, así
+    que la memoria no depende del tamaño del CSV y un fallo no deja
+    importaciones a medias. `progreso` recibe los contadores acumulados tras
+    cada bloque; si lanza `ImportacionCancelada` se deshace todo lo insertado.
+    """
 
-    preview = preview_import(file_bytes, mapping, options, db)
-    importables = [r for r in preview.rows if not r.errors]
     imported = 0
     skipped_dups = 0
-    skipped_errors = preview.error_rows
-
-    with db.begin():
-        for row in importables:
-            if row.is_duplicate and options.ignorar_duplicados:
-                skipped_dups += 1
-                continue
-
-            movimiento = Movimiento(
-                fecha=row.fecha,  # type: ignore[arg-type]
-                concepto=row.concepto,
-                importe=row.importe,  # type: ignore[arg-type]
-                saldo=row.saldo,
-                tipo_id=row.tipo_id
-                or (options.default_tipo_id or (1 if (row.importe or 0) < 0 else 2)),
-                categoria_id=row.categoria_id or (options.default_categoria_id or 1),
-                metodo_pago_id=row.metodo_pago_id or (options.default_metodo_pago_id or 1),
-                notas=row.notas,
-            )
-            movimiento.rellenar_campos_derivados()
-            if options.aplicar_reglas:
-                aplicar_reglas_movimiento(db, movimiento)
-            db.add(movimiento)
-            imported += 1
+    skipped_errors = 0
+    total_rows = 0
+    ejemplos_error: list[CsvPreviewRow] = []
+
+    try:
+        _bloquear_importaciones(db)
+        for bloque in _previsualizar_por_bloques(origen, mapping, options, db):
+            total_rows += len(bloque)
+            errores = [r for r in bloque if r.errors]
+            skipped_errors += len(errores)
+            ejemplos_error.extend(errores[: max(0, 5 - len(ejemplos_error))])
+            importables = [
+                r
+                for r in bloque
+                if not r.errors and not (r.is_duplicate and options.ignorar_duplicados)
+            ]
+            skipped_dups += len(bloque) - len(errores) - len(importables)
+            filas = _filas_insercion(importables, options)
+            _insertar_movimientos(db, filas)
+            imported += len(filas)
+            if progreso is not None:
+                progreso(
+                    CsvImportResult(
+                        imported=imported,
+                        skipped_duplicates=skipped_dups,
+                        skipped_errors=skipped_errors,
+                        total_rows=total_rows,
+                    )
+                )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    estadisticas_reglas.volcar(db)
 
-    ejemplos_error = [r for r in preview.rows if r.errors][:5]
     return CsvImportResult(
         imported=imported,
         skipped_duplicates=skipped_dups,
         skipped_errors=skipped_errors,
-        total_rows=preview.total_rows,
+        total_rows=total_rows,
         examples_errors=ejemplos_error,
     )
-
@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
+import json
+from datetime import date
 from typing import Iterable, Optional
 
-from sqlalchemy import and_, asc, case, desc, func, or_, select
+from sqlalchemy import Row, and_, asc, case, desc, func, select, tuple_
 from sqlalchemy.orm import Session
 
 from backend.app.models import Categoria, MetodoPago, Movimiento, TipoMovimiento
+from backend.app.models.busqueda import coincide_texto
 from backend.app.schemas.movimientos import (
     MovimientoAggregates,
     MovimientoCreate,
@@ -43,13 +48,7 @@ def aplicar_filtros(base_query, filtros: MovimientoFiltro):
     if filtros.importe_max is not None:
         condiciones.append(Movimiento.importe <= filtros.importe_max)
     if filtros.concepto:
-        like_expr = f"%{filtros.concepto.lower()}%"
-        condiciones.append(
-            or_(
-                func.lower(Movimiento.concepto).like(like_expr),
-                func.lower(Movimiento.notas).like(like_expr),
-            )
-        )
+        condiciones.append(coincide_texto(filtros.concepto))
     if filtros.solo_gastos_fijos:
         condiciones.append(Categoria.es_fijo.is_(True))
     if filtros.solo_gastos_variables:
@@ -61,40 +60,143 @@ def aplicar_filtros(base_query, filtros: MovimientoFiltro):
 
 
 def _query_base_movimientos():
-    """Construye la consulta base con joins necesarios para enriquecer la salida."""
+    """Construye la consulta base con joins necesarios para enriquecer la salida.
+
+    Selecciona solo las columnas de `MovimientoListItem`, con sus nombres, en
+    lugar de la entidad completa: las filas llegan como tuplas sin pasar por
+    el identity map del ORM.
+    """
 
     return (
         select(
-            Movimiento,
+            Movimiento.id,
+            Movimiento.fecha,
+            Movimiento.concepto,
+            Movimiento.importe,
+            Movimiento.saldo,
+            Movimiento.tipo_id,
+            TipoMovimiento.nombre.label("tipo_nombre"),
+            Movimiento.categoria_id,
             Categoria.nombre.label("categoria_nombre"),
             Categoria.es_fijo.label("categoria_es_fijo"),
-            TipoMovimiento.nombre.label("tipo_nombre"),
+            Movimiento.metodo_pago_id,
             MetodoPago.nombre.label("metodo_pago_nombre"),
+            Movimiento.notas,
+            Movimiento.mes_anio,
         )
+        .select_from(Movimiento)
         .join(Categoria, Movimiento.categoria_id == Categoria.id, isouter=True)
         .join(TipoMovimiento, Movimiento.tipo_id == TipoMovimiento.id, isouter=True)
         .join(MetodoPago, Movimiento.metodo_pago_id == MetodoPago.id, isouter=True)
     )
 
 
-def _aplicar_ordenacion(query, sort_by: Optional[str], sort_dir: Optional[str]):
-    """Añade ordenación segura a la consulta, limitando los campos permitidos."""
-
-    direcciones = {"asc": asc, "desc": desc}
-    columnas_permitidas = {
-        "fecha": Movimiento.fecha,
-        "importe": Movimiento.importe,
-        "categoria": Categoria.nombre,
-        "tipo": TipoMovimiento.nombre,
-        "metodo_pago": MetodoPago.nombre,
-        "concepto": Movimiento.concepto,
-    }
-    if sort_by and sort_by in columnas_permitidas:
-        orden = direcciones.get(sort_dir or "asc", asc)
-        query = query.order_by(orden(columnas_permitidas[sort_by]))
+# Campos de ordenación permitidos: expresión SQL y atributo de `MovimientoListItem`
+# del que sale el valor del cursor. Los nombres de las tablas unidas con outer
+# join se ordenan con `coalesce` para que la clave nunca sea NULL.
+_ORDENACIONES = {
+    "fecha": (Movimiento.fecha, "fecha"),
+    "importe": (Movimiento.importe, "importe"),
+    "categoria": (func.coalesce(Categoria.nombre, ""), "categoria_nombre"),
+    "tipo": (func.coalesce(TipoMovimiento.nombre, ""), "tipo_nombre"),
+    "metodo_pago": (func.coalesce(MetodoPago.nombre, ""), "metodo_pago_nombre"),
+    "concepto": (Movimiento.concepto, "concepto"),
+}
+
+
+def _clave_ordenacion(sort_by: Optional[str], sort_dir: Optional[str]) -> tuple[str, bool]:
+    """Campo de ordenación efectivo y si es descendente (por defecto, fecha descendente)."""
+
+    if sort_by and sort_by in _ORDENACIONES:
+        return sort_by, sort_dir == "desc"
+    return "fecha", True
+
+
+def _aplicar_ordenacion(
+    query, sort_by: Optional[str], sort_dir: Optional[str], invertir: bool = False
+):
+    """Añade ordenación segura a la consulta, limitando los campos permitidos.
+
+    El id desempata en el mismo sentido, así que el orden es total y sirve de
+    base para la paginación por cursor.
+    """
+
+    campo, descendente = _clave_ordenacion(sort_by, sort_dir)
+    orden = desc if descendente != invertir else asc
+    return query.order_by(orden(_ORDENACIONES[campo][0]), orden(Movimiento.id))
+
+
+def _codificar_cursor(item: MovimientoListItem, campo: str, descendente: bool, sentido: str) -> str:
+    valor = getattr(item, _ORDENACIONES[campo][1])
+    if isinstance(valor, date):
+        valor = valor.isoformat()
+    elif valor is None:
+        valor = ""
+    datos = {"o": campo, "d": descendente, "v": valor, "id": item.id, "s": sentido}
+    crudo = json.dumps(datos, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str, campo: str, descendente: bool) -> tuple[object, int, str]:
+    """Devuelve `(valor, id, sentido)` de un cursor generado para la misma ordenación.
+
+    Raises:
+        ValueError: si el cursor está corrupto o corresponde a otra ordenación.
+    """
+
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        datos = json.loads(crudo)
+        valor, movimiento_id, sentido = datos["v"], int(datos["id"]), datos["s"]
+        if campo == "fecha":
+            valor = date.fromisoformat(valor)
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Cursor no válido") from exc
+    if (datos.get("o"), datos.get("d")) != (campo, descendente) or sentido not in ("next", "prev"):
+        raise ValueError("El cursor no corresponde a la ordenación solicitada")
+    return valor, movimiento_id, sentido
+
+
+def _pagina_por_cursor(
+    db: Session,
+    filtrada,
+    cursor: str,
+    page_size: int,
+    sort_by: Optional[str],
+    sort_dir: Optional[str],
+) -> tuple[list[MovimientoListItem], Optional[str], Optional[str]]:
+    """Página siguiente o anterior a la posición del cursor (keyset pagination).
+
+    La condición `(clave, id) > (valor, id_cursor)` aprovecha el orden de la
+    consulta, así que el coste no depende de lo lejos que esté la página. Se
+    pide una fila de más para saber si hay otra página en ese sentido.
+    """
+
+    campo, descendente = _clave_ordenacion(sort_by, sort_dir)
+    valor, movimiento_id, sentido = _decodificar_cursor(cursor, campo, descendente)
+    hacia_atras = sentido == "prev"
+    clave = tuple_(_ORDENACIONES[campo][0], Movimiento.id)
+    if descendente != hacia_atras:
+        posterior = clave < (valor, movimiento_id)
     else:
-        query = query.order_by(desc(Movimiento.fecha))
-    return query
+        posterior = clave > (valor, movimiento_id)
+    consulta = _aplicar_ordenacion(
+        filtrada.where(posterior), sort_by, sort_dir, invertir=hacia_atras
+    )
+    filas = db.execute(consulta.limit(page_size + 1)).all()
+    hay_mas = len(filas) > page_size
+    items = _mapear_items(filas[:page_size])
+    if hacia_atras:
+        items.reverse()
+    if not items:
+        return items, None, None
+    siguiente = hay_mas or hacia_atras
+    anterior = hay_mas or not hacia_atras
+    return (
+        items,
+        _codificar_cursor(items[-1], campo, descendente, "next") if siguiente else None,
+        _codificar_cursor(items[0], campo, descendente, "prev") if anterior else None,
+    )
 
 
 def _paginar(query, page: int, page_size: int):
@@ -102,66 +204,54 @@ def _paginar(query, page: int, page_size: int):
     return query.limit(page_size).offset(offset)
 
 
+_CAMPOS_ITEM = tuple(MovimientoListItem.model_fields)
+
+
 def _mapear_items(resultado) -> list[MovimientoListItem]:
-    """Convierte filas del motor SQLAlchemy a pydantic list item."""
-
-    items: list[MovimientoListItem] = []
-    for row in resultado:
-        movimiento: Movimiento = row.Movimiento
-        items.append(
-            MovimientoListItem(
-                id=movimiento.id,
-                fecha=movimiento.fecha,
-                concepto=movimiento.concepto,
-                importe=movimiento.importe,
-                saldo=movimiento.saldo,
-                tipo_id=movimiento.tipo_id,
-                tipo_nombre=row.tipo_nombre,
-                categoria_id=movimiento.categoria_id,
-                categoria_nombre=row.categoria_nombre,
-                categoria_es_fijo=row.categoria_es_fijo,
-                metodo_pago_id=movimiento.metodo_pago_id,
-                metodo_pago_nombre=row.metodo_pago_nombre,
-                notas=movimiento.notas,
-                mes_anio=movimiento.mes_anio,
-            )
-        )
-    return items
+    """Convierte filas de `_query_base_movimientos` en items de listado.
 
+    Los datos vienen de la base y ya cumplen el esquema, así que se construyen
+    con `model_construct`, sin validar campo a campo. Cada campo se lee por su
+    nombre en la fila, no por su posición: el orden de las columnas no importa
+    y las columnas que no son del item (como los agregados) se ignoran.
+    """
 
-def _calcular_agregados(db: Session, filtros: MovimientoFiltro) -> MovimientoAggregates:
-    """Calcula totales de importes y recuentos siguiendo los filtros activos."""
+    construir = MovimientoListItem.model_construct
+    campos = _CAMPOS_ITEM
+    return [
+        construir(**{campo: mapeo[campo] for campo in campos})
+        for mapeo in (fila._mapping for fila in resultado)
+    ]
+
+
+def _expresiones_agregados() -> list:
+    """Recuento, sumas y rango de fechas que resumen el conjunto filtrado.
+
+    Se devuelven sin `coalesce` para poder usarlas tanto agrupadas como en
+    ventana (`OVER ()`); los NULL de un conjunto vacío se tratan en Python.
+    """
+
+    return [
+        func.count(Movimiento.id),
+        func.sum(Movimiento.importe),
+        func.sum(case((Movimiento.importe < 0, Movimiento.importe), else_=0)),
+        func.sum(case((Movimiento.importe > 0, Movimiento.importe), else_=0)),
+        func.min(Movimiento.fecha),
+        func.max(Movimiento.fecha),
+    ]
 
-    query_agregados = (
-        select(
-            func.count(Movimiento.id),
-            func.coalesce(func.sum(Movimiento.importe), 0),
-            func.coalesce(
-                func.sum(case((Movimiento.importe < 0, Movimiento.importe), else_=0)), 0
-            ),
-            func.coalesce(
-                func.sum(case((Movimiento.importe > 0, Movimiento.importe), else_=0)), 0
-            ),
-            func.min(Movimiento.fecha),
-            func.max(Movimiento.fecha),
-        )
-        .join(Categoria, Movimiento.categoria_id == Categoria.id, isouter=True)
-        .join(TipoMovimiento, Movimiento.tipo_id == TipoMovimiento.id, isouter=True)
-        .join(MetodoPago, Movimiento.metodo_pago_id == MetodoPago.id, isouter=True)
-    )
-    query_agregados = aplicar_filtros(query_agregados, filtros)
-    total_registros, total_importe, total_gastos, total_ingresos, fecha_min, fecha_max = db.execute(
-        query_agregados
-    ).one()
 
+def _construir_agregados(
+    total_registros, total_importe, total_gastos, total_ingresos, fecha_min, fecha_max
+) -> MovimientoAggregates:
     promedio_mensual = None
     if fecha_min and fecha_max:
         meses = (fecha_max.year - fecha_min.year) * 12 + (fecha_max.month - fecha_min.month) + 1
         if meses > 0:
-            promedio_mensual = float(total_importe) / meses
+            promedio_mensual = float(total_importe or 0) / meses
 
     return MovimientoAggregates(
-        total_registros=total_registros,
+        total_registros=total_registros or 0,
         total_importe=float(total_importe or 0),
         total_gastos=float(total_gastos or 0),
         total_ingresos=float(total_ingresos or 0),
@@ -169,6 +259,57 @@ def _calcular_agregados(db: Session, filtros: MovimientoFiltro) -> MovimientoAgg
     )
 
 
+def _calcular_agregados(db: Session, filtros: MovimientoFiltro) -> MovimientoAggregates:
+    """Calcula totales de importes y recuentos siguiendo los filtros activos."""
+
+    query_agregados = (
+        select(*_expresiones_agregados())
+        .join(Categoria, Movimiento.categoria_id == Categoria.id, isouter=True)
+        .join(TipoMovimiento, Movimiento.tipo_id == TipoMovimiento.id, isouter=True)
+        .join(MetodoPago, Movimiento.metodo_pago_id == MetodoPago.id, isouter=True)
+    )
+    query_agregados = aplicar_filtros(query_agregados, filtros)
+    return _construir_agregados(*db.execute(query_agregados).one())
+
+
+# Prefijo de las columnas de ventana añadidas a la consulta paginada.
+_PREFIJO_AGREGADO = "agregado_"
+
+
+def _agregados_en_ventana(db: Session) -> bool:
+    """Indica si la página y los agregados se piden en una sola sentencia.
+
+    Compensa en PostgreSQL, donde cada sentencia es una ida y vuelta por red.
+    En SQLite la ventana materializa todo el conjunto filtrado antes del
+    `LIMIT` y resulta más lenta que dos sentencias en proceso
+    (`backend/benchmarks/bench_listado.py`), así que se mantienen separadas.
+    """
+
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _pagina_con_agregados(
+    db: Session, ordenada, page: int, page_size: int
+) -> tuple[list[MovimientoListItem], Optional[MovimientoAggregates]]:
+    """Página y agregados del conjunto filtrado en una única sentencia.
+
+    Cada agregado se añade como `func(...) OVER ()`: la ventana abarca todas
+    las filas que pasan los filtros y se evalúa antes del `LIMIT`, así que el
+    motor recorre una sola vez los joins y predicados. Si la página sale vacía
+    (filtro sin resultados o página fuera de rango) no hay fila de la que leer
+    los agregados y se devuelve `None`.
+    """
+
+    columnas = [
+        expresion.over().label(f"{_PREFIJO_AGREGADO}{indice}")
+        for indice, expresion in enumerate(_expresiones_agregados())
+    ]
+    filas = db.execute(_paginar(ordenada.add_columns(*columnas), page, page_size)).all()
+    if not filas:
+        return [], None
+    return _mapear_items(filas), _construir_agregados(*filas[0][-len(columnas) :])
+
+
 def listar_movimientos(
     db: Session,
     filtros: Optional[MovimientoFiltro] = None,
@@ -176,11 +317,21 @@ def listar_movimientos(
     page_size: int = 50,
     sort_by: Optional[str] = None,
     sort_dir: Optional[str] = None,
+    cursor: Optional[str] = None,
 ) -> MovimientoListResponse:
     """Obtiene movimientos aplicando filtros, paginación y agregados.
 
     Esta función centraliza la lógica del explorador de datos para permitir su
-    reutilización en el listado principal y en el export.
+    reutilización en el listado principal y en el export. Con `cursor` se
+    pagina por clave desde la posición que indica y `page` se ignora.
+
+    El total sale de la misma consulta que los agregados. En PostgreSQL, al
+    paginar por número, página y agregados van además en una sola sentencia
+    (ver `_pagina_con_agregados`); por cursor no es posible porque el filtro de
+    clave excluiría filas del total.
+
+    Raises:
+        ValueError: si el cursor no es válido para la ordenación pedida.
     """
 
     filtros = filtros or MovimientoFiltro()
@@ -188,42 +339,52 @@ def listar_movimientos(
     filtrada = aplicar_filtros(base_query, filtros)
     ordenada = _aplicar_ordenacion(filtrada, sort_by, sort_dir)
 
-    total_query = select(func.count(Movimiento.id)).select_from(
-        aplicar_filtros(
-            select(Movimiento.id)
-            .join(Categoria, Movimiento.categoria_id == Categoria.id, isouter=True)
-            .join(TipoMovimiento, Movimiento.tipo_id == TipoMovimiento.id, isouter=True)
-            .join(MetodoPago, Movimiento.metodo_pago_id == MetodoPago.id, isouter=True),
-            filtros,
-        ).subquery()
-    )
-    total_items = db.scalar(total_query) or 0
-
-    paginada = _paginar(ordenada, page, page_size)
-    resultado = db.execute(paginada).all()
-    items = _mapear_items(resultado)
+    agregados = None
+    if cursor:
+        items, next_cursor, prev_cursor = _pagina_por_cursor(
+            db, filtrada, cursor, page_size, sort_by, sort_dir
+        )
+    elif _agregados_en_ventana(db):
+        items, agregados = _pagina_con_agregados(db, ordenada, page, page_size)
+    else:
+        items = _mapear_items(db.execute(_paginar(ordenada, page, page_size)).all())
+    if agregados is None:
+        agregados = _calcular_agregados(db, filtros)
+    total_items = agregados.total_registros
+
+    if not cursor:
+        campo, descendente = _clave_ordenacion(sort_by, sort_dir)
+        next_cursor = prev_cursor = None
+        if items and page * page_size < total_items:
+            next_cursor = _codificar_cursor(items[-1], campo, descendente, "next")
+        if items and page > 1:
+            prev_cursor = _codificar_cursor(items[0], campo, descendente, "prev")
 
     total_pages = max(1, (total_items + page_size - 1) // page_size) if total_items else 1
-    agregados = _calcular_agregados(db, filtros)
 
     return MovimientoListResponse(
         items=items,
-        page=page,
+        page=None if cursor else page,
         page_size=page_size,
         total_items=total_items,
         total_pages=total_pages,
         aggregates=agregados,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
     )
 
 
-def exportar_movimientos(db: Session, filtros: MovimientoFiltro) -> Iterable[MovimientoListItem]:
-    """Obtiene todos los movimientos filtrados sin paginación para exportar."""
+def exportar_movimientos(db: Session, filtros: MovimientoFiltro) -> Iterable[Row]:
+    """Obtiene todos los movimientos filtrados sin paginación para exportar.
+
+    Devuelve las filas tal cual: tienen los mismos atributos que
+    `MovimientoListItem` y el CSV no necesita construir modelos.
+    """
 
     base = _query_base_movimientos()
     filtrada = aplicar_filtros(base, filtros)
     filtrada = _aplicar_ordenacion(filtrada, sort_by="fecha", sort_dir="desc")
-    resultado = db.execute(filtrada).all()
-    return _mapear_items(resultado)
+    return db.execute(filtrada).all()
 
 
 def crear_movimiento(db: Session, datos: MovimientoCreate) -> Movimiento:
@@ -2,42 +2,905 @@
 
 from __future__ import annotations
 
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Iterable, Optional, Sequence, Union
+
+from sqlalchemy import (
+    ColumnElement,
+    and_,
+    case,
+    func,
+    literal_column,
+    not_,
+    or_,
+    select,
+    true,
+    update,
+)
 from sqlalchemy.orm import Session
 
-from backend.app.models import Movimiento, ReglaAutoCategoria
+from backend.app.core.config import get_settings
+from backend.app.models import (
+    Categoria,
+    EstadisticaRegla,
+    Movimiento,
+    PuntoControl,
+    ReglaAutoCategoria,
+)
+from backend.app.models.busqueda import coincide_texto
+from backend.app.models.entities import CampoObjetivo, TipoMatch, expresion_regular
+from backend.app.schemas.reglas import (
+    EstadisticaReglaRead,
+    ImpactoCategoria,
+    ModoReaplicacion,
+    MovimientoAfectado,
+    ReglaCreate,
+    SimulacionRegla,
+)
+
+# Rango de ids de movimientos que cubre cada UPDATE de la reaplicación en SQL.
+TAMANO_LOTE_REAPLICACION = 50_000
+
+# Rango de ids que la reaplicación por bloques lee, actualiza y confirma de una vez.
+TAMANO_BLOQUE_REAPLICACION = 5_000
+
+# Clave del punto de control de la reaplicación por bloques.
+CLAVE_PUNTO_CONTROL = "reaplicar_reglas"
+
+# La muestra de una simulación recorre la tabla por id descendente si al menos
+# uno de cada tantos movimientos está afectado; si no, parte del índice de texto.
+DENSIDAD_MUESTRA_POR_RECORRIDO = 100
+
+
+@dataclass(frozen=True)
+class PatronCompilado:
+    """Patrón con su posición en el orden de evaluación (0 = primero).
+
+    Los patrones literales se guardan en minúsculas; las expresiones "regex"
+    tal cual las escribió el usuario.
+    """
+
+    posicion: int
+    patron: str
+    categoria_id: int
+    tipo: TipoMatch = TipoMatch.contains
+    regla_id: Optional[int] = None
+
+
+class AutomataPatrones:
+    """Autómata Aho-Corasick sobre los patrones "contains" de un campo.
+
+    Recorre cada texto una sola vez, sea cual sea el número de patrones. Cada
+    estado guarda el patrón de menor `posicion` que termina en él, ya propagado
+    por los enlaces de fallo, así que la búsqueda devuelve directamente la
+    primera regla que coincide, y se detiene en cuanto encuentra la primera
+    regla del autómata.
+    """
+
+    __slots__ = ("_transiciones", "_fallos", "_salidas", "minima")
+
+    def __init__(self, patrones: Sequence[PatronCompilado]) -> None:
+        self._transiciones: list[dict[str, int]] = [{}]
+        self._salidas: list[Optional[PatronCompilado]] = [None]
+        for patron in patrones:
+            estado = 0
+            for caracter in patron.patron:
+                siguiente = self._transiciones[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._transiciones)
+                    self._transiciones[estado][caracter] = siguiente
+                    self._transiciones.append({})
+                    self._salidas.append(None)
+                estado = siguiente
+            self._salidas[estado] = _primero(self._salidas[estado], patron)
+        self._fallos = [0] * len(self._transiciones)
+        self._enlazar_fallos()
+        self.minima = min((p.posicion for p in patrones), default=-1)
+
+    def _enlazar_fallos(self) -> None:
+        """Calcula los enlaces de fallo en anchura y hereda sus salidas."""
+
+        pendientes = deque(self._transiciones[0].values())
+        while pendientes:
+            estado = pendientes.popleft()
+            for caracter, hijo in self._transiciones[estado].items():
+                fallo = self._fallos[estado]
+                while caracter not in self._transiciones[fallo] and fallo:
+                    fallo = self._fallos[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallos[hijo] = destino if destino != hijo else 0
+                self._salidas[hijo] = _primero(
+                    self._salidas[hijo], self._salidas[self._fallos[hijo]]
+                )
+                pendientes.append(hijo)
+
+    def buscar(self, texto: str) -> Optional[PatronCompilado]:
+        """Patrón de menor posición contenido en `texto` (ya en minúsculas)."""
 
+        transiciones, fallos, salidas = self._transiciones, self._fallos, self._salidas
+        mejor = salidas[0]  # Un patrón vacío coincide con cualquier texto.
+        if mejor is not None and mejor.posicion == self.minima:
+            return mejor
+        estado = 0
+        for caracter in texto:
+            while caracter not in transiciones[estado] and estado:
+                estado = fallos[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            salida = salidas[estado]
+            if salida is not None and (mejor is None or salida.posicion < mejor.posicion):
+                mejor = salida
+                if mejor.posicion == self.minima:
+                    break
+        return mejor
+
+
+def _primero(
+    a: Optional[PatronCompilado], b: Optional[PatronCompilado]
+) -> Optional[PatronCompilado]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if a.posicion <= b.posicion else b
+
+
+class ExpresionCombinada:
+    """Patrones "starts_with", "word" y "regex" de un campo en una sola expresión.
+
+    Cada patrón es una alternativa con un grupo con nombre dentro de un
+    lookahead, en orden de evaluación. Como el lookahead no consume texto,
+    `finditer` prueba en cada posición todas las alternativas y devuelve la
+    primera que encaja, que es la de menor posición entre las que empiezan
+    ahí; el mínimo sobre todo el texto es la primera regla que coincide. La
+    búsqueda se detiene al encontrar la primera regla de la expresión.
+    """
+
+    __slots__ = ("_expresion", "_patrones", "minima")
+
+    def __init__(self, patrones: Sequence[PatronCompilado]) -> None:
+        ordenados = sorted(patrones, key=lambda patron: patron.posicion)
+        self._patrones = {f"r{patron.posicion}": patron for patron in ordenados}
+        self._expresion = _combinar(
+            tuple((p.posicion, expresion_regular(p.tipo, p.patron)) for p in ordenados)
+        )
+        self.minima = ordenados[0].posicion if ordenados else -1
+
+    def buscar(self, texto: str) -> Optional[PatronCompilado]:
+        """Patrón de menor posición que encaja en `texto` (ya en minúsculas)."""
+
+        mejor: Optional[PatronCompilado] = None
+        for coincidencia in self._expresion.finditer(texto):
+            patron = self._patrones[coincidencia.lastgroup]  # type: ignore[index]
+            if mejor is None or patron.posicion < mejor.posicion:
+                mejor = patron
+                if mejor.posicion == self.minima:
+                    break
+        return mejor
+
+
+@lru_cache(maxsize=16)
+def _combinar(alternativas: tuple[tuple[int, str], ...]) -> re.Pattern:
+    """Compila la alternancia; se reutiliza mientras las reglas no cambien."""
+
+    return re.compile(
+        "|".join(f"(?=(?P<r{posicion}>{expresion}))" for posicion, expresion in alternativas)
+    )
+
+
+Buscador = Union[AutomataPatrones, ExpresionCombinada]
+
+
+class EstadisticasReglas:
+    """Aciertos y tiempo de evaluación por regla, acumulados en memoria.
+
+    Las evaluaciones registran sus contadores por lotes y `volcar` los suma a
+    `estadisticas_reglas` cuando se han acumulado `umbral` evaluaciones (o
+    siempre, con `forzar`). El volcado usa la sesión de quien lo pide, después
+    de su commit, para no abrir otra transacción que compita por el bloqueo de
+    SQLite. El tiempo de cada evaluación se atribuye a la regla que gana: una
+    regla con muchos aciertos y mucho tiempo es candidata a subir de prioridad.
+    """
 
-def aplicar_reglas_movimiento(db: Session, movimiento: Movimiento) -> None:
+    def __init__(self, umbral: int) -> None:
+        self.umbral = umbral
+        self._aciertos: Counter[int] = Counter()
+        self._tiempos_ns: Counter[int] = Counter()
+        self._pendientes = 0
+        self._cerrojo = threading.Lock()
+        self._volcado = threading.Lock()
+
+    def registrar(
+        self, aciertos: Counter[int], tiempos_ns: Counter[int], evaluaciones: int
+    ) -> None:
+        with self._cerrojo:
+            self._aciertos.update(aciertos)
+            self._tiempos_ns.update(tiempos_ns)
+            self._pendientes += evaluaciones
+
+    def volcar(self, db: Session, forzar: bool = False) -> None:
+        """Suma lo acumulado a la base de datos y confirma la transacción."""
+
+        with self._volcado:
+            with self._cerrojo:
+                if not self._aciertos or (self._pendientes < self.umbral and not forzar):
+                    return
+                aciertos, tiempos_ns = self._aciertos, self._tiempos_ns
+                self._aciertos, self._tiempos_ns, self._pendientes = Counter(), Counter(), 0
+            # Las reglas borradas desde la evaluación se descartan.
+            vigentes = db.scalars(
+                select(ReglaAutoCategoria.id).where(ReglaAutoCategoria.id.in_(aciertos))
+            ).all()
+            existentes = {
+                estadistica.regla_id: estadistica
+                for estadistica in db.scalars(
+                    select(EstadisticaRegla).where(EstadisticaRegla.regla_id.in_(vigentes))
+                )
+            }
+            ahora = datetime.utcnow()
+            for regla_id in vigentes:
+                estadistica = existentes.get(regla_id)
+                if estadistica is None:
+                    estadistica = EstadisticaRegla(regla_id=regla_id, aciertos=0, tiempo_ms=0.0)
+                    db.add(estadistica)
+                estadistica.aciertos += aciertos[regla_id]
+                estadistica.tiempo_ms += tiempos_ns[regla_id] / 1_000_000
+                estadistica.ultimo_acierto = ahora
+            db.commit()
+
+
+estadisticas_reglas = EstadisticasReglas(umbral=get_settings().rule_stats_flush_every)
+"""Acumulador compartido; solo recibe datos con `RULE_STATS_ENABLED`."""
+
+
+@dataclass(frozen=True)
+class ReglasCompiladas:
+    """Conjunto inmutable de reglas cargado una vez por operación.
+
+    Los patrones se agrupan por campo objetivo. Por campo hay un autómata
+    Aho-Corasick para los "contains" y una `ExpresionCombinada` para el resto.
+    `posicion` es el orden de evaluación (prioridad ascendente y, a igual
+    prioridad, id descendente) y gana la primera regla que coincide, también
+    entre patrones de campos distintos.
+    """
+
+    por_campo: dict[CampoObjetivo, tuple[PatronCompilado, ...]]
+    registro: Optional[EstadisticasReglas] = field(default=None, repr=False, compare=False)
+    buscadores: dict[CampoObjetivo, tuple[Buscador, ...]] = field(
+        init=False, repr=False, compare=False
+    )
+    firma: str = field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        buscadores = {}
+        for campo, patrones in self.por_campo.items():
+            contiene = [p for p in patrones if p.tipo == TipoMatch.contains]
+            otros = [p for p in patrones if p.tipo != TipoMatch.contains]
+            por_campo: list[Buscador] = []
+            if contiene:
+                por_campo.append(AutomataPatrones(contiene))
+            if otros:
+                por_campo.append(ExpresionCombinada(otros))
+            if por_campo:
+                buscadores[campo] = tuple(sorted(por_campo, key=lambda b: b.minima))
+        object.__setattr__(self, "buscadores", buscadores)
+        huella = hashlib.sha256()
+        for campo, patrones in sorted(self.por_campo.items()):
+            for p in patrones:
+                huella.update(
+                    f"{p.posicion}|{campo.value}|{p.tipo.value}|{p.categoria_id}|{p.patron}\n".encode()
+                )
+        object.__setattr__(self, "firma", huella.hexdigest())
+
+    def __bool__(self) -> bool:
+        return bool(self.buscadores)
+
+    def coincidencia(
+        self, concepto: Optional[str], notas: Optional[str]
+    ) -> Optional[PatronCompilado]:
+        """Primera regla que coincide, o None si ninguna lo hace.
+
+        Cada campo se pasa a minúsculas y se recorre como mucho una vez por
+        buscador; no se recorre si ninguno de sus patrones puede mejorar la
+        coincidencia ya encontrada.
+        """
+
+        mejor: Optional[PatronCompilado] = None
+        for campo, valor in ((CampoObjetivo.concepto, concepto), (CampoObjetivo.notas, notas)):
+            texto: Optional[str] = None
+            for buscador in self.buscadores.get(campo, ()):
+                if mejor is not None and buscador.minima >= mejor.posicion:
+                    break
+                if texto is None:
+                    texto = (valor or "").lower()
+                mejor = _primero(mejor, buscador.buscar(texto))
+        return mejor
+
+    def categorizar(self, concepto: Optional[str], notas: Optional[str]) -> Optional[int]:
+        """Categoría de la primera regla que coincide, o None si ninguna lo hace."""
+
+        if self.registro is not None:
+            return self.categorizar_lote([concepto], [notas])[0]
+        mejor = self.coincidencia(concepto, notas)
+        return mejor.categoria_id if mejor is not None else None
+
+    def categorizar_lote(
+        self, conceptos: Iterable[Optional[str]], notas: Iterable[Optional[str]]
+    ) -> list[Optional[int]]:
+        """Aplica `categorizar` a lotes de conceptos y notas alineados."""
+
+        if not self:
+            return [None for _ in conceptos]
+        if self.registro is None:
+            return [self.categorizar(concepto, nota) for concepto, nota in zip(conceptos, notas)]
+
+        aciertos: Counter[int] = Counter()
+        tiempos_ns: Counter[int] = Counter()
+        categorias: list[Optional[int]] = []
+        reloj = time.perf_counter_ns
+        for concepto, nota in zip(conceptos, notas):
+            inicio = reloj()
+            mejor = self.coincidencia(concepto, nota)
+            if mejor is None:
+                categorias.append(None)
+                continue
+            categorias.append(mejor.categoria_id)
+            if mejor.regla_id is not None:
+                aciertos[mejor.regla_id] += 1
+                tiempos_ns[mejor.regla_id] += reloj() - inicio
+        self.registro.registrar(aciertos, tiempos_ns, len(categorias))
+        return categorias
+
+
+def compilar_reglas(db: Session) -> ReglasCompiladas:
+    """Carga las reglas con una única consulta y las prepara para evaluarse.
+
+    Con `RULE_STATS_ENABLED` las evaluaciones se registran en
+    `estadisticas_reglas`.
+    """
+
+    reglas = (
+        db.execute(
+            select(ReglaAutoCategoria).order_by(
+                ReglaAutoCategoria.prioridad, ReglaAutoCategoria.id.desc()
+            )
+        )
+        .scalars()
+        .all()
+    )
+    por_campo: dict[CampoObjetivo, list[PatronCompilado]] = {campo: [] for campo in CampoObjetivo}
+    for posicion, regla in enumerate(reglas):
+        por_campo[regla.campo_objetivo].append(_compilar_patron(posicion, regla))
+    registro = estadisticas_reglas if get_settings().rule_stats_enabled else None
+    return ReglasCompiladas(
+        {campo: tuple(patrones) for campo, patrones in por_campo.items()}, registro=registro
+    )
+
+
+def _compilar_patron(
+    posicion: int, regla: Union[ReglaAutoCategoria, ReglaCreate]
+) -> PatronCompilado:
+    patron = regla.pattern if regla.tipo_match == TipoMatch.regex else regla.pattern.lower()
+    regla_id = regla.id if isinstance(regla, ReglaAutoCategoria) else None
+    return PatronCompilado(posicion, patron, regla.categoria_id, regla.tipo_match, regla_id)
+
+
+def aplicar_reglas_movimiento(
+    db: Session, movimiento: Movimiento, reglas: Optional[ReglasCompiladas] = None
+) -> None:
     """Asigna categorías según reglas definidas.
 
-    La estrategia actual aplica reglas secuencialmente con coincidencia
-    "contains" insensible a mayúsculas. En futuras versiones se pueden añadir
-    patrones avanzados o prioridades.
+    Gana la primera regla en orden de prioridad cuya coincidencia, insensible
+    a mayúsculas, se cumple. Para varios movimientos conviene
+    compilar las reglas una vez con `compilar_reglas` y pasarlas en `reglas`.
     """
 
-    reglas = db.query(ReglaAutoCategoria).all()
-    for regla in reglas:
-        valor_objetivo = getattr(movimiento, regla.campo_objetivo.value) or ""
-        if regla.tipo_match.value == "contains" and regla.pattern.lower() in valor_objetivo.lower():
-            movimiento.categoria_id = regla.categoria_id
+    reglas = reglas if reglas is not None else compilar_reglas(db)
+    categoria_id = reglas.categorizar(movimiento.concepto, movimiento.notas)
+    if categoria_id is not None:
+        movimiento.categoria_id = categoria_id
 
 
-def reaplicar_reglas(db: Session) -> int:
+def reaplicar_reglas(db: Session, modo: ModoReaplicacion = ModoReaplicacion.sql) -> int:
     """Reaplica las reglas a todos los movimientos existentes.
 
     Returns:
         int: número de movimientos actualizados.
     """
 
-    reglas = db.query(ReglaAutoCategoria).all()
+    if modo == ModoReaplicacion.sql:
+        actualizados = reaplicar_reglas_sql(db)
+    elif modo == ModoReaplicacion.bloques:
+        actualizados = reaplicar_reglas_por_bloques(db)
+    else:
+        actualizados = _reaplicar_en_memoria(db)
+    estadisticas_reglas.volcar(db, forzar=True)
+    return actualizados
+
+
+def _contiene(texto: ColumnElement, patron: str, dialecto: str) -> ColumnElement:
+    """Predicado "contiene" sobre texto ya en minúsculas.
+
+    `instr`/`strpos` buscan una subcadena literal sin interpretar `%` ni `_` y
+    son más baratos que `LIKE`, que queda para el resto de bases de datos.
+    """
+
+    if dialecto == "sqlite":
+        return func.instr(texto, patron) > 0
+    if dialecto == "postgresql":
+        return func.strpos(texto, patron) > 0
+    return texto.contains(patron, autoescape=True)
+
+
+def _predicado(texto: ColumnElement, patron: PatronCompilado, dialecto: str):
+    """Predicado SQL de un patrón sobre texto ya en minúsculas.
+
+    "word" y "regex" usan `REGEXP`, que en SQLite es `re.search` de Python y da
+    exactamente el mismo resultado que `ExpresionCombinada`. Otras bases de
+    datos tienen su propia sintaxis de expresiones regulares, así que para
+    ellas se devuelve None y esas reglas se evalúan en Python.
+    """
+
+    if patron.tipo == TipoMatch.contains:
+        return _contiene(texto, patron.patron, dialecto)
+    if patron.tipo == TipoMatch.starts_with:
+        if dialecto == "sqlite":
+            return func.instr(texto, patron.patron) == 1
+        if dialecto == "postgresql":
+            return func.strpos(texto, patron.patron) == 1
+        return texto.startswith(patron.patron, autoescape=True)
+    if dialecto == "sqlite":
+        return texto.regexp_match(expresion_regular(patron.tipo, patron.patron))
+    return None
+
+
+def _evaluable_en_sql(reglas: ReglasCompiladas, dialecto: str) -> bool:
+    return dialecto == "sqlite" or all(
+        patron.tipo in (TipoMatch.contains, TipoMatch.starts_with)
+        for patrones in reglas.por_campo.values()
+        for patron in patrones
+    )
+
+
+def _categorias_por_reglas(reglas: ReglasCompiladas, dialecto: str, inicio: int, fin: int):
+    """Subconsulta `(id, categoria_id)` con la categoría que dan las reglas.
+
+    Concepto y notas se pasan a minúsculas una sola vez por fila, en una CTE
+    materializada (PostgreSQL 12+ o SQLite 3.35+). Las ramas del `CASE` siguen
+    el orden de evaluación, así que la primera que se cumple es la regla que
+    gana. Sin coincidencias se conserva la categoría actual.
+    """
+
+    textos = _textos_en_minusculas(inicio, fin)
+    nueva_categoria = _primera_regla(
+        reglas, textos, dialecto, lambda patron: patron.categoria_id, else_=textos.c.categoria_id
+    )
+    return select(textos.c.id, nueva_categoria.label("categoria_id")).subquery("nuevas")
+
+
+def _textos_en_minusculas(inicio: int, fin: int):
+    tabla = Movimiento.__table__
+    return (
+        select(
+            tabla.c.id,
+            tabla.c.categoria_id,
+            func.lower(tabla.c.concepto).label("concepto"),
+            func.lower(func.coalesce(tabla.c.notas, "")).label("notas"),
+        )
+        .where(tabla.c.id.between(inicio, fin))
+        .cte("textos", nesting=True)
+        # Sin MATERIALIZED, SQLite aplana la subconsulta y repite `lower()` en
+        # cada rama del CASE.
+        .prefix_with("MATERIALIZED")
+    )
+
+
+def _primera_regla(
+    reglas: ReglasCompiladas,
+    textos,
+    dialecto: str,
+    valor: Callable[[PatronCompilado], int],
+    else_=None,
+):
+    """`CASE` con `valor(patron)` de la primera regla que se cumple sobre `textos`."""
+
+    patrones = sorted(
+        ((patron, campo) for campo, lista in reglas.por_campo.items() for patron in lista),
+        key=lambda par: par[0].posicion,
+    )
+    return case(
+        *[
+            (
+                _predicado(textos.c[campo.value], patron, dialecto),
+                literal_column(str(int(valor(patron)))),
+            )
+            for patron, campo in patrones
+        ],
+        else_=else_,
+    )
+
+
+def _registrar_aciertos_sql(
+    db: Session, reglas: ReglasCompiladas, dialecto: str, minimo: int, maximo: int
+) -> None:
+    """Cuenta en la base de datos los aciertos de cada regla para las estadísticas.
+
+    El modo SQL no evalúa en Python, así que solo registra aciertos (sin tiempos)
+    con una consulta agregada adicional por rango de ids.
+    """
+
+    por_posicion = {p.posicion: p for lista in reglas.por_campo.values() for p in lista}
+    aciertos: Counter[int] = Counter()
+    evaluaciones = 0
+    for inicio in range(minimo, maximo + 1, TAMANO_LOTE_REAPLICACION):
+        textos = _textos_en_minusculas(inicio, inicio + TAMANO_LOTE_REAPLICACION - 1)
+        posicion = _primera_regla(reglas, textos, dialecto, lambda patron: patron.posicion)
+        for valor, total in db.execute(select(posicion, func.count()).group_by(posicion)):
+            evaluaciones += total
+            patron = por_posicion.get(valor)
+            if patron is not None and patron.regla_id is not None:
+                aciertos[patron.regla_id] += total
+    reglas.registro.registrar(aciertos, Counter(), evaluaciones)  # type: ignore[union-attr]
+
+
+def reaplicar_reglas_sql(db: Session) -> int:
+    """Reaplica las reglas con sentencias `UPDATE ... FROM` por rangos de ids.
+
+    La categoría nueva se calcula con un `CASE` en la propia base de datos y
+    solo se escriben las filas cuya categoría cambia, así que la suma de
+    `rowcount` es el número real de movimientos actualizados. No se carga
+    ningún objeto ORM. Si hay reglas que la base de datos no puede evaluar
+    (ver `_predicado`), se recurre a `reaplicar_reglas_por_bloques`.
+    """
+
+    reglas = compilar_reglas(db)
+    if not reglas:
+        return 0
+    dialecto = db.get_bind().dialect.name
+    if not _evaluable_en_sql(reglas, dialecto):
+        return reaplicar_reglas_por_bloques(db)
+    tabla = Movimiento.__table__
+    minimo, maximo = db.execute(select(func.min(tabla.c.id), func.max(tabla.c.id))).one()
+    if minimo is None:
+        return 0
+    if reglas.registro is not None:
+        _registrar_aciertos_sql(db, reglas, dialecto, minimo, maximo)
+    actualizados = 0
+    for inicio in range(minimo, maximo + 1, TAMANO_LOTE_REAPLICACION):
+        nuevas = _categorias_por_reglas(
+            reglas, dialecto, inicio, inicio + TAMANO_LOTE_REAPLICACION - 1
+        )
+        resultado = db.execute(
+            update(tabla)
+            .where(tabla.c.id == nuevas.c.id, tabla.c.categoria_id != nuevas.c.categoria_id)
+            .values(categoria_id=nuevas.c.categoria_id)
+        )
+        actualizados += resultado.rowcount
+    db.commit()
+    return actualizados
+
+
+def reaplicar_reglas_por_bloques(db: Session) -> int:
+    """Reaplica las reglas en Python recorriendo los movimientos por rangos de id.
+
+    Cada bloque de `TAMANO_BLOQUE_REAPLICACION` ids se lee en streaming
+    (`yield_per`) solo con las columnas necesarias, se evalúa con las reglas
+    compiladas y se escriben únicamente las filas que cambian, con un UPDATE
+    masivo por clave primaria y un commit por bloque. Así la memoria no depende
+    del tamaño de la tabla y SQLite no queda bloqueado durante toda la pasada.
+
+    Tras cada bloque se guarda un punto de control con el último id procesado.
+    Si una ejecución se interrumpe, la siguiente continúa desde ahí siempre que
+    las reglas no hayan cambiado; el valor devuelto incluye lo actualizado
+    antes de la interrupción.
+    """
+
+    reglas = compilar_reglas(db)
+    punto = db.get(PuntoControl, CLAVE_PUNTO_CONTROL)
+    if punto is None or punto.firma != reglas.firma:
+        if punto is not None:
+            db.delete(punto)
+            db.flush()
+        punto = PuntoControl(
+            clave=CLAVE_PUNTO_CONTROL, ultimo_id=0, firma=reglas.firma, procesados=0, actualizados=0
+        )
+        db.add(punto)
+        db.commit()
+    maximo = db.scalar(select(func.max(Movimiento.id))) or 0
+
+    while punto.ultimo_id < maximo:
+        fin = punto.ultimo_id + TAMANO_BLOQUE_REAPLICACION
+        filas = db.execute(
+            select(Movimiento.id, Movimiento.concepto, Movimiento.notas, Movimiento.categoria_id)
+            .where(Movimiento.id > punto.ultimo_id, Movimiento.id <= fin)
+            .order_by(Movimiento.id)
+            .execution_options(yield_per=1_000)
+        )
+        cambios = []
+        leidas = 0
+        for particion in filas.partitions():
+            leidas += len(particion)
+            categorias = reglas.categorizar_lote(
+                [f.concepto for f in particion], [f.notas for f in particion]
+            )
+            cambios.extend(
+                {"id": fila.id, "categoria_id": categoria}
+                for fila, categoria in zip(particion, categorias)
+                if categoria is not None and categoria != fila.categoria_id
+            )
+        if cambios:
+            db.execute(update(Movimiento), cambios)
+        punto.ultimo_id = min(fin, maximo)
+        punto.procesados += leidas
+        punto.actualizados += len(cambios)
+        db.commit()
+        estadisticas_reglas.volcar(db)
+
+    actualizados = punto.actualizados
+    db.delete(punto)
+    db.commit()
+    return actualizados
+
+
+def _coincide_en_sql(
+    campo: CampoObjetivo, tipo: TipoMatch, patron: str, dialecto: str
+) -> Optional[ColumnElement]:
+    """Predicado SQL equivalente a una regla sobre `campo`, o None (ver `_predicado`).
+
+    En SQLite `lower()` es la función de Python registrada en la conexión y
+    domina el coste. Con patrones literales ASCII se antepone el `LIKE`
+    nativo, que ya ignora mayúsculas en ASCII: descarta casi todas las filas
+    sin llamar a Python y, para "contains", es exacto cuando el texto también
+    es ASCII imprimible, así que solo los textos con otros caracteres pasan
+    por `lower()`.
+    """
+
+    columna = Movimiento.concepto if campo == CampoObjetivo.concepto else Movimiento.notas
+    texto = func.coalesce(columna, "")
+    compilado = PatronCompilado(0, patron if tipo == TipoMatch.regex else patron.lower(), 0, tipo)
+    condicion = _predicado(func.lower(texto), compilado, dialecto)
+    literal = compilado.patron
+    if dialecto != "sqlite" or tipo == TipoMatch.regex or not literal or not literal.isascii():
+        return condicion
+    if tipo == TipoMatch.contains:
+        condicion = or_(not_(texto.op("GLOB")("*[^ -~]*")), condicion)
+    return and_(texto.contains(literal, autoescape=True), condicion)
+
+
+def _acotar_con_indice(
+    condicion: Optional[ColumnElement], campo: CampoObjetivo, tipo: TipoMatch, patron: str
+) -> Optional[ColumnElement]:
+    """Antepone a `condicion` la búsqueda en el índice de texto del patrón de la regla.
+
+    Toda coincidencia "contains", "starts_with" o "word" contiene el patrón
+    literal, así que `coincide_texto` (FTS5 en SQLite, `lower(campo) LIKE`
+    sobre el índice `pg_trgm` en PostgreSQL) acota las filas y `condicion`, el
+    predicado exacto de `_coincide_en_sql`, solo se evalúa sobre ellas. Para
+    "contains" la búsqueda ya es exacta y `condicion` sobra: cuando coinciden
+    casi todas las filas, evaluarla de nuevo duplicaría el coste. Si
+    `condicion` es None se devuelven los candidatos, que incluyen todas las
+    coincidencias. Las reglas "regex" no tienen un literal que buscar.
+    """
+
+    if tipo == TipoMatch.regex or not patron:
+        return condicion
+    candidatos = coincide_texto(patron, (campo.value,))
+    if tipo == TipoMatch.contains or condicion is None:
+        return candidatos
+    return and_(candidatos, condicion)
+
+
+def reaplicar_reglas_afectadas(
+    db: Session, patrones: Iterable[tuple[CampoObjetivo, TipoMatch, str]]
+) -> int:
+    """Reevalúa solo los movimientos a los que afecta un cambio de reglas.
+
+    `patrones` son los trios (campo, tipo, patrón) de la regla antes y después
+    del cambio: un movimiento que no coincide con ninguno de ellos conserva la
+    misma categoría, así que no hace falta mirarlo. Los candidatos se evalúan
+    contra el conjunto completo de reglas y solo se escriben los que cambian.
+    Devuelve el número de movimientos actualizados.
+    """
+
+    dialecto = db.get_bind().dialect.name
+    condiciones = [
+        _acotar_con_indice(_coincide_en_sql(campo, tipo, patron, dialecto), campo, tipo, patron)
+        for campo, tipo, patron in set(patrones)
+    ]
+    if not condiciones:
+        return 0
+    # Una regla que la base de datos no sabe evaluar obliga a mirar todas las filas.
+    filtro = true() if any(c is None for c in condiciones) else or_(*condiciones)
+    reglas = compilar_reglas(db)
+    filas = db.execute(
+        select(Movimiento.id, Movimiento.concepto, Movimiento.notas, Movimiento.categoria_id)
+        .where(filtro)
+        .execution_options(yield_per=1_000)
+    )
+    cambios = []
+    for particion in filas.partitions():
+        categorias = reglas.categorizar_lote(
+            [f.concepto for f in particion], [f.notas for f in particion]
+        )
+        cambios.extend(
+            {"id": fila.id, "categoria_id": categoria}
+            for fila, categoria in zip(particion, categorias)
+            if categoria is not None and categoria != fila.categoria_id
+        )
+    if cambios:
+        db.execute(update(Movimiento), cambios)
+    db.commit()
+    estadisticas_reglas.volcar(db)
+    return len(cambios)
+
+
+# Columnas de los movimientos de muestra de una simulación.
+_COLUMNAS_MUESTRA = (
+    Movimiento.id,
+    Movimiento.fecha,
+    Movimiento.concepto,
+    Movimiento.notas,
+    Movimiento.importe,
+    Movimiento.categoria_id,
+)
+
+
+def simular_regla(db: Session, regla: ReglaCreate, limite_muestra: int = 20) -> SimulacionRegla:
+    """Calcula, sin escribir nada, qué movimientos recategorizaría `regla`.
+
+    La regla nueva se evaluaría antes que las existentes de su misma
+    prioridad, así que gana en todo movimiento con el que coincida y que no
+    coincida con ninguna regla de prioridad más alta. Basta una consulta
+    agregada por categoría actual, que localiza las coincidencias con el
+    índice de texto (`_acotar_con_indice`), y otra acotada para la muestra de
+    los movimientos más recientes. Si alguna de esas reglas no se puede evaluar en
+    la base de datos, el cálculo se hace en Python (`_simular_en_python`).
+    """
+
+    dialecto = db.get_bind().dialect.name
+    anteriores = (
+        db.execute(
+            select(ReglaAutoCategoria)
+            .where(ReglaAutoCategoria.prioridad < regla.prioridad)
+            .order_by(ReglaAutoCategoria.prioridad, ReglaAutoCategoria.id.desc())
+        )
+        .scalars()
+        .all()
+    )
+    exacto = _coincide_en_sql(regla.campo_objetivo, regla.tipo_match, regla.pattern, dialecto)
+    excluidas = [
+        _coincide_en_sql(r.campo_objetivo, r.tipo_match, r.pattern, dialecto) for r in anteriores
+    ]
+    if exacto is None or any(condicion is None for condicion in excluidas):
+        return _simular_en_python(db, regla, anteriores, limite_muestra)
+    coincide = _acotar_con_indice(exacto, regla.campo_objetivo, regla.tipo_match, regla.pattern)
+    if excluidas:
+        no_excluida = not_(or_(*excluidas))
+        exacto, coincide = and_(exacto, no_excluida), and_(coincide, no_excluida)
+    conteos = (
+        select(Movimiento.categoria_id, func.count().label("movimientos"))
+        .where(coincide)
+        .group_by(Movimiento.categoria_id)
+        .subquery()
+    )
+    filas = db.execute(
+        select(conteos.c.categoria_id, conteos.c.movimientos).order_by(
+            conteos.c.movimientos.desc(), conteos.c.categoria_id
+        )
+    ).all()
+    muestra = []
+    afectados = sum(total for categoria_id, total in filas if categoria_id != regla.categoria_id)
+    if afectados and limite_muestra > 0:
+        # Los más recientes por id. Si los afectados abundan, recorrer la tabla
+        # hacia atrás con el predicado exacto se detiene enseguida; si son
+        # pocos, ese recorrido leería casi toda la tabla y se usa el índice.
+        maximo = db.scalar(select(func.max(Movimiento.id))) or 0
+        denso = afectados * DENSIDAD_MUESTRA_POR_RECORRIDO >= maximo
+        filas_muestra = db.execute(
+            select(*_COLUMNAS_MUESTRA)
+            .where(exacto if denso else coincide, Movimiento.categoria_id != regla.categoria_id)
+            .order_by(Movimiento.id.desc())
+            .limit(limite_muestra)
+        ).mappings()
+        muestra = [MovimientoAfectado(**fila) for fila in filas_muestra]
+    return _resultado_simulacion(db, regla, dict(filas), muestra)
+
+
+def _simular_en_python(
+    db: Session,
+    regla: ReglaCreate,
+    anteriores: Sequence[ReglaAutoCategoria],
+    limite_muestra: int,
+) -> SimulacionRegla:
+    """Simulación con las reglas compiladas, recorriendo los movimientos en streaming."""
+
+    por_campo: dict[CampoObjetivo, list[PatronCompilado]] = {campo: [] for campo in CampoObjetivo}
+    for posicion, anterior in enumerate(anteriores):
+        por_campo[anterior.campo_objetivo].append(_compilar_patron(posicion, anterior))
+    candidata = _compilar_patron(len(anteriores), regla)
+    por_campo[regla.campo_objetivo].append(candidata)
+    reglas = ReglasCompiladas({campo: tuple(patrones) for campo, patrones in por_campo.items()})
+
+    conteos: Counter[Optional[int]] = Counter()
+    muestra: list[MovimientoAfectado] = []
+    filas = db.execute(
+        select(*_COLUMNAS_MUESTRA).order_by(Movimiento.id.desc()).execution_options(yield_per=1_000)
+    ).mappings()
+    for fila in filas:
+        if reglas.coincidencia(fila["concepto"], fila["notas"]) is not candidata:
+            continue
+        conteos[fila["categoria_id"]] += 1
+        if fila["categoria_id"] != regla.categoria_id and len(muestra) < limite_muestra:
+            muestra.append(MovimientoAfectado(**fila))
+    return _resultado_simulacion(db, regla, conteos, muestra)
+
+
+def _resultado_simulacion(
+    db: Session,
+    regla: ReglaCreate,
+    conteos: dict[Optional[int], int],
+    muestra: list[MovimientoAfectado],
+) -> SimulacionRegla:
+    afectadas = {c: total for c, total in conteos.items() if c != regla.categoria_id}
+    nombres = dict(
+        db.execute(select(Categoria.id, Categoria.nombre).where(Categoria.id.in_(afectadas))).all()
+    )
+    por_categoria = [
+        ImpactoCategoria(
+            categoria_id=categoria_id, categoria_nombre=nombres.get(categoria_id), movimientos=total
+        )
+        for categoria_id, total in sorted(afectadas.items(), key=lambda par: (-par[1], par[0] or 0))
+    ]
+    return SimulacionRegla(
+        coincidencias=sum(conteos.values()),
+        a_recategorizar=sum(afectadas.values()),
+        por_categoria=por_categoria,
+        muestra=muestra,
+    )
+
+
+def listar_estadisticas(db: Session) -> list[EstadisticaReglaRead]:
+    """Estadísticas de todas las reglas, de más a menos aciertos.
+
+    Vuelca antes lo pendiente en memoria. Las reglas que nunca han coincidido
+    aparecen con cero aciertos, al final.
+    """
+
+    estadisticas_reglas.volcar(db, forzar=True)
+    aciertos = func.coalesce(EstadisticaRegla.aciertos, 0)
+    filas = db.execute(
+        select(
+            ReglaAutoCategoria.id.label("regla_id"),
+            ReglaAutoCategoria.pattern,
+            ReglaAutoCategoria.campo_objetivo,
+            ReglaAutoCategoria.tipo_match,
+            ReglaAutoCategoria.prioridad,
+            ReglaAutoCategoria.categoria_id,
+            aciertos.label("aciertos"),
+            func.coalesce(EstadisticaRegla.tiempo_ms, 0.0).label("tiempo_ms"),
+            EstadisticaRegla.ultimo_acierto,
+        )
+        .outerjoin(EstadisticaRegla, EstadisticaRegla.regla_id == ReglaAutoCategoria.id)
+        .order_by(aciertos.desc(), ReglaAutoCategoria.prioridad, ReglaAutoCategoria.id.desc())
+    ).mappings()
+    return [EstadisticaReglaRead(**fila) for fila in filas]
+
+
+def _reaplicar_en_memoria(db: Session) -> int:
+    """Evalúa las reglas en Python sobre todos los movimientos cargados."""
+
+    reglas = compilar_reglas(db)
     movimientos = db.query(Movimiento).all()
     actualizados = 0
     for movimiento in movimientos:
         categoria_original = movimiento.categoria_id
-        for regla in reglas:
-            valor_objetivo = getattr(movimiento, regla.campo_objetivo.value) or ""
-            if regla.tipo_match.value == "contains" and regla.pattern.lower() in valor_objetivo.lower():
-                movimiento.categoria_id = regla.categoria_id
+        aplicar_reglas_movimiento(db, movimiento, reglas)
         if movimiento.categoria_id != categoria_original:
             actualizados += 1
     db.commit()
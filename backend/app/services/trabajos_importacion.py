@@ -0,0 +1,190 @@
+"""Importaciones CSV en segundo plano con progreso y cancelación.
+
+Cada trabajo se registra en `trabajos_importacion` y se ejecuta en un pool de
+hilos de tamaño configurable (`IMPORT_MAX_JOBS`). Durante la ejecución el
+progreso se mantiene en memoria, porque la importación ocupa una única
+transacción y en SQLite escribir en otra conexión competiría por el mismo
+bloqueo; el estado se persiste en cada transición (inicio, fin, cancelación o
+error) y las consultas combinan ambas fuentes.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.app.core.config import get_settings
+from backend.app.models import TrabajoImportacion
+from backend.app.models.entities import EstadoTrabajo
+from backend.app.schemas.importacion import (
+    ColumnMapping,
+    CsvImportResult,
+    ImportOptions,
+    TrabajoImportacionRead,
+)
+from backend.app.services.importador_csv import ImportacionCancelada, OrigenCsv, apply_import
+
+ESTADOS_FINALES = {EstadoTrabajo.completado, EstadoTrabajo.cancelado, EstadoTrabajo.error}
+
+MENSAJE_INTERRUMPIDO = "Importación interrumpida por un reinicio del servidor; vuelve a lanzarla"
+
+
+class GestorTrabajos:
+    """Planifica trabajos de importación y lleva su progreso en vivo."""
+
+    def __init__(self, max_trabajos: int) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix="importacion")
+        self._cancelaciones: dict[str, threading.Event] = {}
+        self._progreso: dict[str, CsvImportResult] = {}
+        self._futuros: dict[str, Future] = {}
+        self._cerrojo = threading.Lock()
+
+    def crear(
+        self,
+        db: Session,
+        session_factory: sessionmaker,
+        origen: Optional[OrigenCsv],
+        mapping: ColumnMapping,
+        options: ImportOptions,
+        ruta_temporal: Optional[str] = None,
+    ) -> TrabajoImportacion:
+        """Registra el trabajo y lo encola.
+
+        Si se indica `ruta_temporal`, el CSV se lee de ese fichero en lugar de
+        `origen` y se borra al terminar el trabajo.
+        """
+
+        trabajo = TrabajoImportacion(id=uuid.uuid4().hex, estado=EstadoTrabajo.pendiente)
+        db.add(trabajo)
+        db.commit()
+        db.refresh(trabajo)
+        with self._cerrojo:
+            self._cancelaciones[trabajo.id] = threading.Event()
+            self._futuros[trabajo.id] = self._pool.submit(
+                self._ejecutar, trabajo.id, session_factory, origen, mapping, options, ruta_temporal
+            )
+        return trabajo
+
+    def marcar_interrumpidos(self, db: Session) -> int:
+        """Pasa a `error` los trabajos que un proceso anterior dejó sin terminar.
+
+        Los trabajos solo viven en el pool del proceso que los creó: tras un
+        reinicio nadie los retomará y quien consulte su estado esperaría para
+        siempre. Se llama al arrancar, antes de aceptar trabajos nuevos, y
+        asume que un único proceso ejecuta las importaciones. Devuelve cuántos
+        trabajos se han marcado.
+        """
+
+        resultado = db.execute(
+            update(TrabajoImportacion)
+            .where(TrabajoImportacion.estado.in_([EstadoTrabajo.pendiente, EstadoTrabajo.en_curso]))
+            .values(estado=EstadoTrabajo.error, mensaje=MENSAJE_INTERRUMPIDO)
+        )
+        db.commit()
+        return resultado.rowcount
+
+    def cancelar(self, trabajo_id: str) -> bool:
+        """Solicita la cancelación; devuelve False si el trabajo no está activo."""
+
+        with self._cerrojo:
+            evento = self._cancelaciones.get(trabajo_id)
+        if evento is None:
+            return False
+        evento.set()
+        return True
+
+    def esperar(self, trabajo_id: str, timeout: Optional[float] = None) -> None:
+        """Bloquea hasta que el trabajo termine (útil en pruebas y scripts).
+
+        Los trabajos ya finalizados se olvidan, así que retorna de inmediato.
+        """
+
+        with self._cerrojo:
+            futuro = self._futuros.get(trabajo_id)
+        if futuro is not None:
+            futuro.result(timeout=timeout)
+
+    def estado(self, db: Session, trabajo_id: str) -> Optional[TrabajoImportacionRead]:
+        """Estado persistido del trabajo con el progreso en vivo superpuesto."""
+
+        trabajo = db.get(TrabajoImportacion, trabajo_id)
+        if trabajo is None:
+            return None
+        db.refresh(trabajo)
+        lectura = TrabajoImportacionRead.model_validate(trabajo)
+        with self._cerrojo:
+            progreso = self._progreso.get(trabajo_id)
+        if progreso is not None and lectura.estado not in ESTADOS_FINALES:
+            lectura = lectura.model_copy(update=_contadores(progreso))
+        return lectura
+
+    def _ejecutar(
+        self,
+        trabajo_id: str,
+        session_factory: sessionmaker,
+        origen: Optional[OrigenCsv],
+        mapping: ColumnMapping,
+        options: ImportOptions,
+        ruta_temporal: Optional[str],
+    ) -> None:
+        cancelacion = self._cancelaciones[trabajo_id]
+
+        def _registrar_progreso(parcial: CsvImportResult) -> None:
+            with self._cerrojo:
+                self._progreso[trabajo_id] = parcial
+            if cancelacion.is_set():
+                raise ImportacionCancelada()
+
+        db = session_factory()
+        fichero = open(ruta_temporal, "rb") if ruta_temporal else None
+        try:
+            trabajo = db.get(TrabajoImportacion, trabajo_id)
+            if cancelacion.is_set():
+                trabajo.estado = EstadoTrabajo.cancelado
+                db.commit()
+                return
+            trabajo.estado = EstadoTrabajo.en_curso
+            db.commit()
+            try:
+                resultado = apply_import(
+                    fichero or origen, mapping, options, db, progreso=_registrar_progreso  # type: ignore[arg-type]
+                )
+            except ImportacionCancelada:
+                trabajo.estado = EstadoTrabajo.cancelado
+                trabajo.mensaje = "Importación cancelada; no se ha guardado ningún movimiento"
+            except Exception as exc:  # noqa: BLE001
+                trabajo.estado = EstadoTrabajo.error
+                trabajo.mensaje = str(exc)[:500]
+            else:
+                trabajo.estado = EstadoTrabajo.completado
+                for campo, valor in _contadores(resultado).items():
+                    setattr(trabajo, campo, valor)
+            db.commit()
+        finally:
+            db.close()
+            with self._cerrojo:
+                self._cancelaciones.pop(trabajo_id, None)
+                self._progreso.pop(trabajo_id, None)
+                self._futuros.pop(trabajo_id, None)
+            if fichero is not None:
+                fichero.close()
+                os.remove(ruta_temporal)  # type: ignore[arg-type]
+
+
+def _contadores(resultado: CsvImportResult) -> dict[str, int]:
+    return {
+        "filas_leidas": resultado.total_rows,
+        "filas_duplicadas": resultado.skipped_duplicates,
+        "filas_insertadas": resultado.imported,
+        "filas_error": resultado.skipped_errors,
+    }
+
+
+gestor_trabajos = GestorTrabajos(max_trabajos=get_settings().import_max_jobs)
+"""Instancia compartida por los endpoints de importación."""
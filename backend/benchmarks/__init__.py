@@ -0,0 +1,5 @@
+"""Benchmarks reproducibles de los servicios del backend.
+
+Cada módulo se ejecuta de forma independiente, por ejemplo
+`python -m backend.benchmarks.bench_preview --rows 300000`.
+"""
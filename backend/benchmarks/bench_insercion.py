@@ -0,0 +1,133 @@
+"""Benchmark de la escritura de movimientos importados.
+
+Compara el camino ORM anterior (un `Movimiento` por fila con `db.add`) con
+`_insertar_movimientos`, que envía lotes executemany por Core (o `COPY` en
+PostgreSQL). Usa una base SQLite temporal salvo que se indique `--database-url`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.core.database import Base
+from backend.app.models import Categoria, MetodoPago, Movimiento, TipoMovimiento
+from backend.app.schemas.importacion import CsvPreviewRow, ImportOptions
+from backend.app.services.importador_csv import _filas_insercion, _insertar_movimientos
+
+
+def generar_filas(filas: int, semilla: int = 7) -> list[CsvPreviewRow]:
+    """Filas ya validadas tal y como salen de la previsualización."""
+
+    rnd = random.Random(semilla)
+    inicio = date(2012, 1, 1)
+    resultado = []
+    for indice in range(filas):
+        importe = round(rnd.uniform(-500, 500), 2) or 1.0
+        resultado.append(
+            CsvPreviewRow.model_construct(
+                raw_index=indice,
+                fecha=inicio + timedelta(days=rnd.randint(0, 4380)),
+                concepto=f"Movimiento {indice % 977}",
+                importe=importe,
+                saldo=None,
+                tipo_id=1 if importe < 0 else 2,
+                categoria_id=1,
+                metodo_pago_id=1,
+                notas=None,
+                is_duplicate=False,
+                errors=[],
+            )
+        )
+    return resultado
+
+
+def escritura_orm(db, filas: list[CsvPreviewRow], options: ImportOptions) -> None:
+    """Camino anterior: unit of work completo por fila."""
+
+    for row in filas:
+        movimiento = Movimiento(
+            fecha=row.fecha,
+            concepto=row.concepto,
+            importe=row.importe,
+            saldo=row.saldo,
+            tipo_id=row.tipo_id,
+            categoria_id=row.categoria_id,
+            metodo_pago_id=row.metodo_pago_id,
+            notas=row.notas,
+        )
+        movimiento.rellenar_campos_derivados()
+        db.add(movimiento)
+    db.commit()
+
+
+def escritura_masiva(db, filas: list[CsvPreviewRow], options: ImportOptions) -> None:
+    """Camino actual: campos derivados por lote e inserción masiva."""
+
+    _insertar_movimientos(db, _filas_insercion(filas, options))
+    db.commit()
+
+
+def _medir(nombre: str, funcion, session_factory, filas, options) -> float:
+    db = session_factory()
+    try:
+        db.execute(delete(Movimiento))
+        db.commit()
+        inicio = time.perf_counter()
+        funcion(db, filas, options)
+        segundos = time.perf_counter() - inicio
+    finally:
+        db.close()
+    print(
+        f"{nombre:<8} {len(filas):>9} filas  {segundos:8.2f} s"
+        f"  {len(filas) / segundos:>12,.0f} filas/s"
+    )
+    return segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000, help="Filas a insertar")
+    parser.add_argument("--database-url", default=None, help="Base de datos de destino")
+    parser.add_argument("--skip-orm", action="store_true", help="Omitir el camino ORM (lento)")
+    args = parser.parse_args()
+
+    ruta_temporal = None
+    url = args.database_url
+    if url is None:
+        descriptor, ruta_temporal = tempfile.mkstemp(suffix=".db")
+        os.close(descriptor)
+        url = f"sqlite:///{ruta_temporal}"
+
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, future=True)
+    with session_factory() as db:
+        db.merge(TipoMovimiento(id=1, nombre="Gasto"))
+        db.merge(TipoMovimiento(id=2, nombre="Ingreso"))
+        db.merge(Categoria(id=1, nombre="General", es_fijo=False))
+        db.merge(MetodoPago(id=1, nombre="Tarjeta"))
+        db.commit()
+
+    filas = generar_filas(args.rows)
+    options = ImportOptions()
+    try:
+        despues = _medir("masiva", escritura_masiva, session_factory, filas, options)
+        if not args.skip_orm:
+            antes = _medir("orm", escritura_orm, session_factory, filas, options)
+            print(f"aceleración x{antes / despues:.1f}")
+    finally:
+        engine.dispose()
+        if ruta_temporal:
+            os.remove(ruta_temporal)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark del listado paginado de movimientos.
+
+Compara el camino anterior, que lanzaba tres sentencias con los mismos joins
+y filtros (recuento, página y agregados), con los dos de `listar_movimientos`:
+página más agregados con el total incluido, y página y agregados en una sola
+sentencia con funciones de ventana (`_pagina_con_agregados`, el usado en
+PostgreSQL). Cuenta las sentencias ejecutadas además del tiempo. Usa una base
+SQLite temporal salvo que se indique `--database-url`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.core.database import Base
+from backend.app.models import Categoria, MetodoPago, TipoMovimiento
+from backend.app.schemas.importacion import ImportOptions
+from backend.app.schemas.movimientos import MovimientoFiltro
+from backend.app.services.importador_csv import _filas_insercion, _insertar_movimientos
+from backend.app.services.movimientos import (
+    _aplicar_ordenacion,
+    _calcular_agregados,
+    _mapear_items,
+    _pagina_con_agregados,
+    _paginar,
+    _query_base_movimientos,
+    aplicar_filtros,
+    listar_movimientos,
+)
+from backend.benchmarks.bench_insercion import generar_filas
+
+FILTROS = {
+    "sin filtro": MovimientoFiltro(),
+    "concepto": MovimientoFiltro(concepto="movimiento 1"),
+    "importe": MovimientoFiltro(importe_min=-100, importe_max=100),
+}
+
+
+def tres_consultas(db, filtros: MovimientoFiltro, page: int, page_size: int):
+    """Camino anterior: recuento, página y agregados por separado."""
+
+    filtrada = aplicar_filtros(_query_base_movimientos(), filtros)
+    total = db.scalar(select(func.count()).select_from(filtrada.subquery()))
+    items = _mapear_items(
+        db.execute(_paginar(_aplicar_ordenacion(filtrada, None, None), page, page_size))
+    )
+    return total, items, _calcular_agregados(db, filtros)
+
+
+def actual(db, filtros: MovimientoFiltro, page: int, page_size: int):
+    """Camino de `listar_movimientos` en el motor de `--database-url`."""
+
+    respuesta = listar_movimientos(db, filtros, page=page, page_size=page_size)
+    return respuesta.total_items, respuesta.items, respuesta.aggregates
+
+
+def ventana(db, filtros: MovimientoFiltro, page: int, page_size: int):
+    """Página, total y agregados en una sola sentencia."""
+
+    ordenada = _aplicar_ordenacion(aplicar_filtros(_query_base_movimientos(), filtros), None, None)
+    items, agregados = _pagina_con_agregados(db, ordenada, page, page_size)
+    return agregados.total_registros, items, agregados
+
+
+def _medir(nombre: str, funcion, session_factory, engine, filtros, args) -> tuple[float, tuple]:
+    sentencias = 0
+
+    def _contar(*_):
+        nonlocal sentencias
+        sentencias += 1
+
+    event.listen(engine, "before_cursor_execute", _contar)
+    with session_factory() as db:
+        inicio = time.perf_counter()
+        for _ in range(args.repeat):
+            resultado = funcion(db, filtros, args.page, args.page_size)
+        segundos = (time.perf_counter() - inicio) / args.repeat
+    event.remove(engine, "before_cursor_execute", _contar)
+    print(f"  {nombre:<14} {sentencias / args.repeat:>3.0f} sentencias  {segundos * 1000:9.1f} ms")
+    return segundos, resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000, help="Movimientos en la base")
+    parser.add_argument("--page", type=int, default=1, help="Página a pedir")
+    parser.add_argument("--page-size", type=int, default=50, help="Tamaño de página")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medida")
+    parser.add_argument("--database-url", default=None, help="Base de datos de destino")
+    args = parser.parse_args()
+
+    ruta_temporal = None
+    url = args.database_url
+    if url is None:
+        descriptor, ruta_temporal = tempfile.mkstemp(suffix=".db")
+        os.close(descriptor)
+        url = f"sqlite:///{ruta_temporal}"
+
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, future=True)
+    with session_factory() as db:
+        db.merge(TipoMovimiento(id=1, nombre="Gasto"))
+        db.merge(TipoMovimiento(id=2, nombre="Ingreso"))
+        db.merge(Categoria(id=1, nombre="General", es_fijo=False))
+        db.merge(MetodoPago(id=1, nombre="Tarjeta"))
+        _insertar_movimientos(db, _filas_insercion(generar_filas(args.rows), ImportOptions()))
+        db.commit()
+
+    try:
+        for nombre, filtros in FILTROS.items():
+            print(nombre)
+            antes, esperado = _medir(
+                "tres consultas", tres_consultas, session_factory, engine, filtros, args
+            )
+            for nombre_camino, camino in (("actual", actual), ("ventana", ventana)):
+                despues, obtenido = _medir(
+                    nombre_camino, camino, session_factory, engine, filtros, args
+                )
+                assert obtenido == esperado, "Todos los caminos deben devolver lo mismo"
+                print(f"  aceleración x{antes / despues:.1f}")
+    finally:
+        engine.dispose()
+        if ruta_temporal:
+            os.remove(ruta_temporal)
+
+
+if __name__ == "__main__":
+    main()
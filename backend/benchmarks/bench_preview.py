@@ -0,0 +1,131 @@
+"""Benchmark del parseo de la previsualización CSV: fila a fila frente a columnar.
+
+Compara el recorrido clásico con `df.iterrows()` llamando a los parsers
+escalares por celda con `_normalizar_columnas`, que procesa cada columna de
+una vez. Los parsers de fecha y concepto por celda ya no se usan en el
+servicio y se conservan aquí como referencia. Solo se mide la fase de parseo
+para aislarla del acceso a base de datos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+
+from backend.app.schemas.importacion import BankFormat, ColumnMapping, ImportOptions
+from backend.app.services.importador_csv import (
+    BANK_DATE_FORMATS,
+    _inferir_formato_csv,
+    _normalizar_columnas,
+    _parse_float,
+)
+
+CONCEPTOS = ("Compra  supermercado", "Nómina", " Recibo luz ", "Bizum  amigo", "Gasolinera")
+
+
+def _parse_date(value, override_format: Optional[str], candidatos: tuple[str, ...]):
+    """Parser de fecha por celda del pipeline anterior."""
+
+    if pd.isna(value):
+        return None
+    if isinstance(value, date):
+        return value
+    texto = str(value).strip()
+    if not texto:
+        return None
+    formatos = [override_format] if override_format else []
+    formatos.extend([f for f in candidatos if f not in formatos])
+    for fmt in formatos:
+        try:
+            return datetime.strptime(texto, fmt).date()
+        except Exception:  # noqa: BLE001
+            continue
+    try:
+        return pd.to_datetime(texto, dayfirst=True, errors="coerce").date()
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def _normalize_concept(value: str, limpiar: bool) -> str:
+    """Normalización de concepto por celda del pipeline anterior."""
+
+    texto = value or ""
+    if limpiar:
+        texto = " ".join(texto.split())
+    return texto.strip()
+
+
+def generar_dataframe(filas: int, semilla: int = 42) -> pd.DataFrame:
+    """Genera un extracto sintético con importes en formato europeo."""
+
+    rnd = random.Random(semilla)
+    inicio = date(2012, 1, 1)
+    datos = {
+        "fecha": [
+            (inicio + timedelta(days=rnd.randint(0, 4380))).strftime("%d/%m/%Y")
+            for _ in range(filas)
+        ],
+        "concepto": [rnd.choice(CONCEPTOS) for _ in range(filas)],
+        "importe": [f"{rnd.uniform(-500, 500):.2f}".replace(".", ",") for _ in range(filas)],
+        "saldo": [f"{rnd.uniform(0, 5000):.2f}".replace(".", ",") for _ in range(filas)],
+        "notas": [rnd.choice(("", "ref 123", "tarjeta")) for _ in range(filas)],
+    }
+    return pd.DataFrame(datos)
+
+
+def parseo_por_filas(df: pd.DataFrame, mapping: ColumnMapping, options: ImportOptions) -> int:
+    """Reproduce el parseo celda a celda del pipeline anterior."""
+
+    candidatos = BANK_DATE_FORMATS[BankFormat.GENERIC]
+    procesadas = 0
+    for _, raw in df.iterrows():
+        _parse_date(raw.get(mapping.fecha_col), options.formato_fecha, candidatos)
+        _normalize_concept(str(raw.get(mapping.concepto_col, "")), options.limpiar_concepto)
+        _parse_float(raw.get(mapping.importe_col))
+        _parse_float(raw.get(mapping.saldo_col))
+        str(raw.get(mapping.notas_col, "")).strip()
+        procesadas += 1
+    return procesadas
+
+
+def parseo_columnar(df: pd.DataFrame, mapping: ColumnMapping, options: ImportOptions) -> int:
+    """Parseo vectorizado usado actualmente por la previsualización."""
+
+    formato = _inferir_formato_csv(df, mapping, options)
+    return len(_normalizar_columnas(df, mapping, options, formato))
+
+
+def _medir(nombre: str, funcion, df, mapping, options) -> float:
+    inicio = time.perf_counter()
+    filas = funcion(df, mapping, options)
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:<10} {filas:>9} filas  {segundos:8.3f} s  {filas / segundos:>12,.0f} filas/s")
+    return segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000, help="Filas sintéticas a generar")
+    args = parser.parse_args()
+
+    df = generar_dataframe(args.rows)
+    mapping = ColumnMapping(
+        fecha_col="fecha",
+        concepto_col="concepto",
+        importe_col="importe",
+        saldo_col="saldo",
+        notas_col="notas",
+    )
+    options = ImportOptions()
+    antes = _medir("por filas", parseo_por_filas, df, mapping, options)
+    despues = _medir("columnar", parseo_columnar, df, mapping, options)
+    print(f"aceleración x{antes / despues:.1f}")
+
+
+if __name__ == "__main__":
+    main()
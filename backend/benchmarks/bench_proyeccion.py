@@ -0,0 +1,154 @@
+"""Benchmark del coste por fila del listado y la exportación de movimientos.
+
+Compara el camino anterior (entidad `Movimiento` completa del ORM, item
+validado con `model_validate` y respuesta codificada como lo hace FastAPI con
+`response_model`) con el actual: columnas exactas como tuplas, items con
+`model_construct` y JSON directo desde `model_dump_json`. Mide por separado
+la consulta, la construcción de los items y la serialización, en
+microsegundos por fila. Usa una base SQLite temporal salvo que se indique
+`--database-url`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.core.database import Base
+from backend.app.models import Categoria, MetodoPago, Movimiento, TipoMovimiento
+from backend.app.schemas.importacion import ImportOptions
+from backend.app.schemas.movimientos import MovimientoListItem
+from backend.app.services.importador_csv import _filas_insercion, _insertar_movimientos
+from backend.app.services.movimientos import _mapear_items, _query_base_movimientos
+from backend.benchmarks.bench_insercion import generar_filas
+
+
+def _query_entidad(limite: int):
+    """Consulta anterior: la entidad completa más los nombres de los joins."""
+
+    return (
+        select(
+            Movimiento,
+            Categoria.nombre.label("categoria_nombre"),
+            Categoria.es_fijo.label("categoria_es_fijo"),
+            TipoMovimiento.nombre.label("tipo_nombre"),
+            MetodoPago.nombre.label("metodo_pago_nombre"),
+        )
+        .join(Categoria, Movimiento.categoria_id == Categoria.id, isouter=True)
+        .join(TipoMovimiento, Movimiento.tipo_id == TipoMovimiento.id, isouter=True)
+        .join(MetodoPago, Movimiento.metodo_pago_id == MetodoPago.id, isouter=True)
+        .order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+        .limit(limite)
+    )
+
+
+def _items_validados(filas) -> list[MovimientoListItem]:
+    return [
+        MovimientoListItem.model_validate(
+            {
+                **{
+                    campo: getattr(fila.Movimiento, campo)
+                    for campo in MovimientoListItem.model_fields
+                    if hasattr(fila.Movimiento, campo)
+                },
+                "categoria_nombre": fila.categoria_nombre,
+                "categoria_es_fijo": fila.categoria_es_fijo,
+                "tipo_nombre": fila.tipo_nombre,
+                "metodo_pago_nombre": fila.metodo_pago_nombre,
+            }
+        )
+        for fila in filas
+    ]
+
+
+def _json_validado(items) -> bytes:
+    # Lo que hace FastAPI con `response_model`: revalidar y pasar por
+    # `jsonable_encoder` antes de `json.dumps`.
+    revalidados = [MovimientoListItem.model_validate(item.model_dump()) for item in items]
+    return json.dumps(jsonable_encoder(revalidados)).encode()
+
+
+def _json_directo(items) -> bytes:
+    return b"[" + b",".join(item.model_dump_json().encode() for item in items) + b"]"
+
+
+def anterior(db, limite: int):
+    return _query_entidad(limite), _items_validados, _json_validado
+
+
+def actual(db, limite: int):
+    consulta = _query_base_movimientos().order_by(Movimiento.fecha.desc(), Movimiento.id.desc())
+    return consulta.limit(limite), _mapear_items, _json_directo
+
+
+def _medir(nombre: str, camino, session_factory, limite: int, repeat: int) -> bytes:
+    tiempos = {"consulta": 0.0, "items": 0.0, "json": 0.0}
+    for _ in range(repeat):
+        with session_factory() as db:
+            consulta, construir, serializar = camino(db, limite)
+            inicio = time.perf_counter()
+            filas = db.execute(consulta).all()
+            tiempos["consulta"] += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            items = construir(filas)
+            tiempos["items"] += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            cuerpo = serializar(items)
+            tiempos["json"] += time.perf_counter() - inicio
+    filas_totales = len(items) * repeat
+    por_fila = {fase: segundos * 1e6 / filas_totales for fase, segundos in tiempos.items()}
+    print(
+        f"  {nombre:<9}"
+        + "".join(f" {fase} {coste:6.2f} µs" for fase, coste in por_fila.items())
+        + f"  total {sum(por_fila.values()):6.2f} µs/fila"
+    )
+    return cuerpo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000, help="Movimientos en la base")
+    parser.add_argument("--page-size", type=int, default=200, help="Filas de una página")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por medida")
+    parser.add_argument("--database-url", default=None, help="Base de datos de destino")
+    args = parser.parse_args()
+
+    ruta_temporal = None
+    url = args.database_url
+    if url is None:
+        descriptor, ruta_temporal = tempfile.mkstemp(suffix=".db")
+        os.close(descriptor)
+        url = f"sqlite:///{ruta_temporal}"
+
+    engine = create_engine(url, future=True)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, future=True)
+    with session_factory() as db:
+        db.merge(TipoMovimiento(id=1, nombre="Gasto"))
+        db.merge(TipoMovimiento(id=2, nombre="Ingreso"))
+        db.merge(Categoria(id=1, nombre="General", es_fijo=False))
+        db.merge(MetodoPago(id=1, nombre="Tarjeta"))
+        _insertar_movimientos(db, _filas_insercion(generar_filas(args.rows), ImportOptions()))
+        db.commit()
+
+    try:
+        for nombre, limite in (("página", args.page_size), ("exportación", args.rows)):
+            print(f"{nombre} ({limite} filas)")
+            esperado = _medir("anterior", anterior, session_factory, limite, args.repeat)
+            obtenido = _medir("actual", actual, session_factory, limite, args.repeat)
+            assert json.loads(obtenido) == json.loads(esperado), "Ambos caminos deben coincidir"
+    finally:
+        engine.dispose()
+        if ruta_temporal:
+            os.remove(ruta_temporal)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark de la evaluación de reglas de autocategorización.
+
+Compara el recorrido secuencial anterior (`pattern.lower() in valor.lower()`
+por cada regla y movimiento) con `ReglasCompiladas`, que recorre cada texto
+una sola vez con un autómata Aho-Corasick por campo. No usa base de datos:
+las reglas se construyen en memoria.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+from typing import Optional
+
+from backend.app.models.entities import CampoObjetivo
+from backend.app.services.reglas import PatronCompilado, ReglasCompiladas
+
+PREFIJOS = ("COMPRA TARJ ", "RECIBO ", "TRANSFERENCIA ", "BIZUM ", "")
+
+
+def generar_reglas(total: int, rnd: random.Random) -> list[tuple[str, CampoObjetivo, int]]:
+    """Reglas `(pattern, campo, categoria_id)` con nombres de comercio aleatorios."""
+
+    reglas = []
+    for indice in range(total):
+        comercio = "".join(rnd.choice(string.ascii_uppercase) for _ in range(rnd.randint(4, 10)))
+        campo = CampoObjetivo.notas if indice % 10 == 0 else CampoObjetivo.concepto
+        reglas.append((comercio, campo, indice % 40 + 1))
+    return reglas
+
+
+def generar_textos(total: int, reglas, rnd: random.Random) -> list[tuple[str, Optional[str]]]:
+    """Conceptos y notas; aproximadamente la mitad contiene algún comercio."""
+
+    textos = []
+    for _ in range(total):
+        comercio = rnd.choice(reglas)[0] if rnd.random() < 0.5 else "SIN COINCIDENCIA"
+        concepto = f"{rnd.choice(PREFIJOS)}{comercio} {rnd.randint(1000, 9999)} MADRID"
+        textos.append((concepto, rnd.choice((None, "pago con tarjeta", "ref 123"))))
+    return textos
+
+
+def secuencial(reglas, textos) -> list[Optional[int]]:
+    """Camino anterior: todas las reglas contra cada movimiento."""
+
+    resultado = []
+    for concepto, notas in textos:
+        valores = {CampoObjetivo.concepto: concepto, CampoObjetivo.notas: notas}
+        categoria = None
+        for pattern, campo, categoria_id in reglas:
+            if pattern.lower() in (valores[campo] or "").lower():
+                categoria = categoria_id
+        resultado.append(categoria)
+    return resultado
+
+
+def compiladas(reglas, textos) -> list[Optional[int]]:
+    """Camino actual: compilación única y una pasada por texto."""
+
+    por_campo: dict[CampoObjetivo, list[PatronCompilado]] = {campo: [] for campo in CampoObjetivo}
+    for posicion, (pattern, campo, categoria_id) in enumerate(reglas):
+        por_campo[campo].append(PatronCompilado(posicion, pattern.lower(), categoria_id))
+    motor = ReglasCompiladas({campo: tuple(patrones) for campo, patrones in por_campo.items()})
+    return motor.categorizar_lote([c for c, _ in textos], [n for _, n in textos])
+
+
+def _medir(nombre: str, funcion, reglas, textos) -> tuple[float, list[Optional[int]]]:
+    inicio = time.perf_counter()
+    resultado = funcion(reglas, textos)
+    segundos = time.perf_counter() - inicio
+    ritmo = len(textos) / segundos
+    print(f"{nombre:<12} {len(textos):>9} textos  {segundos:8.3f} s  {ritmo:>12,.0f} textos/s")
+    return segundos, resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=3000, help="Número de reglas")
+    parser.add_argument("--texts", type=int, default=20_000, help="Movimientos a categorizar")
+    parser.add_argument(
+        "--skip-sequential", action="store_true", help="Omitir el camino secuencial"
+    )
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    reglas = generar_reglas(args.rules, rnd)
+    textos = generar_textos(args.texts, reglas, rnd)
+    despues, esperado = _medir("compiladas", compiladas, reglas, textos)
+    if not args.skip_sequential:
+        antes, obtenido = _medir("secuencial", secuencial, reglas, textos)
+        assert obtenido == esperado, "Los dos caminos deben asignar las mismas categorías"
+        print(f"aceleración x{antes / despues:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,13 @@
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from backend.app.core.database import Base, get_db
+from backend.app.core.database import Base, get_db, get_session_factory
 from backend.app.main import create_app
-from backend.app.models import Categoria, MetodoPago, ReglaAutoCategoria, TipoMovimiento
+from backend.app.models import Categoria, MetodoPago, TipoMovimiento
 
 # Configuramos una base de datos en memoria para aislar las pruebas.
 engine_test = create_engine(
@@ -47,4 +47,28 @@ def setup_database():
 def client():
     app = create_app()
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
     return TestClient(app)
+
+
+@pytest.fixture()
+def sql_ejecutadas():
+    """Registra las sentencias SQL lanzadas contra la base de pruebas."""
+
+    sentencias: list[str] = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(engine_test, "before_cursor_execute", _registrar)
+    yield sentencias
+    event.remove(engine_test, "before_cursor_execute", _registrar)
+
+
+@pytest.fixture()
+def db():
+    """Sesión directa contra la base de pruebas."""
+
+    session = TestingSessionLocal()
+    yield session
+    session.close()
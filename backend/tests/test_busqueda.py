@@ -0,0 +1,125 @@
+"""Búsqueda de texto en concepto y notas mediante el índice FTS5."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import select, text
+
+from backend.app.models import Movimiento, busqueda
+from backend.app.models.busqueda import coincide_texto
+from backend.app.schemas.importacion import CsvPreviewRow, ImportOptions
+from backend.app.schemas.movimientos import MovimientoFiltro
+from backend.app.services.importador_csv import _filas_insercion, _insertar_movimientos
+from backend.app.services.movimientos import _query_base_movimientos, aplicar_filtros
+
+pytestmark = pytest.mark.skipif(not busqueda.FTS_DISPONIBLE, reason="SQLite sin trigram")
+
+CONCEPTOS = [
+    ("Cafetería Plaza", None),
+    ("NÓMINA EMPRESA", "transferencia mensual"),
+    ("Recibo luz", "Iberdrola"),
+    ("Compra 50% descuento", "cafetería del centro"),
+]
+
+
+def _buscar(client, termino: str) -> list[str]:
+    resp = client.get("/movimientos", params={"search": termino, "page_size": 200})
+    assert resp.status_code == 200
+    return sorted(item["concepto"] for item in resp.json()["items"])
+
+
+def _crear(client, concepto: str, notas=None) -> int:
+    resp = client.post(
+        "/movimientos",
+        json={
+            "fecha": "2024-01-10",
+            "concepto": concepto,
+            "importe": -12.0,
+            "tipo_id": 1,
+            "categoria_id": 1,
+            "metodo_pago_id": 1,
+            "notas": notas,
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_busqueda_sigue_altas_cambios_y_bajas(client):
+    ids = [_crear(client, concepto, notas) for concepto, notas in CONCEPTOS]
+
+    assert _buscar(client, "cafeter") == ["Cafetería Plaza", "Compra 50% descuento"]
+    assert _buscar(client, "nómina") == ["NÓMINA EMPRESA"]
+
+    resp = client.patch(f"/movimientos/{ids[2]}", json={"notas": "pago cafetería"})
+    assert resp.status_code == 200
+    assert "Recibo luz" in _buscar(client, "cafeter")
+    assert _buscar(client, "iberdrola") == []
+
+    assert client.delete(f"/movimientos/{ids[0]}").status_code == 204
+    assert _buscar(client, "cafeter") == ["Compra 50% descuento", "Recibo luz"]
+
+
+def test_indice_equivale_a_like(client, db, monkeypatch):
+    for concepto, notas in CONCEPTOS:
+        _crear(client, concepto, notas)
+    terminos = ["caf", "CAFETERÍA", "nómina", "a", "luz", "50%", 'a "x', "mensual", "zzz"]
+
+    def _ids(termino):
+        consulta = aplicar_filtros(_query_base_movimientos(), MovimientoFiltro(concepto=termino))
+        return sorted(fila.id for fila in db.execute(consulta))
+
+    def _ids_por_campo(termino):
+        consultas = {
+            campo: select(Movimiento.id).where(coincide_texto(termino, (campo,)))
+            for campo in busqueda.CAMPOS_TEXTO
+        }
+        return {campo: sorted(db.scalars(consulta)) for campo, consulta in consultas.items()}
+
+    def _resultados():
+        return {termino: (_ids(termino), _ids_por_campo(termino)) for termino in terminos}
+
+    con_indice = _resultados()
+    monkeypatch.setattr(busqueda, "FTS_DISPONIBLE", False)
+    assert con_indice == _resultados()
+
+
+def test_plan_busca_por_el_indice(db):
+    consulta = aplicar_filtros(_query_base_movimientos(), MovimientoFiltro(concepto="cafeter"))
+    compilada = consulta.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    plan = [fila[3] for fila in db.execute(text(f"EXPLAIN QUERY PLAN {compilada}"))]
+    assert any("VIRTUAL TABLE" in paso for paso in plan)
+    assert "SCAN movimientos" not in plan
+
+
+def test_insercion_masiva_indexa_en_bloque(client, db):
+    _crear(client, "Cafetería previa")
+    filas = [
+        CsvPreviewRow.model_construct(
+            raw_index=indice,
+            fecha=date(2024, 2, 1),
+            concepto=f"Supermercado {indice}",
+            importe=-5.0,
+            saldo=None,
+            tipo_id=1,
+            categoria_id=1,
+            metodo_pago_id=1,
+            notas="cafetería" if indice == 3 else None,
+            is_duplicate=False,
+            errors=[],
+        )
+        for indice in range(5)
+    ]
+    _insertar_movimientos(db, _filas_insercion(filas, ImportOptions()))
+    db.commit()
+
+    assert db.scalar(text(f"SELECT count(*) FROM {busqueda.TABLA_CARGA}")) == 0
+    assert len(_buscar(client, "supermercado")) == 5
+    assert _buscar(client, "cafeter") == ["Cafetería previa", "Supermercado 3"]
+
+    # Tras la carga el trigger vuelve a indexar fila a fila.
+    _crear(client, "Cafetería posterior")
+    assert len(_buscar(client, "cafeter")) == 3
+    db.execute(
+        text(f"INSERT INTO {busqueda.TABLA_FTS}({busqueda.TABLA_FTS}) VALUES ('integrity-check')")
+    )
@@ -3,6 +3,10 @@
 import csv
 from io import StringIO
 
+from backend.app.models import Movimiento
+from backend.app.schemas.movimientos import MovimientoListResponse
+from backend.app.services.movimientos import _mapear_items, _query_base_movimientos
+
 
 def _crear_movimientos(client):
     datos = [
@@ -67,3 +71,53 @@ def test_export_filtra_concepto(client):
     ]
     assert len(filas) == 2  # cabecera + 1 fila
     assert filas[1][1] == "Cafetería"
+
+
+def test_listado_con_agregados_en_ventana(client, sql_ejecutadas, monkeypatch):
+    _crear_movimientos(client)
+    params = {"importe_max": 500, "page_size": 1}
+
+    sql_ejecutadas.clear()
+    separado = client.get("/movimientos", params=params).json()
+    assert len(sql_ejecutadas) == 2  # página + agregados con el total
+    assert separado["total_items"] == 2
+    assert separado["total_pages"] == 2
+    assert separado["aggregates"]["total_importe"] == 194.5
+
+    monkeypatch.setattr(
+        "backend.app.services.movimientos._agregados_en_ventana", lambda db: True
+    )
+    sql_ejecutadas.clear()
+    assert client.get("/movimientos", params=params).json() == separado
+    assert len(sql_ejecutadas) == 1
+    assert "OVER ()" in sql_ejecutadas[0]
+
+    # Con la página fuera de rango no hay fila de la que leer los agregados.
+    fuera_de_rango = client.get("/movimientos", params={**params, "page": 5}).json()
+    assert fuera_de_rango["items"] == []
+    assert fuera_de_rango["aggregates"] == separado["aggregates"]
+
+
+def test_listado_sin_validar_coincide_con_el_esquema(client):
+    """Los items construidos sin validación serializan igual que validados."""
+
+    _crear_movimientos(client)
+    resp = client.get("/movimientos")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    cuerpo = resp.json()
+    validado = MovimientoListResponse.model_validate(cuerpo)
+    assert validado.model_dump(mode="json") == cuerpo
+    assert [item["tipo_nombre"] for item in cuerpo["items"]] == ["Ingreso", "Gasto"]
+
+
+def test_items_se_construyen_por_nombre_de_columna(client, db):
+    """Reordenar las columnas de la consulta base no intercambia campos."""
+
+    _crear_movimientos(client)
+    consulta = _query_base_movimientos().order_by(Movimiento.id)
+    invertida = consulta.with_only_columns(*reversed(consulta.selected_columns))
+
+    items = _mapear_items(db.execute(consulta).all())
+    assert _mapear_items(db.execute(invertida).all()) == items
+    assert [item.concepto for item in items] == ["Cafetería", "Venta"]
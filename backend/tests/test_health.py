@@ -1,6 +1,78 @@
 """Pruebas básicas de disponibilidad."""
 
+import json
+import threading
+import time
+
+import anyio
+import httpx
+import pytest
+
+from backend.app.api import importacion as api_importacion
+
+
 def test_health(client):
     respuesta = client.get("/health")
     assert respuesta.status_code == 200
     assert respuesta.json()["status"] == "ok"
+
+
+@pytest.fixture()
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.mark.anyio
+async def test_health_responde_durante_previsualizacion_grande(client, monkeypatch):
+    en_curso, liberar, terminado = threading.Event(), threading.Event(), threading.Event()
+    preview_original = api_importacion.preview_import
+
+    def _preview_retenido(*args):
+        en_curso.set()
+        resultado = preview_original(*args)
+        # Mantiene el hilo ocupado hasta que el test haya medido /health.
+        liberar.wait(timeout=5)
+        terminado.set()
+        return resultado
+
+    monkeypatch.setattr(api_importacion, "preview_import", _preview_retenido)
+    filas = "".join(
+        f"2024-01-{dia % 28 + 1:02d},Compra {dia},-{dia % 90}.5\n" for dia in range(20_000)
+    )
+    payload = {
+        "mapping": {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"},
+        "options": {
+            "default_categoria_id": 1,
+            "default_metodo_pago_id": 1,
+            "aplicar_reglas": False,
+        },
+    }
+
+    transporte = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://test") as cliente:
+        async with anyio.create_task_group() as grupo:
+            respuestas = {}
+
+            async def previsualizar():
+                respuestas["preview"] = await cliente.post(
+                    "/import/preview",
+                    files={
+                        "file": ("grande.csv", "fecha,concepto,importe\n" + filas, "text/csv"),
+                        "payload": (None, json.dumps(payload), "application/json"),
+                    },
+                )
+
+            grupo.start_soon(previsualizar)
+            while not en_curso.is_set():
+                await anyio.sleep(0.01)
+
+            latencias = []
+            for _ in range(5):
+                inicio = time.perf_counter()
+                assert (await cliente.get("/health")).status_code == 200
+                latencias.append(time.perf_counter() - inicio)
+            assert not terminado.is_set()
+            liberar.set()
+
+    assert respuestas["preview"].json()["total_rows"] == 20_000
+    assert max(latencias) < 0.25
@@ -2,6 +2,8 @@
 
 import json
 
+import pytest
+
 
 def _payload(mapping, options):
     return json.dumps({"mapping": mapping, "options": options})
@@ -16,6 +18,28 @@ def test_analyze_csv(client):
     assert "columns" in data and data["columns"] == ["fecha", "concepto", "importe"]
     assert data["format"] == "generic"
     assert data["sample"][0]["concepto"] == "Compra"
+    assert (data["estimated_rows"], data["rows_exact"]) == (1, True)
+
+
+def test_analyze_lee_solo_el_inicio_y_estima_filas(client, monkeypatch):
+    from backend.app.services import importador_csv
+
+    monkeypatch.setattr(importador_csv, "TAMANO_MUESTRA_ANALISIS", 2048)
+    filas = "".join(
+        f"{dia % 28 + 1:02d}/03/2024;Recibo {dia:04d};-{dia % 90:02d},50;100\n"
+        for dia in range(3000)
+    )
+    contenido = "Fecha Operacion;Concepto;Importe;Saldo\n" + filas
+    data = client.post(
+        "/import/analyze", files={"file": ("caixa.csv", contenido, "text/csv")}
+    ).json()
+
+    assert data["format"] == "caixa"
+    assert data["separator"] == ";"
+    assert data["file_size"] == len(contenido.encode())
+    assert len(data["sample"]) == 5
+    assert data["rows_exact"] is False and data["warnings"]
+    assert abs(data["estimated_rows"] - 3000) < 3000 * 0.05
 
 
 def test_preview_detecta_error_y_duplicado(client):
@@ -78,3 +102,406 @@ def test_apply_csv_crea_movimientos(client):
     assert lista.status_code == 200
     assert len(lista.json()) >= 2
 
+
+def test_preview_parsea_debe_haber_y_decimales_europeos(client):
+    contenido = (
+        "fecha;concepto;debe;haber;saldo;notas\n"
+        "01/03/2024;Luz   marzo;45,30;;1.200,50; recibo \n"
+        "02/03/2024;Nomina;;1.500,00;2.700,50;\n"
+    )
+    mapping = {
+        "fecha_col": "fecha",
+        "concepto_col": "concepto",
+        "debe_col": "debe",
+        "haber_col": "haber",
+        "saldo_col": "saldo",
+        "notas_col": "notas",
+    }
+    resp = client.post(
+        "/import/preview",
+        files={
+            "file": ("debe_haber.csv", contenido, "text/csv"),
+            "payload": (None, _payload(mapping, {"formato_fecha": "%d/%m/%Y"}), "application/json"),
+        },
+    )
+    assert resp.status_code == 200
+    filas = resp.json()["rows"]
+    assert [f["fecha"] for f in filas] == ["2024-03-01", "2024-03-02"]
+    assert [f["importe"] for f in filas] == [-45.3, 1500.0]
+    assert [f["saldo"] for f in filas] == [1200.5, 2700.5]
+    assert [f["tipo_id"] for f in filas] == [1, 2]
+    assert filas[0]["concepto"] == "Luz marzo"
+    assert filas[0]["notas"] == "recibo"
+
+
+def test_preview_detecta_duplicados_con_consultas_constantes(client, sql_ejecutadas):
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    options = {"default_categoria_id": 1, "default_metodo_pago_id": 1}
+    client.post(
+        "/movimientos",
+        json={
+            "fecha": "2024-01-05",
+            "concepto": "Compra   Super",
+            "importe": -10.0,
+            "tipo_id": 1,
+            "categoria_id": 1,
+            "metodo_pago_id": 1,
+        },
+    )
+
+    def _consultas_movimientos(filas: int) -> int:
+        lineas = [f"2024-01-{(i % 28) + 1:02d},Otro {i},-{i + 1}" for i in range(filas)]
+        contenido = "fecha,concepto,importe\n2024-01-05,compra super,-10\n" + "\n".join(lineas)
+        sql_ejecutadas.clear()
+        resp = client.post(
+            "/import/preview",
+            files={
+                "file": ("dups.csv", contenido, "text/csv"),
+                "payload": (None, _payload(mapping, options), "application/json"),
+            },
+        )
+        assert resp.status_code == 200
+        assert resp.json()["rows"][0]["is_duplicate"] is True
+        return sum(1 for sql in sql_ejecutadas if "FROM movimientos" in sql)
+
+    assert _consultas_movimientos(3) == _consultas_movimientos(1200)
+
+
+def test_apply_masivo_rellena_derivados_y_salta_duplicados(client):
+    contenido = "fecha,concepto,importe\n2024-04-03,Gasolina,-60\n2024-04-03,Gasolina,-60\n"
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    options = {"default_categoria_id": 1, "default_metodo_pago_id": 1}
+    resp = client.post(
+        "/import/apply",
+        files={
+            "file": ("repetidos.csv", contenido, "text/csv"),
+            "payload": (None, _payload(mapping, options), "application/json"),
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json()["imported"] == 1
+    assert resp.json()["skipped_duplicates"] == 1
+
+    movimiento = client.get("/movimientos/1").json()
+    assert (movimiento["anio"], movimiento["mes"], movimiento["mes_anio"]) == (2024, 4, "2024-04")
+    assert movimiento["tipo_id"] == 1
+
+
+def test_apply_por_bloques_latin1(client, monkeypatch):
+    from backend.app.services import importador_csv
+
+    monkeypatch.setattr(importador_csv, "TAMANO_BLOQUE_CSV", 2)
+    contenido = (
+        "fecha;concepto;importe\n"
+        "2024-05-01;Panadería;-2,5\n"
+        "2024-05-02;Café;-1,2\n"
+        "2024-05-03;Librería;-20\n"
+        "2024-05-01;Panadería;-2,5\n"
+        "2024-05-04;Fecha;x\n"
+    ).encode("latin-1")
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    options = {"default_categoria_id": 1, "default_metodo_pago_id": 1}
+    files = {
+        "file": ("latin1.csv", contenido, "text/csv"),
+        "payload": (None, _payload(mapping, options), "application/json"),
+    }
+
+    preview = client.post("/import/preview", files=files).json()
+    assert [r["raw_index"] for r in preview["rows"]] == [0, 1, 2, 3, 4]
+    assert preview["rows"][1]["concepto"] == "Café"
+    assert preview["rows"][3]["is_duplicate"] is True
+
+    resultado = client.post("/import/apply", files=files).json()
+    assert resultado == {
+        "imported": 3,
+        "skipped_duplicates": 1,
+        "skipped_errors": 1,
+        "total_rows": 5,
+        "examples_errors": [preview["rows"][4]],
+    }
+
+
+@pytest.mark.parametrize("tamano_bloque", [2, 50_000])
+def test_importes_no_dependen_del_corte_de_bloques(client, monkeypatch, tamano_bloque):
+    from backend.app.services import importador_csv
+
+    # Con bloques de 2 filas el corte separa "12,50" de "1.500".
+    monkeypatch.setattr(importador_csv, "TAMANO_BLOQUE_CSV", tamano_bloque)
+    contenido = (
+        "fecha;concepto;importe\n"
+        "2024-09-01;Cena;12,50\n"
+        "2024-09-02;Taxi;-3,10\n"
+        "2024-09-03;Sofá;1.500\n"
+        "2024-09-04;Nevera;2.000\n"
+    )
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    files = {
+        "file": ("bloques.csv", contenido, "text/csv"),
+        "payload": (None, _payload(mapping, {"default_categoria_id": 1}), "application/json"),
+    }
+    filas = client.post("/import/preview", files=files).json()["rows"]
+    assert [f["importe"] for f in filas] == [12.5, -3.1, 1500.0, 2000.0]
+
+
+def test_formato_numerico_detectado_por_columna(client):
+    contenido = (
+        "fecha;concepto;importe;saldo\n"
+        "2024-08-01;Alquiler;1.250,00-;10.000,50 €\n"
+        "2024-08-02;Nómina;2.100,00+;12.100,50 €\n"
+        "2024-08-03;Café;1,20-;12.099,30 €\n"
+    )
+    analisis = client.post(
+        "/import/analyze", files={"file": ("num.csv", contenido, "text/csv")}
+    ).json()
+    assert analisis["number_formats"]["importe"] == {
+        "decimal_separator": ",",
+        "thousands_separator": ".",
+        "currency": None,
+        "trailing_sign": True,
+    }
+    assert analisis["number_formats"]["saldo"]["currency"] == "€"
+
+    mapping = {
+        "fecha_col": "fecha",
+        "concepto_col": "concepto",
+        "importe_col": "importe",
+        "saldo_col": "saldo",
+    }
+    files = {
+        "file": ("num.csv", contenido, "text/csv"),
+        "payload": (None, _payload(mapping, {"default_categoria_id": 1}), "application/json"),
+    }
+    filas = client.post("/import/preview", files=files).json()["rows"]
+    assert [f["importe"] for f in filas] == [-1250.0, 2100.0, -1.2]
+    assert [f["saldo"] for f in filas] == [10000.5, 12100.5, 12099.3]
+    assert [f["tipo_id"] for f in filas] == [1, 2, 1]
+
+
+def test_columna_solo_con_miles_en_formato_europeo(client):
+    contenido = (
+        "fecha;concepto;importe\n"
+        "2024-08-01;Coche;-1.234\n"
+        "2024-08-02;Venta;2.500\n"
+        "2024-08-03;Reforma;-10.000\n"
+    )
+    analisis = client.post("/import/analyze", files={"file": ("miles.csv", contenido)}).json()
+    assert analisis["number_formats"]["importe"]["decimal_separator"] == ","
+
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    files = {
+        "file": ("miles.csv", contenido, "text/csv"),
+        "payload": (None, _payload(mapping, {"default_categoria_id": 1}), "application/json"),
+    }
+    filas = client.post("/import/preview", files=files).json()["rows"]
+    assert [f["importe"] for f in filas] == [-1234.0, 2500.0, -10000.0]
+
+
+def test_preview_infiere_formato_fecha_una_vez_por_fichero(client, monkeypatch):
+    from backend.app.services import importador_csv
+
+    monkeypatch.setattr(importador_csv, "TAMANO_BLOQUE_CSV", 2)
+    inferencias = []
+    inferir_original = importador_csv._inferir_formato_fecha
+
+    def _inferir_contando(*args):
+        inferencias.append(inferir_original(*args))
+        return inferencias[-1]
+
+    monkeypatch.setattr(importador_csv, "_inferir_formato_fecha", _inferir_contando)
+    contenido = (
+        "fecha,concepto,importe\n03/04/2024,Luz,-40\n13/04/2024,Agua,-20\n2024-04-31,Gas,-30\n"
+    )
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    files = {
+        "file": ("fechas.csv", contenido, "text/csv"),
+        "payload": (None, _payload(mapping, {"default_categoria_id": 1}), "application/json"),
+    }
+
+    filas = client.post("/import/preview", files=files).json()["rows"]
+    assert inferencias == ["%d/%m/%Y"]
+    assert [f["fecha"] for f in filas] == ["2024-04-03", "2024-04-13", None]
+    assert filas[2]["errors"] == ["Fecha inválida"]
+
+
+def test_columna_de_fechas_mixta_usa_parser_flexible():
+    import pandas as pd
+
+    from backend.app.services.importador_csv import _inferir_formato_fecha, _parse_date_column
+
+    candidatos = ("%Y-%m-%d", "%d/%m/%Y")
+    serie = pd.Series(["2024-01-02", "05/01/2024", "7 Jan 2024", "7 Jan 2024", None])
+    formato = _inferir_formato_fecha(serie, None, candidatos)
+    assert formato is None
+    fechas = _parse_date_column(serie, formato, None, candidatos)
+    assert [f.date().isoformat() if pd.notna(f) else None for f in fechas] == [
+        "2024-01-02",
+        "2024-01-05",
+        "2024-01-07",
+        "2024-01-07",
+        None,
+    ]
+
+
+def test_preview_y_apply_reutilizan_token_de_analyze(client):
+    contenido = "fecha,concepto,importe\n2024-06-01,Farmacia,-12\n"
+    analisis = client.post(
+        "/import/analyze", files={"file": ("token.csv", contenido, "text/csv")}
+    ).json()
+    token = analisis["token"]
+    assert token
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    payload = json.dumps(
+        {
+            "mapping": mapping,
+            "options": {"default_categoria_id": 1, "default_metodo_pago_id": 1},
+            "token": token,
+        }
+    )
+
+    preview = client.post("/import/preview", data={"payload": payload})
+    assert preview.status_code == 200
+    assert preview.json()["rows"][0]["concepto"] == "Farmacia"
+    assert client.post("/import/apply", data={"payload": payload}).json()["imported"] == 1
+
+    caducado = json.dumps({"mapping": mapping, "token": "no-existe"})
+    assert client.post("/import/preview", data={"payload": caducado}).status_code == 410
+
+
+def test_cache_importaciones_expulsa_por_tamano_y_ttl(monkeypatch):
+    from io import BytesIO
+
+    from backend.app.services import cache_importacion
+    from backend.app.services.cache_importacion import CacheImportaciones
+
+    cache = CacheImportaciones(max_bytes=100, ttl_segundos=60)
+    primero = cache.registrar(BytesIO(b"a,b\n1,2\n" * 5))
+    segundo = cache.registrar(BytesIO(b"c,d\n3,4\n" * 5))
+    assert cache.registrar(BytesIO(b"x" * 101)) is None
+    assert cache.obtener(primero) is not None  # pasa a ser el más reciente
+    cache.registrar(BytesIO(b"e,f\n5,6\n" * 5))
+    assert cache.obtener(segundo) is None
+
+    ahora = cache_importacion.time.monotonic()
+    monkeypatch.setattr(cache_importacion.time, "monotonic", lambda: ahora + 61)
+    assert cache.obtener(primero) is None
+
+
+def test_cache_importaciones_no_deriva_el_token_del_contenido():
+    from io import BytesIO
+
+    from backend.app.services.cache_importacion import CacheImportaciones
+
+    cache = CacheImportaciones(max_bytes=1000, ttl_segundos=60)
+    contenido = b"fecha,concepto,importe\n2024-06-01,Farmacia,-12\n"
+    primero = cache.registrar(BytesIO(contenido))
+    segundo = cache.registrar(BytesIO(contenido))
+    assert primero != segundo
+    assert cache.obtener(primero).df.equals(cache.obtener(segundo).df)
+
+
+def _leer_copy_csv(texto):
+    """Lee el CSV de COPY como PostgreSQL: solo un campo vacío sin comillas es NULL."""
+
+    import re
+
+    campo = re.compile(r'"((?:[^"]|"")*)"|([^,]*)')
+    filas = []
+    for linea in texto.splitlines():
+        valores, posicion = [], 0
+        while True:
+            coincidencia = campo.match(linea, posicion)
+            entre_comillas, suelto = coincidencia.groups()
+            if entre_comillas is not None:
+                valores.append(entre_comillas.replace('""', '"'))
+            else:
+                valores.append(suelto or None)
+            posicion = coincidencia.end() + 1
+            if posicion > len(linea):
+                break
+        filas.append(valores)
+    return filas
+
+
+def test_copy_postgresql_distingue_null_de_textos():
+    from datetime import date
+    from types import SimpleNamespace
+
+    from backend.app.schemas.importacion import CsvPreviewRow, ImportOptions
+    from backend.app.services.importador_csv import (
+        COLUMNAS_INSERCION,
+        _copiar_postgresql,
+        _filas_insercion,
+    )
+
+    enviados = []
+
+    class Cursor:
+        def copy_expert(self, sentencia, buffer):
+            enviados.append((sentencia, buffer.read()))
+
+        def close(self):
+            pass
+
+    db = SimpleNamespace(
+        connection=lambda: SimpleNamespace(connection=SimpleNamespace(cursor=Cursor))
+    )
+    textos = [("\\N", None), ('Bar "Pepe", centro', ""), ("", "\\N"), ("Luz", "NULL")]
+    filas = _filas_insercion(
+        [
+            CsvPreviewRow(
+                raw_index=indice,
+                fecha=date(2024, 5, 1),
+                concepto=concepto,
+                importe=-1.5,
+                saldo=None,
+                tipo_id=1,
+                categoria_id=1,
+                metodo_pago_id=1,
+                notas=notas,
+            )
+            for indice, (concepto, notas) in enumerate(textos)
+        ],
+        ImportOptions(),
+    )
+
+    _copiar_postgresql(db, filas)
+
+    [(sentencia, texto)] = enviados
+    assert "NULL" not in sentencia
+    posicion = {columna: indice for indice, columna in enumerate(COLUMNAS_INSERCION)}
+    leidas = _leer_copy_csv(texto)
+    assert [
+        (fila[posicion["concepto"]], fila[posicion["notas"]], fila[posicion["saldo"]])
+        for fila in leidas
+    ] == [(concepto, notas, None) for concepto, notas in textos]
+    assert leidas[0][posicion["fecha"]] == "2024-05-01"
+
+
+def test_cache_importaciones_no_guarda_parseados_que_no_caben(client, monkeypatch):
+    from io import BytesIO
+
+    from backend.app.services.cache_importacion import CacheImportaciones, cache_importaciones
+
+    contenido = b"fecha,concepto,importe\n" + b"".join(
+        f"2024-06-{dia:02d},Farmacia {dia},-{dia}\n".encode() for dia in range(1, 29)
+    )
+    cache = CacheImportaciones(max_bytes=2 * len(contenido), ttl_segundos=60)
+    otro = cache.registrar(BytesIO(b"a,b\n1,2\n"))
+    token = cache.registrar(BytesIO(contenido))
+
+    origen = cache.obtener(token)
+
+    assert cache._total <= cache.max_bytes
+    assert origen.read() == contenido  # en bruto, para leerlo por bloques
+    assert cache.obtener(token).read() == contenido
+    assert cache.obtener(otro) is not None
+
+    monkeypatch.setattr(cache_importaciones, "max_bytes", 2 * len(contenido))
+    token = client.post(
+        "/import/analyze", files={"file": ("grande.csv", contenido, "text/csv")}
+    ).json()["token"]
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    payload = json.dumps({"mapping": mapping, "options": {}, "token": token})
+    preview = client.post("/import/preview", data={"payload": payload}).json()
+    assert preview["total_rows"] == 28
+    assert cache_importaciones._total <= cache_importaciones.max_bytes
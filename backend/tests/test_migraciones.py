@@ -0,0 +1,96 @@
+"""Pruebas de las migraciones ligeras aplicadas al arrancar."""
+
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.pool import StaticPool
+
+from backend.app.core.database import Base
+from backend.app.core.migraciones import aplicar_migraciones
+from backend.app.models import Movimiento, busqueda
+from backend.app.models.entities import PRIORIDAD_REGLA_POR_DEFECTO, calcular_huella
+
+
+def _engine_sin_huella():
+    """Crea una base en memoria con el esquema previo a la columna `huella`."""
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_movimientos_huella"))
+        conn.execute(text("ALTER TABLE movimientos DROP COLUMN huella"))
+        conn.execute(text("INSERT INTO tipos_movimiento (id, nombre) VALUES (1, 'Gasto')"))
+        conn.execute(text("INSERT INTO categorias (id, nombre, es_fijo) VALUES (1, 'General', 0)"))
+        conn.execute(text("INSERT INTO metodos_pago (id, nombre) VALUES (1, 'Tarjeta')"))
+        conn.execute(
+            text(
+                "INSERT INTO movimientos (fecha, concepto, importe, tipo_id, categoria_id,"
+                " metodo_pago_id, anio, mes, mes_anio)"
+                " VALUES ('2024-01-05', 'Compra  Super', -10, 1, 1, 1, 2024, 1, '2024-01')"
+            )
+        )
+    return engine
+
+
+def test_migracion_huella_anade_columna_indice_y_backfill():
+    engine = _engine_sin_huella()
+
+    aplicar_migraciones(engine)
+    aplicar_migraciones(engine)  # idempotente
+
+    indices = {indice["name"] for indice in inspect(engine).get_indexes("movimientos")}
+    assert "ix_movimientos_huella" in indices
+    with engine.connect() as conn:
+        huella = conn.scalar(select(Movimiento.__table__.c.huella))
+    assert huella == calcular_huella(date(2024, 1, 5), -10.0, "compra super")
+
+
+def test_migracion_crea_indices_de_filtrado():
+    engine = _engine_sin_huella()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_movimientos_fecha"))
+        conn.execute(text("DROP INDEX ix_movimientos_categoria_id_fecha"))
+
+    aplicar_migraciones(engine)
+    aplicar_migraciones(engine)  # idempotente
+
+    indices = {indice["name"] for indice in inspect(engine).get_indexes("movimientos")}
+    assert {indice.name for indice in Movimiento.__table__.indexes} <= indices
+
+
+def test_migracion_prioridad_reglas_conserva_el_orden_anterior():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE reglas_auto_categoria DROP COLUMN prioridad"))
+        conn.execute(text("INSERT INTO categorias (id, nombre, es_fijo) VALUES (1, 'General', 0)"))
+        conn.execute(
+            text(
+                "INSERT INTO reglas_auto_categoria"
+                " (pattern, campo_objetivo, tipo_match, categoria_id)"
+                " VALUES ('super', 'concepto', 'contains', 1)"
+            )
+        )
+
+    aplicar_migraciones(engine)
+    aplicar_migraciones(engine)  # idempotente
+
+    with engine.connect() as conn:
+        prioridad = conn.scalar(text("SELECT prioridad FROM reglas_auto_categoria"))
+    assert prioridad == PRIORIDAD_REGLA_POR_DEFECTO
+
+
+def test_migracion_indice_texto_indexa_movimientos_existentes():
+    engine = _engine_sin_huella()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {busqueda.TABLA_FTS}"))
+        conn.execute(text(f"DROP TABLE {busqueda.TABLA_CARGA}"))
+
+    aplicar_migraciones(engine)
+    aplicar_migraciones(engine)  # idempotente
+
+    with engine.connect() as conn:
+        encontrados = conn.scalars(
+            select(Movimiento.__table__.c.concepto).where(busqueda.coincide_texto("SUPER"))
+        ).all()
+    assert encontrados == ["Compra  Super"]
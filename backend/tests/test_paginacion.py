@@ -0,0 +1,81 @@
+"""Paginación por cursor del listado de movimientos."""
+
+import pytest
+
+from backend.app.models import Categoria
+
+
+def _crear_movimientos(client, db):
+    db.add_all(
+        [
+            Categoria(id=2, nombre="Ocio", es_fijo=False),
+            Categoria(id=3, nombre="Casa", es_fijo=True),
+        ]
+    )
+    db.commit()
+    # Fechas e importes repetidos para que el id tenga que desempatar.
+    for i in range(11):
+        resp = client.post(
+            "/movimientos",
+            json={
+                "fecha": f"2024-0{1 + i % 3}-0{1 + i % 2}",
+                "concepto": f"Movimiento {i}",
+                "importe": [-10.0, 25.5, -3.25][i % 3],
+                "tipo_id": 1,
+                "categoria_id": 1 + i % 3,
+                "metodo_pago_id": 1,
+            },
+        )
+        assert resp.status_code == 201
+
+
+@pytest.mark.parametrize(
+    "orden",
+    [{}, {"sort_by": "importe", "sort_dir": "asc"}, {"sort_by": "categoria", "sort_dir": "desc"}],
+)
+def test_cursor_recorre_lo_mismo_que_las_paginas(client, db, orden):
+    _crear_movimientos(client, db)
+    esperado = [
+        m["id"]
+        for m in client.get("/movimientos", params={**orden, "page_size": 200}).json()["items"]
+    ]
+
+    primera = client.get("/movimientos", params={**orden, "page_size": 4}).json()
+    assert primera["prev_cursor"] is None
+    paginas = [primera]
+    while paginas[-1]["next_cursor"]:
+        resp = client.get(
+            "/movimientos", params={**orden, "page_size": 4, "cursor": paginas[-1]["next_cursor"]}
+        )
+        assert resp.status_code == 200
+        paginas.append(resp.json())
+    assert [m["id"] for p in paginas for m in p["items"]] == esperado
+    assert [p["page"] for p in paginas] == [1, None, None]
+
+    # Hacia atrás desde la última página se recuperan las mismas páginas.
+    atras = [paginas[-1]]
+    while atras[-1]["prev_cursor"]:
+        atras.append(
+            client.get(
+                "/movimientos", params={**orden, "page_size": 4, "cursor": atras[-1]["prev_cursor"]}
+            ).json()
+        )
+    assert [[m["id"] for m in p["items"]] for p in reversed(atras)] == [
+        [m["id"] for m in p["items"]] for p in paginas
+    ]
+
+    # Desde una página numerada también se puede continuar por cursor.
+    segunda = client.get("/movimientos", params={**orden, "page_size": 4, "page": 2}).json()
+    tercera = client.get(
+        "/movimientos", params={**orden, "page_size": 4, "cursor": segunda["next_cursor"]}
+    ).json()
+    assert tercera["items"] == paginas[2]["items"]
+
+
+def test_cursor_invalido_o_de_otra_ordenacion(client, db):
+    _crear_movimientos(client, db)
+    cursor = client.get("/movimientos", params={"page_size": 2}).json()["next_cursor"]
+
+    assert client.get("/movimientos", params={"cursor": "no-es-un-cursor"}).status_code == 400
+    resp = client.get("/movimientos", params={"cursor": cursor, "sort_by": "importe"})
+    assert resp.status_code == 400
@@ -0,0 +1,164 @@
+"""Regresiones de plan: los filtros indexados no deben recorrer la tabla de movimientos."""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from backend.app.models import ReglaAutoCategoria, busqueda
+from backend.app.models.entities import CampoObjetivo, TipoMatch, calcular_huella
+from backend.app.schemas.dashboard import DashboardFiltro
+from backend.app.schemas.movimientos import MovimientoFiltro
+from backend.app.schemas.reglas import ReglaCreate
+from backend.app.services import dashboard
+from backend.app.services.importador_csv import _huellas_existentes
+from backend.app.services.movimientos import listar_movimientos
+from backend.app.services.reglas import reaplicar_reglas_afectadas, simular_regla
+
+FILTROS_INDEXADOS = {
+    "fecha": {"fecha_desde": date(2024, 1, 1), "fecha_hasta": date(2024, 3, 31)},
+    "desde": {"fecha_desde": date(2024, 1, 1)},
+    "categoria": {"categoria_ids": [1]},
+    "categorias": {"categoria_ids": [1, 2]},
+    "importe": {"importe_min": -50, "importe_max": 50},
+}
+if busqueda.FTS_DISPONIBLE:
+    FILTROS_INDEXADOS["concepto"] = {"concepto": "cafeter"}
+
+SERVICIOS_DASHBOARD = [
+    dashboard.obtener_resumen,
+    dashboard.obtener_serie_mensual,
+    dashboard.obtener_por_categoria,
+    dashboard.obtener_por_anio,
+]
+
+
+def _planes(db, funcion) -> list[list[str]]:
+    """Ejecuta `funcion` y devuelve el plan de cada SELECT que lanza."""
+
+    sentencias = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            sentencias.append((statement, parameters))
+
+    motor = db.get_bind()
+    event.listen(motor, "before_cursor_execute", _registrar)
+    try:
+        funcion()
+    finally:
+        event.remove(motor, "before_cursor_execute", _registrar)
+    conexion = db.connection().connection
+    return [
+        [fila[3] for fila in conexion.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+        for sql, parametros in sentencias
+    ]
+
+
+def _lee_la_tabla(plan: list[str]) -> list[str]:
+    """Pasos que recorren `movimientos` entero (directamente o índice + tabla)."""
+
+    return [
+        paso
+        for paso in plan
+        if paso.split()[:2] == ["SCAN", "movimientos"] and "COVERING INDEX" not in paso
+    ]
+
+
+@pytest.mark.parametrize("filtro", FILTROS_INDEXADOS)
+def test_listado_filtrado_usa_indices(db, filtro):
+    filtros = MovimientoFiltro(**FILTROS_INDEXADOS[filtro])
+    planes = _planes(db, lambda: listar_movimientos(db, filtros))
+    assert planes
+    assert [_lee_la_tabla(plan) for plan in planes] == [[] for _ in planes]
+
+
+@pytest.mark.parametrize("filtro", ["fecha", "desde", "categoria", "categorias"])
+@pytest.mark.parametrize("servicio", SERVICIOS_DASHBOARD, ids=lambda s: s.__name__)
+def test_dashboard_filtrado_usa_indices(db, servicio, filtro):
+    filtros = DashboardFiltro(**FILTROS_INDEXADOS[filtro])
+    planes = _planes(db, lambda: servicio(db, filtros))
+    assert [_lee_la_tabla(plan) for plan in planes] == [[] for _ in planes]
+
+
+@pytest.mark.parametrize(
+    "sort_by,sort_dir",
+    [(None, None), ("fecha", "asc"), ("importe", "asc"), ("importe", "desc")],
+)
+def test_pagina_ordenada_sale_del_indice(client, db, sort_by, sort_dir):
+    """La página se lee en el orden de un índice, sin ordenar la tabla, también por cursor."""
+
+    for indice in range(3):
+        client.post(
+            "/movimientos",
+            json={
+                "fecha": f"2024-01-0{indice + 1}",
+                "concepto": f"Movimiento {indice}",
+                "importe": -10.0 * (indice + 1),
+                "tipo_id": 1,
+                "categoria_id": 1,
+                "metodo_pago_id": 1,
+            },
+        )
+    params = {"page_size": 1, "sort_by": sort_by, "sort_dir": sort_dir}
+    primera = []
+    pagina, _ = _planes(db, lambda: primera.append(listar_movimientos(db, **params)))
+    assert pagina[0].startswith("SCAN movimientos USING INDEX")
+    assert "USE TEMP B-TREE FOR ORDER BY" not in pagina
+
+    cursor = primera[0].next_cursor
+    pagina, _ = _planes(db, lambda: listar_movimientos(db, cursor=cursor, **params))
+    assert pagina[0].startswith("SEARCH movimientos USING INDEX")
+    assert "USE TEMP B-TREE FOR ORDER BY" not in pagina
+
+
+def test_duplicados_se_cruzan_con_el_indice_de_huellas(client, db):
+    client.post(
+        "/movimientos",
+        json={
+            "fecha": "2024-01-05",
+            "concepto": "Compra super",
+            "importe": -10.0,
+            "tipo_id": 1,
+            "categoria_id": 1,
+            "metodo_pago_id": 1,
+        },
+    )
+    huellas = [calcular_huella(date(2024, 1, 5), -10.0, "Compra super")] + [
+        f"{indice:064x}" for indice in range(1200)
+    ]
+    existentes = []
+
+    planes = _planes(db, lambda: existentes.append(_huellas_existentes(db, huellas)))
+
+    assert existentes == [{huellas[0]}]
+    assert len(planes) == 1
+    assert planes[0][0].startswith("SEARCH movimientos USING COVERING INDEX ix_movimientos_huella")
+
+
+REGLAS_LITERALES = [
+    (CampoObjetivo.concepto, TipoMatch.contains, "Cafeter"),
+    (CampoObjetivo.notas, TipoMatch.starts_with, "recibo"),
+    (CampoObjetivo.concepto, TipoMatch.word, "luz"),
+]
+
+
+@pytest.mark.skipif(not busqueda.FTS_DISPONIBLE, reason="SQLite sin trigram")
+def test_reglas_buscan_candidatos_por_el_indice(db):
+    # Una regla previa de más prioridad solo filtra los candidatos de la simulada.
+    db.add(
+        ReglaAutoCategoria(
+            pattern="super", campo_objetivo=CampoObjetivo.concepto, categoria_id=1, prioridad=0
+        )
+    )
+    db.commit()
+
+    planes = _planes(db, lambda: reaplicar_reglas_afectadas(db, REGLAS_LITERALES))
+    assert [_lee_la_tabla(plan) for plan in planes] == [[] for _ in planes]
+
+    for campo, tipo, patron in REGLAS_LITERALES:
+        regla = ReglaCreate(
+            pattern=patron, campo_objetivo=campo, tipo_match=tipo, categoria_id=1, prioridad=5
+        )
+        planes = _planes(db, lambda regla=regla: simular_regla(db, regla))
+        assert [_lee_la_tabla(plan) for plan in planes] == [[] for _ in planes]
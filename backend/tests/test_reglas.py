@@ -0,0 +1,422 @@
+"""Pruebas del motor de reglas de autocategorización."""
+
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from backend.app.models import (
+    Categoria,
+    EstadisticaRegla,
+    Movimiento,
+    PuntoControl,
+    ReglaAutoCategoria,
+)
+from backend.app.models.entities import CampoObjetivo, TipoMatch
+from backend.app.schemas.reglas import ReglaCreate
+from backend.app.services.reglas import (
+    AutomataPatrones,
+    PatronCompilado,
+    compilar_reglas,
+    estadisticas_reglas,
+)
+
+
+def _crear_reglas(db, *reglas):
+    """Crea las categorías necesarias y las reglas `(pattern, campo, categoria_id)` en orden."""
+
+    for categoria_id in sorted({r[2] for r in reglas} - {1}):
+        db.add(Categoria(id=categoria_id, nombre=f"Cat {categoria_id}", es_fijo=False))
+    db.flush()
+    for pattern, campo, categoria_id in reglas:
+        db.add(ReglaAutoCategoria(pattern=pattern, campo_objetivo=campo, categoria_id=categoria_id))
+    db.commit()
+
+
+def test_reglas_compiladas_mantienen_ultima_coincidencia(db):
+    _crear_reglas(
+        db,
+        ("MERCA", CampoObjetivo.concepto, 2),
+        ("tarjeta", CampoObjetivo.notas, 3),
+        ("mercadona", CampoObjetivo.concepto, 4),
+    )
+    reglas = compilar_reglas(db)
+
+    assert reglas.categorizar_lote(
+        ["Compra MERCADONA", "Mercado central", "Mercado central", "Otro"],
+        [None, "pago tarjeta", None, None],
+    ) == [4, 3, 2, None]
+
+
+def test_prioridad_explicita_gana_a_la_antiguedad(db):
+    _crear_reglas(
+        db,
+        ("mercadona", CampoObjetivo.concepto, 2),
+        ("tarjeta", CampoObjetivo.notas, 3),
+        ("merca", CampoObjetivo.concepto, 4),
+    )
+    db.execute(update(ReglaAutoCategoria).where(ReglaAutoCategoria.id == 1).values(prioridad=10))
+    db.commit()
+    reglas = compilar_reglas(db)
+
+    assert reglas.categorizar_lote(
+        ["Compra MERCADONA", "Mercado central", "Mercado central"],
+        ["pago tarjeta", "pago tarjeta", None],
+    ) == [2, 4, 4]
+
+
+def test_automata_equivale_a_contains_con_patrones_solapados():
+    patrones = [
+        PatronCompilado(posicion, patron, posicion)
+        for posicion, patron in enumerate(("he", "she", "his", "hers", "e", "she"))
+    ]
+    automata = AutomataPatrones(patrones)
+
+    for texto in ("ushers", "ahishe", "h", "", "xyz", "ehs"):
+        esperado = next((p.posicion for p in patrones if p.patron in texto), None)
+        encontrado = automata.buscar(texto)
+        assert (encontrado.posicion if encontrado else None) == esperado, texto
+
+
+def test_preview_compila_reglas_una_vez(client, db, sql_ejecutadas):
+    _crear_reglas(db, ("super", CampoObjetivo.concepto, 2))
+    mapping = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+    payload = json.dumps({"mapping": mapping, "options": {"default_categoria_id": 1}})
+
+    def _consultas_reglas(filas: int) -> list:
+        lineas = "".join(
+            f"2024-02-{i % 28 + 1:02d},{'Super' if i % 2 else 'Bar'} {i},-{i + 1}\n"
+            for i in range(filas)
+        )
+        sql_ejecutadas.clear()
+        resp = client.post(
+            "/import/preview",
+            files={
+                "file": ("reglas.csv", "fecha,concepto,importe\n" + lineas, "text/csv"),
+                "payload": (None, payload, "application/json"),
+            },
+        )
+        assert [r["categoria_id"] for r in resp.json()["rows"][:2]] == [1, 2]
+        return [sql for sql in sql_ejecutadas if "FROM reglas_auto_categoria" in sql]
+
+    assert len(_consultas_reglas(4)) == len(_consultas_reglas(300)) == 1
+
+
+def _crear_movimientos(db, *textos):
+    for concepto, notas in textos:
+        movimiento = Movimiento(
+            fecha=date(2024, 3, 1),
+            concepto=concepto,
+            importe=-10.0,
+            notas=notas,
+            tipo_id=1,
+            categoria_id=1,
+            metodo_pago_id=1,
+        )
+        movimiento.rellenar_campos_derivados()
+        db.add(movimiento)
+    db.commit()
+
+
+@pytest.mark.parametrize("modo", ["sql", "memoria"])
+def test_reaplicar_reglas_por_modo(client, db, sql_ejecutadas, modo):
+    _crear_reglas(
+        db,
+        ("nómina", CampoObjetivo.concepto, 2),
+        ("100%", CampoObjetivo.concepto, 3),
+        ("tarjeta", CampoObjetivo.notas, 4),
+        ("ACME", CampoObjetivo.concepto, 5),
+    )
+    _crear_movimientos(
+        db,
+        ("NÓMINA ACME", None),
+        ("Descuento 100% cine", None),
+        ("Descuento 1000 cine", None),
+        ("Nómina", "pago tarjeta"),
+        ("Sin regla", None),
+    )
+    sql_ejecutadas.clear()
+
+    resp = client.post("/reglas/reaplicar", params={"modo": modo})
+
+    assert resp.json() == {"movimientos_actualizados": 3}
+    if modo == "sql":
+        assert not any(sql.lstrip().startswith("SELECT movimientos.") for sql in sql_ejecutadas)
+    categorias = db.execute(select(Movimiento.categoria_id).order_by(Movimiento.id)).scalars().all()
+    assert categorias == [5, 3, 1, 4, 1]
+
+
+def test_reaplicar_por_bloques_reanuda_tras_interrupcion(client, db, monkeypatch):
+    from backend.app.services import reglas as servicio
+
+    monkeypatch.setattr(servicio, "TAMANO_BLOQUE_REAPLICACION", 2)
+    _crear_reglas(db, ("luz", CampoObjetivo.concepto, 2))
+    _crear_movimientos(db, *[(f"Recibo {'luz' if i % 2 else 'agua'} {i}", None) for i in range(7)])
+
+    ejecutar_original = Session.execute
+    escrituras = []
+
+    def _fallar_en_segunda_escritura(self, sentencia, *args, **kwargs):
+        if getattr(sentencia, "is_update", False) and args:
+            escrituras.append(len(args[0]))
+            if len(escrituras) == 2:
+                raise RuntimeError("corte simulado")
+        return ejecutar_original(self, sentencia, *args, **kwargs)
+
+    monkeypatch.setattr(Session, "execute", _fallar_en_segunda_escritura)
+    with pytest.raises(RuntimeError):
+        servicio.reaplicar_reglas_por_bloques(db)
+    db.rollback()
+    punto = db.get(PuntoControl, servicio.CLAVE_PUNTO_CONTROL)
+    assert (punto.ultimo_id, punto.actualizados) == (2, 1)
+
+    monkeypatch.setattr(Session, "execute", ejecutar_original)
+    resp = client.post("/reglas/reaplicar", params={"modo": "bloques"})
+    assert resp.json() == {"movimientos_actualizados": 3}
+    db.expire_all()
+    assert db.get(PuntoControl, servicio.CLAVE_PUNTO_CONTROL) is None
+    categorias = db.execute(select(Movimiento.categoria_id).order_by(Movimiento.id)).scalars().all()
+    assert categorias == [1, 2, 1, 2, 1, 2, 1]
+
+
+def test_cambios_de_regla_recategorizan_solo_afectados(client, db, sql_ejecutadas):
+    _crear_reglas(db, ("luz", CampoObjetivo.concepto, 2))
+    db.add(Categoria(id=3, nombre="Cat 3", es_fijo=False))
+    _crear_movimientos(
+        db, ("Recibo LUZ", None), ("Recibo agua", None), ("Cena", "agua con gas"), ("Otro", None)
+    )
+
+    def _categorias():
+        db.expire_all()
+        return db.execute(select(Movimiento.categoria_id).order_by(Movimiento.id)).scalars().all()
+
+    resp = client.post(
+        "/reglas",
+        params={"aplicar": True},
+        json={"pattern": "agua", "campo_objetivo": "concepto", "categoria_id": 3},
+    )
+    assert resp.status_code == 201
+    assert resp.headers["X-Movimientos-Actualizados"] == "1"
+    assert _categorias() == [1, 3, 1, 1]
+    regla_id = resp.json()["id"]
+
+    sql_ejecutadas.clear()
+    resp = client.put(
+        f"/reglas/{regla_id}",
+        params={"aplicar": True},
+        json={"pattern": "recibo", "campo_objetivo": "concepto", "categoria_id": 3},
+    )
+    assert resp.headers["X-Movimientos-Actualizados"] == "1"
+    assert _categorias() == [3, 3, 1, 1]
+    lecturas = [sql for sql in sql_ejecutadas if sql.lstrip().startswith("SELECT movimientos.id")]
+    assert len(lecturas) == 1 and "WHERE" in lecturas[0]
+
+    resp = client.delete(f"/reglas/{regla_id}", params={"aplicar": True})
+    assert resp.status_code == 204
+    assert resp.headers["X-Movimientos-Actualizados"] == "1"
+    assert _categorias() == [2, 3, 1, 1]
+
+    resp = client.post(
+        "/reglas", json={"pattern": "otro", "campo_objetivo": "concepto", "categoria_id": 3}
+    )
+    assert "X-Movimientos-Actualizados" not in resp.headers
+    assert _categorias() == [2, 3, 1, 1]
+
+
+def test_simular_regla_no_modifica_y_agrupa_por_categoria(client, db, sql_ejecutadas):
+    _crear_reglas(db, ("cine", CampoObjetivo.concepto, 2), ("x", CampoObjetivo.notas, 3))
+    _crear_movimientos(
+        db,
+        ("NÓMINA ACME", None),
+        ("Nómina cine", None),
+        ("nomina", None),
+        ("Descuento 100% Nómina", None),
+        ("Otro", "nómina"),
+    )
+    db.execute(update(Movimiento).where(Movimiento.id == 2).values(categoria_id=2))
+    db.execute(update(Movimiento).where(Movimiento.id == 4).values(categoria_id=3))
+    db.commit()
+    sql_ejecutadas.clear()
+
+    resp = client.post(
+        "/reglas/simular",
+        params={"muestra": 2},
+        json={"pattern": "nómina", "campo_objetivo": "concepto", "categoria_id": 3},
+    )
+
+    assert resp.status_code == 200
+    datos = resp.json()
+    assert (datos["coincidencias"], datos["a_recategorizar"]) == (3, 2)
+    assert [(c["categoria_id"], c["movimientos"]) for c in datos["por_categoria"]] == [
+        (1, 1),
+        (2, 1),
+    ]
+    assert [m["id"] for m in datos["muestra"]] == [2, 1]
+    assert not any(sql.lstrip().startswith(("UPDATE", "INSERT")) for sql in sql_ejecutadas)
+    assert client.get("/reglas").json()[-1]["pattern"] == "x"
+
+    resp = client.post(
+        "/reglas/simular",
+        json={"pattern": "100%", "campo_objetivo": "concepto", "categoria_id": 2},
+    )
+    assert (resp.json()["coincidencias"], resp.json()["a_recategorizar"]) == (1, 1)
+
+    resp = client.post(
+        "/reglas/simular",
+        json={
+            "pattern": "nómina",
+            "campo_objetivo": "concepto",
+            "categoria_id": 3,
+            "prioridad": 200,
+        },
+    )
+    assert (resp.json()["coincidencias"], resp.json()["a_recategorizar"]) == (2, 1)
+
+
+@pytest.mark.parametrize("modo", ["sql", "bloques", "memoria"])
+def test_reaplicar_respeta_prioridad(client, db, modo):
+    _crear_reglas(db, ("luz", CampoObjetivo.concepto, 2), ("recibo", CampoObjetivo.concepto, 3))
+    _crear_movimientos(db, ("Recibo luz", None), ("Recibo agua", None))
+    resp = client.put(
+        "/reglas/1",
+        json={"pattern": "luz", "campo_objetivo": "concepto", "categoria_id": 2, "prioridad": 1},
+    )
+    assert resp.json()["prioridad"] == 1
+
+    client.post("/reglas/reaplicar", params={"modo": modo})
+
+    categorias = db.execute(select(Movimiento.categoria_id).order_by(Movimiento.id)).scalars().all()
+    assert categorias == [2, 3]
+
+
+def _reglas_de_todos_los_tipos(db):
+    _crear_reglas(db, ("luz", CampoObjetivo.concepto, 2), ("bar", CampoObjetivo.concepto, 3))
+    for pattern, tipo, categoria_id in (
+        ("recibo", TipoMatch.starts_with, 4),
+        ("bar", TipoMatch.word, 5),
+        (r"n[oó]mina\s+\d{4}", TipoMatch.regex, 6),
+    ):
+        db.add(Categoria(id=categoria_id, nombre=f"Cat {categoria_id}", es_fijo=False))
+        db.add(
+            ReglaAutoCategoria(
+                pattern=pattern,
+                campo_objetivo=CampoObjetivo.concepto,
+                tipo_match=tipo,
+                categoria_id=categoria_id,
+            )
+        )
+    db.commit()
+
+
+@pytest.mark.parametrize("modo", ["sql", "bloques", "memoria"])
+def test_tipos_de_coincidencia_en_todos_los_modos(client, db, modo):
+    _reglas_de_todos_los_tipos(db)
+    _crear_movimientos(
+        db,
+        ("RECIBO LUZ", None),
+        ("Pago recibo luz", None),
+        ("Cena en el BAR", None),
+        ("Barbacoa", None),
+        ("NOMINA 2024", None),
+        ("Nómina marzo", None),
+    )
+
+    client.post("/reglas/reaplicar", params={"modo": modo})
+
+    categorias = db.execute(select(Movimiento.categoria_id).order_by(Movimiento.id)).scalars().all()
+    assert categorias == [4, 2, 5, 3, 6, 1]
+
+
+def test_simulacion_en_python_equivale_a_sql(client, db):
+    from backend.app.services import reglas as servicio
+
+    _reglas_de_todos_los_tipos(db)
+    _crear_movimientos(db, *[(texto, None) for texto in ("Recibo bar", "bar", "Nómina 2023")])
+    candidata = ReglaCreate(
+        pattern=r"\d+$", campo_objetivo=CampoObjetivo.concepto, tipo_match="regex", categoria_id=2
+    )
+    anteriores = db.execute(select(ReglaAutoCategoria)).scalars().all()
+
+    for prioridad in (0, 200):
+        regla = candidata.model_copy(update={"prioridad": prioridad})
+        assert servicio.simular_regla(db, regla) == servicio._simular_en_python(
+            db, regla, [] if prioridad == 0 else anteriores[::-1], 20
+        )
+
+
+def test_regex_invalida_se_rechaza_al_guardar(client):
+    for pattern in ("(abc", r"(a)\1", "(?P<x>a)", "(?i)abc"):
+        resp = client.post(
+            "/reglas",
+            json={
+                "pattern": pattern,
+                "campo_objetivo": "concepto",
+                "tipo_match": "regex",
+                "categoria_id": 1,
+            },
+        )
+        assert resp.status_code == 422, pattern
+
+
+@pytest.mark.parametrize("modo", ["sql", "memoria"])
+def test_estadisticas_de_reglas(client, db, monkeypatch, modo):
+    monkeypatch.setenv("RULE_STATS_ENABLED", "true")
+    _crear_reglas(
+        db,
+        ("luz", CampoObjetivo.concepto, 2),
+        ("agua", CampoObjetivo.concepto, 3),
+        ("gas", CampoObjetivo.concepto, 4),
+    )
+    payload = json.dumps(
+        {
+            "mapping": {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"},
+            "options": {"default_categoria_id": 1},
+        }
+    )
+    csv = (
+        "fecha,concepto,importe\n2024-02-01,Recibo luz,-1\n2024-02-02,Agua,-2\n2024-02-03,Luz,-3\n"
+    )
+    client.post(
+        "/import/preview",
+        files={"file": ("r.csv", csv, "text/csv"), "payload": (None, payload, "application/json")},
+    )
+    _crear_movimientos(db, ("Factura LUZ", None), ("Otro", None))
+    client.post("/reglas/reaplicar", params={"modo": modo})
+
+    estadisticas = client.get("/reglas/estadisticas").json()
+
+    assert [(e["pattern"], e["aciertos"]) for e in estadisticas] == [
+        ("luz", 3),
+        ("agua", 1),
+        ("gas", 0),
+    ]
+    assert estadisticas[0]["tiempo_ms"] > 0 and estadisticas[0]["ultimo_acierto"]
+    assert estadisticas[2]["ultimo_acierto"] is None
+
+    client.delete(f"/reglas/{estadisticas[0]['regla_id']}")
+    assert [e["pattern"] for e in client.get("/reglas/estadisticas").json()] == ["agua", "gas"]
+
+
+def test_preview_no_escribe_estadisticas(client, db, monkeypatch):
+    monkeypatch.setenv("RULE_STATS_ENABLED", "true")
+    monkeypatch.setattr(estadisticas_reglas, "umbral", 1)
+    _crear_reglas(db, ("luz", CampoObjetivo.concepto, 2))
+    payload = json.dumps(
+        {
+            "mapping": {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"},
+            "options": {"default_categoria_id": 1},
+        }
+    )
+    csv = "fecha,concepto,importe\n2024-02-01,Recibo luz,-1\n2024-02-02,Agua,-2\n"
+
+    resp = client.post(
+        "/import/preview",
+        files={"file": ("r.csv", csv, "text/csv"), "payload": (None, payload, "application/json")},
+    )
+
+    assert resp.json()["rows"][0]["categoria_id"] == 2
+    assert db.scalars(select(EstadisticaRegla)).all() == []
+    # Los aciertos pendientes se vuelcan al consultar las estadísticas.
+    assert [e["aciertos"] for e in client.get("/reglas/estadisticas").json()] == [1]
@@ -0,0 +1,113 @@
+"""Pruebas de las importaciones en segundo plano."""
+
+import json
+import threading
+
+import pytest
+
+from backend.app.models import TrabajoImportacion
+from backend.app.models.entities import EstadoTrabajo
+from backend.app.services import importador_csv
+from backend.app.services.trabajos_importacion import gestor_trabajos
+
+MAPPING = {"fecha_col": "fecha", "concepto_col": "concepto", "importe_col": "importe"}
+OPTIONS = {"default_categoria_id": 1, "default_metodo_pago_id": 1}
+CONTENIDO = (
+    "fecha,concepto,importe\n"
+    "2024-07-01,Cine,-9\n"
+    "2024-07-02,Cena,-30\n"
+    "2024-07-02,Cena,-30\n"
+    "2024-07-03,Regalo,x\n"
+)
+
+
+@pytest.fixture()
+def arranque(monkeypatch):
+    """Retiene la importación hasta que la petición que la lanzó ha terminado.
+
+    Las pruebas comparten una única conexión SQLite, así que el trabajo no debe
+    solaparse con el cierre de la sesión de la petición.
+    """
+
+    evento = threading.Event()
+    ejecutar_original = gestor_trabajos._ejecutar
+
+    def _ejecutar_retenido(*args):
+        evento.wait(timeout=5)
+        return ejecutar_original(*args)
+
+    monkeypatch.setattr(gestor_trabajos, "_ejecutar", _ejecutar_retenido)
+    return evento
+
+
+def _lanzar(client, arranque):
+    resp = client.post(
+        "/import/jobs",
+        files={
+            "file": ("trabajo.csv", CONTENIDO, "text/csv"),
+            "payload": (None, json.dumps({"mapping": MAPPING, "options": OPTIONS})),
+        },
+    )
+    assert resp.status_code == 202
+    arranque.set()
+    return resp.json()["id"]
+
+
+def test_trabajo_importacion_completa_y_expone_progreso(client, arranque):
+    trabajo_id = _lanzar(client, arranque)
+    gestor_trabajos.esperar(trabajo_id, timeout=10)
+
+    estado = client.get(f"/import/jobs/{trabajo_id}").json()
+    assert estado["estado"] == "completado"
+    assert (estado["filas_leidas"], estado["filas_insertadas"]) == (4, 2)
+    assert (estado["filas_duplicadas"], estado["filas_error"]) == (1, 1)
+
+    stream = client.get(f"/import/jobs/{trabajo_id}/stream")
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert json.loads(stream.text.strip().removeprefix("data: "))["estado"] == "completado"
+    assert client.post(f"/import/jobs/{trabajo_id}/cancel").status_code == 409
+
+
+def test_trabajo_cancelado_deshace_lo_insertado(client, arranque, monkeypatch):
+    monkeypatch.setattr(importador_csv, "TAMANO_BLOQUE_CSV", 1)
+    insertar_original = importador_csv._insertar_movimientos
+    lanzado: dict[str, str] = {}
+
+    def _insertar_y_cancelar(db, filas):
+        insertar_original(db, filas)
+        gestor_trabajos.cancelar(lanzado["id"])
+
+    monkeypatch.setattr(importador_csv, "_insertar_movimientos", _insertar_y_cancelar)
+    resp = client.post(
+        "/import/jobs",
+        files={
+            "file": ("trabajo.csv", CONTENIDO, "text/csv"),
+            "payload": (None, json.dumps({"mapping": MAPPING, "options": OPTIONS})),
+        },
+    )
+    lanzado["id"] = resp.json()["id"]
+    arranque.set()
+    gestor_trabajos.esperar(lanzado["id"], timeout=10)
+
+    estado = client.get(f"/import/jobs/{lanzado['id']}").json()
+    assert estado["estado"] == "cancelado"
+    assert estado["filas_insertadas"] == 0
+    assert client.get("/movimientos").json()["total_items"] == 0
+
+
+def test_arranque_marca_como_error_los_trabajos_interrumpidos(client, db):
+    estados = {
+        "pendiente": EstadoTrabajo.pendiente,
+        "en-curso": EstadoTrabajo.en_curso,
+        "completado": EstadoTrabajo.completado,
+    }
+    db.add_all(TrabajoImportacion(id=id_, estado=estado) for id_, estado in estados.items())
+    db.commit()
+
+    assert gestor_trabajos.marcar_interrumpidos(db) == 2
+
+    for trabajo_id in ("pendiente", "en-curso"):
+        estado = client.get(f"/import/jobs/{trabajo_id}").json()
+        assert estado["estado"] == "error"
+        assert "reinicio" in estado["mensaje"]
+    assert client.get("/import/jobs/completado").json()["estado"] == "completado"
@@ -31,24 +31,31 @@ export const analyzeImport = async (file) => {
   return data
 }
 
-export const previewImport = async (file, mapping, options) => {
+// Si el análisis devolvió un token, el backend reutiliza el CSV ya parseado y
+// no hace falta volver a subirlo. Si la caché lo ha expulsado (410) se reenvía.
+const postImport = async (url, file, mapping, options, token) => {
   const formData = new FormData()
-  formData.append('file', file)
-  formData.append('payload', JSON.stringify({ mapping, options }))
-  const { data } = await api.post('/import/preview', formData, {
-    headers: { 'Content-Type': 'multipart/form-data' }
-  })
-  return data
+  if (!token) {
+    formData.append('file', file)
+  }
+  formData.append('payload', JSON.stringify({ mapping, options, token }))
+  try {
+    const { data } = await api.post(url, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' }
+    })
+    return data
+  } catch (err) {
+    if (token && err.response?.status === 410) {
+      return postImport(url, file, mapping, options, null)
+    }
+    throw err
+  }
 }
 
-export const applyImport = async (file, mapping, options) => {
-  const formData = new FormData()
-  formData.append('file', file)
-  formData.append('payload', JSON.stringify({ mapping, options }))
-  const { data } = await api.post('/import/apply', formData, {
-    headers: { 'Content-Type': 'multipart/form-data' }
-  })
-  return data
-}
+export const previewImport = (file, mapping, options, token) =>
+  postImport('/import/preview', file, mapping, options, token)
+
+export const applyImport = (file, mapping, options, token) =>
+  postImport('/import/apply', file, mapping, options, token)
 
 export default api
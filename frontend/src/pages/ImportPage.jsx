@@ -69,7 +69,7 @@ export default function ImportPage() {
     setError('')
     setResult(null)
     try {
-      const data = await previewImport(file, mapping, options)
+      const data = await previewImport(file, mapping, options, analysis?.token)
       setPreview(data)
     } catch (err) {
       setError('No se pudo previsualizar el archivo')
@@ -83,7 +83,7 @@ export default function ImportPage() {
     setIsLoading(true)
     setError('')
     try {
-      const data = await applyImport(file, mapping, options)
+      const data = await applyImport(file, mapping, options, analysis?.token)
       setResult(data)
     } catch (err) {
       setError('No se pudo completar la importación')
@@ -113,6 +113,12 @@ export default function ImportPage() {
           <div style={{ display: 'grid', gap: 6 }}>
             <span style={{ fontWeight: 600 }}>Formato detectado: {analysis.format}</span>
             <span style={{ color: '#64748b' }}>Columnas: {analysis.columns.join(', ')}</span>
+            {analysis.estimated_rows != null && (
+              <span style={{ color: '#64748b' }}>
+                Filas: {analysis.rows_exact ? '' : '~'}
+                {analysis.estimated_rows.toLocaleString('es-ES')}
+              </span>
+            )}
           </div>
         )}
       </form>
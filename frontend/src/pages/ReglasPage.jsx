@@ -19,7 +19,9 @@ export default function ReglasPage() {
           columns={[
             { key: 'pattern', label: 'Patrón' },
             { key: 'campo_objetivo', label: 'Campo' },
-            { key: 'categoria_id', label: 'Categoría' }
+            { key: 'tipo_match', label: 'Tipo' },
+            { key: 'categoria_id', label: 'Categoría' },
+            { key: 'prioridad', label: 'Prioridad' }
           ]}
           data={data}
         />